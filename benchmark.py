@@ -0,0 +1,420 @@
+"""KSS Tool 지연시간 / 처리량 벤치마크
+
+mock_kss_server.py 를 백그라운드로 띄우고 mcp_scripts.py 의 Tool 을 측정
+    - direct: Tool 함수를 같은 프로세스에서 직접 호출
+    - stdio : mcp_scripts.py 를 MCP stdio 서버로 실행하여 ClientSession 으로 호출
+    - p50 / p95 / p99 지연시간, 처리량(req/s), 오류 수, 메모리 사용량 보고
+
+실행:
+    python benchmark.py                                   # 모든 시나리오, direct + stdio
+    python benchmark.py --mode direct --scenario account_info_get --requests 500 --concurrency 20
+    python benchmark.py --latency-ms 120 --error-rate 0.02 --json bench.json
+    python benchmark.py --mode decode --rows 500           # 검색 응답 디코딩 / HTML 정리 microbenchmark (mock 서버 불필요)
+    python benchmark.py --mode replay --replay-log logs/kss-traffic.jsonl.gz --speed 10   # 기록된 운영 트래픽 재생 (kss_transport)
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import statistics
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+from mock_kss_server import MockConfig, MockDataset, SURNAMES
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, int(round(pct / 100 * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+def _scenarios(config: MockConfig) -> Dict[str, Callable[[random.Random], tuple]]:
+    """시나리오 이름 → (rng) -> (tool 이름, 인자) 생성 함수"""
+    def person(rng):
+        return f'A{100000 + rng.randrange(config.accounts)}'
+
+    def company(rng):
+        return f'C{10000 + rng.randrange(config.companies)}'
+
+    return {
+        'account_info_get': lambda rng: ('kss_account_info_get', {'person_id': person(rng)}),
+        'company_info_get': lambda rng: ('kss_company_info_get', {'company_id': company(rng)}),
+        'company_roster_get': lambda rng: ('kss_company_roster_get', {'company_id': company(rng), 'fields': ['person_id', 'name', 'position']}),
+        'account_search': lambda rng: ('kss_account_query_name_company', {'name': rng.choice(SURNAMES), 'company': ''}),
+        'batch_account_info_get': lambda rng: ('kss_batch_account_info_get', {'person_ids': [person(rng) for _ in range(20)]}),
+        'comment_post': lambda rng: ('kss_account_comment_post', {'person_id': person(rng), 'txt': 'benchmark comment'}),
+        'account_update': lambda rng: ('kss_account_info_update', {'person_id': person(rng), 'position': rng.choice(['Engineer', 'Manager'])}),
+        'account_create_check': lambda rng: ('kss_account_create', {
+            'name': 'Bench User',
+            'mobile': f'010-{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}',
+            'email': f'bench{rng.randint(0, 10**9)}@example.com',
+        }),
+    }
+
+
+def _is_error(result: Any) -> bool:
+    return isinstance(result, dict) and 'error' in result
+
+
+async def _drive(call: Callable[[str, dict], Any], scenario: Callable, requests: int, concurrency: int, seed: int) -> Dict[str, Any]:
+    """동일한 부하(요청 수 / 동시성)로 Tool 호출을 실행하고 지연시간을 수집"""
+    rng = random.Random(seed)
+    calls = [scenario(rng) for _ in range(requests)]
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def _one(tool: str, args: dict):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                result = await call(tool, args)
+                if _is_error(result):
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[_one(tool, args) for tool, args in calls])
+    elapsed = time.perf_counter() - start
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': errors,
+        'p50_ms': round(_percentile(latencies, 50), 2),
+        'p95_ms': round(_percentile(latencies, 95), 2),
+        'p99_ms': round(_percentile(latencies, 99), 2),
+        'max_ms': round(max(latencies, default=0.0), 2),
+        'throughput_rps': round(requests / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+async def run_direct(scenarios: Dict[str, Callable], args) -> List[Dict[str, Any]]:
+    """Tool 함수를 같은 프로세스에서 직접 호출"""
+    import mcp_scripts
+
+    logging.getLogger('mcp_scripts').setLevel(logging.WARNING)
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+    tools = {tool.name: tool.fn for tool in mcp_scripts.mcp._tool_manager.list_tools()}
+
+    async def call(tool: str, tool_args: dict):
+        return await tools[tool](**tool_args)
+
+    reports = []
+    for name, scenario in scenarios.items():
+        mcp_scripts.kss_cache.clear()
+        if args.trace_memory:
+            tracemalloc.start()
+        report = await _drive(call, scenario, args.requests, args.concurrency, args.seed)
+        report.update({'mode': 'direct', 'scenario': name})
+        if args.trace_memory:
+            report['peak_alloc_kb'] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+            tracemalloc.stop()
+        if psutil is not None:
+            report['server_rss_mb'] = round(psutil.Process().memory_info().rss / 1024 / 1024, 1)
+        reports.append(report)
+    await mcp_scripts.kss_request.aclose()
+    return reports
+
+
+async def run_stdio(scenarios: Dict[str, Callable], args, env: Dict[str, str]) -> List[Dict[str, Any]]:
+    """mcp_scripts.py 를 MCP stdio 서버로 실행하여 ClientSession 으로 호출"""
+    from mcp import ClientSession, StdioServerParameters
+    from mcp.client.stdio import stdio_client
+
+    params = StdioServerParameters(command=sys.executable, args=['mcp_scripts.py'], env=env)
+    reports = []
+    with open(os.devnull, 'w') as errlog:
+        async with stdio_client(params, errlog=errlog) as (read, write):
+            async with ClientSession(read, write) as session:
+                start = time.perf_counter()
+                await session.initialize()
+                await session.list_tools()
+                startup_ms = (time.perf_counter() - start) * 1000
+
+                async def call(tool: str, tool_args: dict):
+                    result = await session.call_tool(tool, tool_args)
+                    if result.isError:
+                        return {'error': result.content}
+                    return json.loads(result.content[0].text) if result.content else {}
+
+                child = None
+                if psutil is not None:
+                    children = psutil.Process().children(recursive=True)
+                    child = children[-1] if children else None
+
+                for name, scenario in scenarios.items():
+                    report = await _drive(call, scenario, args.requests, args.concurrency, args.seed)
+                    report.update({'mode': 'stdio', 'scenario': name, 'startup_ms': round(startup_ms, 1)})
+                    if child is not None:
+                        report['server_rss_mb'] = round(child.memory_info().rss / 1024 / 1024, 1)
+                    reports.append(report)
+    return reports
+
+
+def _clean_html_tags_baseline(text: str) -> str:
+    """이전 clean_html_tags (호출마다 re.sub 두 번, 캐시 없음) - 비교용"""
+    if not text:
+        return ''
+    return re.sub(r'\s+', ' ', re.sub(r'<[^>]+>', '', text)).strip()
+
+
+def run_decode(args) -> List[Dict[str, Any]]:
+    """AC0180MSearchAll.do 검색 응답(rows 행)의 디코딩 / HTML 정리 / 필드 추출 단계별 CPU 시간"""
+    import mcp_scripts
+    from kss_decode import JsonArrayStream, loads, orjson
+
+    dataset = MockDataset(MockConfig(seed=args.seed))
+    persons = [row for row in dataset.rows if row['gubun'] == 'PERSON'][:args.rows]
+    body = json.dumps({'Data': persons}, ensure_ascii=False).encode('utf-8')
+    text = body.decode('utf-8')
+    rows = json.loads(body)['Data']
+
+    def stream_decode():
+        stream = JsonArrayStream('Data')
+        # httpx aiter_text 와 비슷한 크기의 조각으로 나눠서 입력
+        return [item for i in range(0, len(text), 16384) for item in stream.feed(text[i:i + 16384])]
+
+    def clean_baseline():
+        return [(_clean_html_tags_baseline(r['compnm']), _clean_html_tags_baseline(r['cmtDescToolTipHtml'])) for r in rows]
+
+    def clean_current():
+        return [(mcp_scripts.clean_company_name(r['compnm']), mcp_scripts.clean_html_tags(r['cmtDescToolTipHtml'])) for r in rows]
+
+    stages = {
+        'decode json.loads': lambda: json.loads(body),
+        f'decode {"orjson" if orjson is not None else "json (orjson 미설치)"}': lambda: loads(body),
+        'decode JsonArrayStream': stream_decode,
+        'clean_html_tags 이전 (re.sub)': clean_baseline,
+        'clean_html_tags (precompiled, 회사명 cache)': clean_current,
+        'extract search rows': lambda: [mcp_scripts._search_row(r) for r in rows],
+    }
+    # 회사명 캐시를 비우고 측정 (검색마다 새 회사명이 섞이는 상황, warm cache 로 과대평가하지 않도록)
+    setups = {
+        'clean_html_tags (precompiled, 회사명 cache)': mcp_scripts.clean_company_name.cache_clear,
+        'extract search rows': mcp_scripts.clean_company_name.cache_clear,
+    }
+    reports = []
+    for name, fn in stages.items():
+        setup = setups.get(name, lambda: None)
+        setup()
+        fn()
+        times = []
+        for _ in range(args.repeat):
+            setup()
+            start = time.perf_counter()
+            fn()
+            times.append((time.perf_counter() - start) * 1000)
+        reports.append({
+            'mode': 'decode',
+            'scenario': name,
+            'rows': len(rows),
+            'payload_kb': round(len(body) / 1024, 1),
+            'p50_ms': round(statistics.median(times), 3),
+            'p95_ms': round(_percentile(times, 95), 3),
+            'max_ms': round(max(times), 3),
+        })
+    return reports
+
+
+async def run_replay(args) -> List[Dict[str, Any]]:
+    """KSS_TRANSPORT=record 로 기록한 Tool 호출을 기록된 간격 / speed 배속으로 다시 실행 (KSS 응답도 기록에서 재생)
+        - speed 0: 간격 없이 concurrency 개씩 최대 속도로 실행
+    """
+    os.environ.update({
+        'KSS_TRANSPORT': 'replay',
+        'KSS_TRANSPORT_LOG': args.replay_log,
+        'KSS_REPLAY_SPEED': str(args.speed),
+        'KSS_AUTO_RELOGIN': 'false',
+    })
+    import kss_transport
+    import mcp_scripts
+
+    logging.getLogger('mcp_scripts').setLevel(logging.WARNING)
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+    tools = {tool.name: tool.fn for tool in mcp_scripts.mcp._tool_manager.list_tools()}
+    calls = [r for r in kss_transport.load_records(args.replay_log) if r['type'] == 'tool' and r['tool'] in tools]
+    if not calls:
+        raise SystemExit(f'{args.replay_log} 에 재생할 Tool 호출 기록이 없습니다.')
+    semaphore = asyncio.Semaphore(args.concurrency if args.speed <= 0 else len(calls))
+    latencies: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+
+    async def _one(record: Dict[str, Any], start: float):
+        if args.speed > 0:
+            await asyncio.sleep(max(0.0, start + (record['t'] - calls[0]['t']) / args.speed - time.perf_counter()))
+        async with semaphore:
+            began = time.perf_counter()
+            try:
+                failed = _is_error(await tools[record['tool']](**record['args']))
+            except Exception:
+                failed = True
+            latencies.setdefault(record['tool'], []).append((time.perf_counter() - began) * 1000)
+            errors[record['tool']] = errors.get(record['tool'], 0) + failed
+
+    start = time.perf_counter()
+    await asyncio.gather(*[_one(record, start) for record in calls])
+    elapsed = time.perf_counter() - start
+    client = mcp_scripts.kss_request._client
+    replay_stats = dict(client._transport.stats) if client is not None else {}
+    await mcp_scripts.kss_request.aclose()
+
+    def _report(name: str, values: List[float], failed: int) -> Dict[str, Any]:
+        return {
+            'mode': 'replay',
+            'scenario': name,
+            'requests': len(values),
+            'concurrency': args.concurrency if args.speed <= 0 else f'x{args.speed:g}',
+            'errors': failed,
+            'p50_ms': round(_percentile(values, 50), 2),
+            'p95_ms': round(_percentile(values, 95), 2),
+            'p99_ms': round(_percentile(values, 99), 2),
+            'max_ms': round(max(values, default=0.0), 2),
+            'throughput_rps': round(len(values) / elapsed, 1) if elapsed else 0.0,
+        }
+    reports = [_report(name, values, errors[name]) for name, values in sorted(latencies.items())]
+    total = _report('(전체)', [v for values in latencies.values() for v in values], sum(errors.values()))
+    total['recorded_s'] = round(calls[-1]['t'] - calls[0]['t'], 2)
+    total['elapsed_s'] = round(elapsed, 2)
+    total['replay'] = replay_stats
+    return reports + [total]
+
+
+def start_mock_server(config: MockConfig) -> tuple:
+    """mock 서버를 별도 프로세스로 실행 (측정 대상과 GIL 을 공유하지 않도록)"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    process = subprocess.Popen([
+        sys.executable, 'mock_kss_server.py', '--port', str(port),
+        '--accounts', str(config.accounts), '--companies', str(config.companies),
+        '--latency-ms', str(config.latency_ms), '--jitter-ms', str(config.jitter_ms),
+        '--error-rate', str(config.error_rate), '--throttle-rate', str(config.throttle_rate),
+    ], stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return process, f'http://127.0.0.1:{port}/KSS'
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError('mock 서버 실행 실패')
+
+
+def _print_table(reports: List[Dict[str, Any]], columns: Optional[List[str]] = None):
+    columns = columns or ['mode', 'scenario', 'requests', 'concurrency', 'errors', 'p50_ms', 'p95_ms', 'p99_ms',
+                          'max_ms', 'throughput_rps', 'startup_ms', 'peak_alloc_kb', 'server_rss_mb']
+    rows = [[str(r.get(c, '-')) for c in columns] for r in reports]
+    widths = [max(len(c), *(len(row[i]) for row in rows)) for i, c in enumerate(columns)]
+    print('  '.join(c.ljust(w) for c, w in zip(columns, widths)))
+    for row in rows:
+        print('  '.join(v.ljust(w) for v, w in zip(row, widths)))
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='KSS Tool 벤치마크 (mock KSS 서버 사용)')
+    parser.add_argument('--mode', choices=['direct', 'stdio', 'all', 'decode', 'replay'], default='all')
+    parser.add_argument('--scenario', action='append', help='실행할 시나리오 (여러 번 지정 가능, 기본: 전체)')
+    parser.add_argument('--requests', type=int, default=200, help='시나리오당 요청 수')
+    parser.add_argument('--concurrency', type=int, default=10, help='동시 요청 수')
+    parser.add_argument('--server-url', help='이미 실행 중인 mock / KSS 서버 url (미지정 시 mock 서버 자동 실행)')
+    parser.add_argument('--accounts', type=int, default=MockConfig.accounts)
+    parser.add_argument('--companies', type=int, default=MockConfig.companies)
+    parser.add_argument('--latency-ms', type=float, default=MockConfig.latency_ms)
+    parser.add_argument('--jitter-ms', type=float, default=MockConfig.jitter_ms)
+    parser.add_argument('--error-rate', type=float, default=MockConfig.error_rate)
+    parser.add_argument('--no-cache', action='store_true', help='조회 캐시 비활성화 (KSS_CACHE_TTL=0)')
+    parser.add_argument('--trace-memory', action='store_true', help='direct 모드에서 tracemalloc 으로 최대 할당량 측정 (측정 오버헤드 있음)')
+    parser.add_argument('--rows', type=int, default=500, help='decode 모드: 검색 응답 행 수')
+    parser.add_argument('--repeat', type=int, default=200, help='decode 모드: 단계별 반복 횟수')
+    parser.add_argument('--replay-log', help='replay 모드: 트래픽 기록 파일 (기본: KSS_TRANSPORT_LOG)')
+    parser.add_argument('--speed', type=float, default=1.0, help='replay 모드: 재생 배속 (0 이면 간격 없이 --concurrency 개씩)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='결과를 JSON 파일로 저장')
+    args = parser.parse_args(argv)
+
+    if args.mode == 'decode':
+        reports = run_decode(args)
+        _print_table(reports, ['scenario', 'rows', 'payload_kb', 'p50_ms', 'p95_ms', 'max_ms'])
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(reports, f, ensure_ascii=False, indent=2)
+        return
+    if args.mode == 'replay':
+        import kss_transport
+        args.replay_log = args.replay_log or kss_transport.log_path()
+        reports = asyncio.run(run_replay(args))
+        _print_table(reports, ['mode', 'scenario', 'requests', 'concurrency', 'errors', 'p50_ms', 'p95_ms', 'p99_ms',
+                               'max_ms', 'throughput_rps', 'recorded_s', 'elapsed_s', 'replay'])
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(reports, f, ensure_ascii=False, indent=2)
+        return
+
+    config = MockConfig(accounts=args.accounts, companies=args.companies, latency_ms=args.latency_ms,
+                        jitter_ms=args.jitter_ms, error_rate=args.error_rate)
+    scenarios = _scenarios(config)
+    if args.scenario:
+        unknown = set(args.scenario) - set(scenarios)
+        if unknown:
+            parser.error(f'알 수 없는 시나리오: {", ".join(sorted(unknown))} (사용 가능: {", ".join(scenarios)})')
+        scenarios = {name: scenarios[name] for name in args.scenario}
+
+    mock, server_url = None, args.server_url
+    if not server_url:
+        mock, server_url = start_mock_server(config)
+
+    # mock 서버용 빈 헤더 / 쿠키 파일
+    workdir = tempfile.mkdtemp(prefix='kss-bench-')
+    for name in ('headers.json', 'cookies.json'):
+        with open(os.path.join(workdir, name), 'w') as f:
+            json.dump({}, f)
+    env = {
+        'KSS_SERVER_URL': server_url,
+        'KSS_HEADERS_FILE': os.path.join(workdir, 'headers.json'),
+        'KSS_COOKIES_FILE': os.path.join(workdir, 'cookies.json'),
+        'KSS_AUTO_RELOGIN': 'false',
+        'MCP_DELAY': os.getenv('MCP_DELAY', '30'),
+    }
+    if args.no_cache:
+        env['KSS_CACHE_TTL'] = '0'
+    os.environ.update(env)
+
+    reports = []
+    try:
+        if args.mode in ('direct', 'all'):
+            reports += asyncio.run(run_direct(scenarios, args))
+        if args.mode in ('stdio', 'all'):
+            reports += asyncio.run(run_stdio(scenarios, args, dict(os.environ)))
+    finally:
+        if mock is not None:
+            mock.terminate()
+            mock.wait(timeout=10)
+
+    _print_table(reports)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
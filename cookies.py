@@ -1,49 +1,110 @@
 import json
 import os
-from dotenv import load_dotenv
-import undetected_chromedriver as uc
-from selenium.webdriver.common.by import By
+import re
+import sys
 import time
-import psutil
+from typing import Dict, Optional, Tuple
+from urllib.parse import urljoin
+
+import httpx
+from dotenv import load_dotenv
 load_dotenv()
 
 KSS_ID = os.getenv("KSS_ID")
 KSS_PW = os.getenv("KSS_PW")
 KSS_SERVER = os.getenv("KSS_SERVER")
 
-def main():
-    options = uc.ChromeOptions()
-    driver = uc.Chrome(options=options, headless=True)
-    
-    '''KSS 로그인 후 쿠키 가져오기'''        
+def get_server() -> Tuple[str, str]:
+    '''KSS_SERVER 값에 따른 (채널명, 서버 url) 반환'''
     if KSS_SERVER == '2':
-        channel = 'DEV'
-        url = 'https://kssdev.surplusglobal.com/KSS/login.do'
-        check_url = 'https://kssdev.surplusglobal.com/KSS/mainConts.do'
-        server = 'https://kssdev.surplusglobal.com/KSS'
+        return 'DEV', 'https://kssdev.surplusglobal.com/KSS'
     elif KSS_SERVER == '1':
-        channel = 'Main'
-        url = 'https://zpdldptmdptm.surplusglobal.com/KSS/login.do'
-        check_url = 'https://zpdldptmdptm.surplusglobal.com/KSS/mainConts.do'
-        server = 'https://zpdldptmdptm.surplusglobal.com/KSS'
+        return 'Main', 'https://zpdldptmdptm.surplusglobal.com/KSS'
     else:
         raise Exception('KSS_SERVER 값이 올바르지 않습니다. 1 또는 2를 입력해주세요.')
 
+def save_cookies(cookies: Dict[str, str]):
+    with open('cookies.json', 'w') as f:
+        json.dump(cookies, f)
+
+def _parse_login_form(html: str) -> Tuple[str, Dict[str, str]]:
+    '''login.do 페이지에서 로그인 form 의 action 과 hidden input (토큰 등) 추출'''
+    action = 'login.do'
+    fields = {}
+    for form in re.finditer(r'<form\b([^>]*)>(.*?)</form>', html, re.S | re.I):
+        attrs, body = form.groups()
+        if 'userId' not in body:
+            continue
+        match = re.search(r'action\s*=\s*["\']([^"\']+)["\']', attrs, re.I)
+        if match:
+            action = match.group(1)
+        for tag in re.finditer(r'<input\b[^>]*>', body, re.I):
+            tag = tag.group(0)
+            if not re.search(r'type\s*=\s*["\']hidden["\']', tag, re.I):
+                continue
+            name = re.search(r'name\s*=\s*["\']([^"\']+)["\']', tag, re.I)
+            value = re.search(r'value\s*=\s*["\']([^"\']*)["\']', tag, re.I)
+            if name:
+                fields[name.group(1)] = value.group(1) if value else ''
+        break
+    return action, fields
+
+def http_login(server: Optional[str] = None, save: bool = True, timeout: float = 30) -> Dict[str, str]:
+    '''브라우저 없이 login.do → fn_checkToken 흐름을 HTTP 로 재현하여 세션 쿠키 획득
+        - login.do 의 로그인 form (hidden 토큰 포함) 을 그대로 제출
+        - form action 은 KSS_LOGIN_ACTION 으로 지정 가능
+        - mainConts.do 접근이 가능하면 로그인 성공으로 판단
+    '''
+    if server is None:
+        channel, server = get_server()
+    else:
+        channel = 'Main' if 'zpdldptmdptm' in server else 'DEV' if 'kssdev' in server else server
+    with httpx.Client(follow_redirects=True, timeout=timeout) as client:
+        login_page = client.get(f'{server}/login.do')
+        action, fields = _parse_login_form(login_page.text)
+        action = os.getenv("KSS_LOGIN_ACTION") or action
+        fields.update({'userId': str(KSS_ID), 'password': str(KSS_PW)})
+        response = client.post(urljoin(str(login_page.url), action), data=fields)
+
+        if not str(response.url).endswith('mainConts.do'):
+            response = client.get(f'{server}/mainConts.do')
+        if response.status_code != 200 or 'login.do' in str(response.url):
+            raise Exception(f'{KSS_ID} HTTP 로그인 실패 (상태 코드: {response.status_code}, url: {response.url})')
+
+        cookies = {cookie.name: cookie.value for cookie in client.cookies.jar}
+    if save:
+        save_cookies(cookies)
+    print(f'{KSS_ID} 로그인 성공', file=sys.stderr)
+    print(f'{channel} 서버 쿠키 저장성공', file=sys.stderr)
+    return cookies
+
+def browser_login():
+    '''KSS 로그인 후 쿠키 가져오기 (크롬 브라우저 사용, HTTP 로그인이 실패할 경우)'''
+    import undetected_chromedriver as uc
+    from selenium.webdriver.common.by import By
+    import psutil
+
+    options = uc.ChromeOptions()
+    driver = uc.Chrome(options=options, headless=True)
+
+    channel, server = get_server()
+    url = f'{server}/login.do'
+    check_url = f'{server}/mainConts.do'
+
     driver.get(url)
     time.sleep(2)
     driver.find_element(By.ID, 'userId').send_keys(str(KSS_ID))
     driver.find_element(By.ID, 'password').send_keys(str(KSS_PW))
-    driver.execute_script('fn_checkToken()')   
+    driver.execute_script('fn_checkToken()')
     count = 0
     while True:
-        try:               
+        try:
             if driver.current_url == check_url:
                 print(f'{KSS_ID} 로그인 성공')
                 print(f'{channel} 서버 쿠키 저장성공')
                 cookies = driver.get_cookies()
                 cookies = {cookie['name']: cookie['value'] for cookie in cookies}
-                with open('cookies.json', 'w') as f:
-                    json.dump(cookies, f)
+                save_cookies(cookies)
 
                 '크롬드라이버 강제종료'
                 for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
@@ -53,7 +114,7 @@ def main():
                             if 'remote-debugging-port' in cmdline or 'undetected_chromedriver' in cmdline:
                                 proc.kill()
                     except (psutil.NoSuchProcess, psutil.AccessDenied):
-                        pass                
+                        pass
                 break
         except:
             time.sleep(1)
@@ -62,5 +123,15 @@ def main():
                 raise Exception(f'count 초과로 로그인 실패: 로그인대기시간 {count}초')
             continue
 
+def main():
+    '''HTTP 로그인 우선 시도, 실패하면 브라우저 로그인 (--browser 옵션 시 브라우저만 사용)'''
+    if '--browser' not in sys.argv:
+        try:
+            http_login()
+            return
+        except Exception as e:
+            print(f'HTTP 로그인 실패, 브라우저 로그인으로 재시도합니다. {e}')
+    browser_login()
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
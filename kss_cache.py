@@ -0,0 +1,118 @@
+import asyncio
+import os
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from cachetools import TTLCache
+
+
+class KSS_Cache():
+    """어카운트 / 회사 조회 결과 캐시
+        - TTL 이 지나면 만료, 최대 크기를 넘으면 LRU 순서로 제거
+        - 키: ('account', 'A142340'), ('company', 'C12345') 형식
+        - 쓰기 Tool 에서 invalidate 로 해당 ID 를 즉시 제거, 검색 결과(('search', 이름, 회사명))는 invalidate_kind 로 모두 제거
+    """
+    def __init__(self, maxsize: Optional[int] = None, ttl: Optional[float] = None):
+        self.maxsize = maxsize if maxsize is not None else int(os.getenv("KSS_CACHE_SIZE", 1024))
+        self.ttl = ttl if ttl is not None else float(os.getenv("KSS_CACHE_TTL", 300))
+        self._cache = TTLCache(maxsize=self.maxsize, ttl=self.ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # 종류별 invalidate_kind 횟수 (조회 도중 무효화되었으면 결과를 캐시하지 않도록 비교)
+        self.generations: Dict[str, int] = {}
+
+    @staticmethod
+    def key(kind: str, item_id: str) -> tuple:
+        return (kind, str(item_id).strip().upper())
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            value = self._cache.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return dict(value)
+
+    def set(self, key: Hashable, value: Dict[str, Any]):
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._cache[key] = dict(value)
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            if self._cache.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def invalidate_kind(self, kind: str):
+        """키의 첫 값이 kind 인 항목 모두 제거 (ex: 어카운트 생성 / 변경 후 검색 결과)"""
+        with self._lock:
+            keys = [k for k in self._cache.keys() if isinstance(k, tuple) and k and k[0] == kind]
+            for k in keys:
+                self._cache.pop(k, None)
+            self.invalidations += len(keys)
+            self.generations[kind] = self.generations.get(kind, 0) + 1
+
+    def generation(self, kind: str) -> int:
+        return self.generations.get(kind, 0)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'invalidations': self.invalidations,
+                'size': len(self._cache),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+            }
+
+
+class SingleFlight():
+    """같은 key 로 동시에 진행 중인 요청이 있으면 새로 보내지 않고 그 결과를 함께 사용 (single-flight)
+        - 결과는 완료 즉시 버림 (캐시와 달리 오래된 값을 반환하지 않음)
+        - 먼저 호출한 쪽이 취소되어도 요청은 계속 진행되어 나머지 호출에 결과 전달
+        - 결과 객체를 공유하므로 호출한 쪽에서 수정하지 않아야 함
+    """
+    def __init__(self, enabled: Optional[bool] = None):
+        self.enabled = enabled if enabled is not None else os.getenv("KSS_COALESCE", "true").lower() == 'true'
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.saved = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        if not self.enabled:
+            return await fn()
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+            self.calls += 1
+        else:
+            self.saved += 1
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # 모든 호출이 취소된 경우 'exception was never retrieved' 경고 방지
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'requests_sent': self.calls,
+            'requests_saved': self.saved,
+            'in_flight': len(self._inflight),
+        }
@@ -0,0 +1,108 @@
+import json
+from typing import Any, Iterator, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """JSON 디코딩 (orjson 이 설치되어 있으면 사용, 없으면 표준 json)"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class JsonArrayStream():
+    """{"Data": [ {...}, {...}, ... ]} 형식 응답에서 배열 항목을 수신하는 대로 하나씩 디코딩
+        - 전체 body 를 문자열 / dict 로 만들지 않고 항목 단위로 처리
+        - feed() 에 텍스트 조각을 넣으면 완성된 항목들을 반환
+        - orjson 이 있으면 조각에서 완성된 항목들을 한 번에 orjson 으로 디코딩 (실패하면 항목 단위 raw_decode)
+    """
+    def __init__(self, key: str = 'Data'):
+        self.key = f'"{key}"'
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.state = 'key'  # key → array → items → done
+        self.count = 0
+
+    def feed(self, chunk: str) -> Iterator[Any]:
+        self.buffer += chunk
+        while True:
+            if self.state == 'key':
+                index = self.buffer.find(self.key)
+                if index < 0:
+                    # 키가 조각 경계에 걸친 경우를 위해 끝부분만 남김
+                    self.buffer = self.buffer[-len(self.key):]
+                    return
+                self.buffer = self.buffer[index + len(self.key):]
+                self.state = 'array'
+            if self.state == 'array':
+                stripped = self.buffer.lstrip().lstrip(':').lstrip()
+                if not stripped:
+                    self.buffer = ''
+                    return
+                if stripped[0] != '[':
+                    # 배열이 아닌 값 (ex: "Data": null) → 항목 없음
+                    self.state = 'done'
+                    return
+                self.buffer = stripped[1:]
+                self.state = 'items'
+            if self.state == 'items':
+                if orjson is not None:
+                    yield from self._batch()
+                yield from self._items()
+                return
+            return
+
+    def _batch(self) -> Iterator[Any]:
+        """버퍼의 마지막 '}' 까지를 배열 하나로 orjson 디코딩
+            - 마지막 '}' 가 문자열 / 중첩 객체 안이면 앞부분이 올바른 JSON 이 아니므로 실패 → _items 가 처리
+        """
+        end = self.buffer.rfind('}')
+        if end < 0:
+            return
+        segment = self.buffer[:end + 1].lstrip(' \t\r\n,')
+        if not segment.startswith('{'):
+            return
+        try:
+            items = orjson.loads(f'[{segment}]')
+        except orjson.JSONDecodeError:
+            return
+        self.buffer = self.buffer[end + 1:]
+        self.count += len(items)
+        yield from items
+
+    def _items(self) -> Iterator[Any]:
+        buffer = self.buffer
+        position = 0
+        length = len(buffer)
+        while True:
+            while position < length and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position >= length:
+                break
+            if buffer[position] == ']':
+                self.state = 'done'
+                position += 1
+                break
+            try:
+                item, end = self.decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # 항목이 아직 다 도착하지 않음
+                break
+            self.count += 1
+            position = end
+            yield item
+        self.buffer = buffer[position:]
+
+    @property
+    def found(self) -> bool:
+        """응답에서 key 를 찾았는지 여부"""
+        return self.state != 'key'
+
+    def close(self):
+        """스트림 종료 시 배열이 끝나지 않았으면 오류"""
+        if self.state in ('array', 'items'):
+            raise ValueError('응답 JSON 이 완전하지 않습니다.')
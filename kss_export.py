@@ -0,0 +1,82 @@
+"""어카운트 대량 내보내기 파일 쓰기 (CSV / Parquet)
+
+    - 행을 KSS_EXPORT_CHUNK 개씩 받아 바로 파일에 추가하므로 전체 결과를 메모리에 올리지 않음
+    - CSV: utf-8-sig (Excel 에서 한글이 깨지지 않도록 BOM 포함)
+    - Parquet: pyarrow 필요 (모든 컬럼 문자열), 묶음마다 row group 하나
+      (pyarrow 는 parquet 파일을 만들 때만 import → MCP 서버 시작 시간에 포함되지 않음)
+    - mcp_scripts.py 의 kss_export Tool 에서 사용 (kss_jobs 백그라운드 작업으로 실행)
+"""
+import csv
+import importlib.util
+import os
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+FORMATS = ('csv', 'parquet')
+
+
+def check_format(file_format: str):
+    """지원하는 형식인지 확인 (내보내기를 시작하기 전에 호출)"""
+    if file_format not in FORMATS:
+        raise ValueError(f'지원하지 않는 형식입니다: {file_format} (사용 가능: {list(FORMATS)})')
+    if file_format == 'parquet' and importlib.util.find_spec('pyarrow') is None:
+        raise ValueError('parquet 형식은 pyarrow 가 필요합니다. (pip install pyarrow)')
+
+
+def export_path(file_format: str, directory: Optional[str] = None) -> str:
+    """내보내기 파일 경로 (KSS_EXPORT_DIR/kss-export-<시각>-<임의값>.<형식>)"""
+    directory = directory or os.getenv("KSS_EXPORT_DIR", 'exports')
+    os.makedirs(directory, exist_ok=True)
+    name = f"kss-export-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}.{file_format}"
+    return os.path.abspath(os.path.join(directory, name))
+
+
+class ExportWriter():
+    """columns 순서로 행(dict) 묶음을 파일에 추가"""
+    def __init__(self, path: str, columns: List[str], file_format: str = 'csv'):
+        check_format(file_format)
+        self.path = path
+        self.columns = columns
+        self.format = file_format
+        self.rows = 0
+        self._file = None
+        self._csv = None
+        self._parquet = None
+        if file_format == 'csv':
+            self._file = open(path, 'w', encoding='utf-8-sig', newline='')
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(columns)
+        else:
+            import pyarrow
+            import pyarrow.parquet
+            self._pyarrow = pyarrow
+            self._schema = pyarrow.schema([(c, pyarrow.string()) for c in columns])
+            self._parquet = pyarrow.parquet.ParquetWriter(path, self._schema)
+
+    def write(self, rows: List[Dict[str, Any]]):
+        if not rows:
+            return
+        if self._csv is not None:
+            self._csv.writerows([[r.get(c, '') for c in self.columns] for r in rows])
+            self._file.flush()
+        else:
+            table = self._pyarrow.table({c: [str(r.get(c, '') or '') for r in rows] for c in self.columns}, schema=self._schema)
+            self._parquet.write_table(table)
+        self.rows += len(rows)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._parquet is not None:
+            self._parquet.close()
+            self._parquet = None
+
+    def discard(self):
+        """실패한 내보내기의 파일 삭제"""
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
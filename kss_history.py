@@ -0,0 +1,174 @@
+"""대화 기록 관리 - 에이전트에 보내는 대화 기록을 모델별 토큰 예산 안으로 유지
+
+    - 최근 KSS_HISTORY_KEEP_TURNS 턴은 그대로 전송
+    - 그보다 오래된 메시지는 롤링 요약 하나로 대체 (요약은 세션별로 저장하여 새로 밀려난 메시지만 추가로 요약)
+    - 긴 Tool 출력과 요약할 메시지의 긴 내용(ex: 검색 결과 표)은 KSS_HISTORY_MAX_MESSAGE_CHARS 자로 축약
+    - 토큰 수: tiktoken 이 설치되어 있으면 사용, 없으면 글자 수 기반 추정
+"""
+import functools
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# 모델별 대화 기록 토큰 예산 (모델명 앞부분 일치, 긴 이름 우선) - KSS_HISTORY_BUDGETS 로 변경 (ex: "gpt-4o=16000,gpt-4.1=24000")
+DEFAULT_HISTORY_BUDGETS = {
+    'gpt-4o-mini': 8000,
+    'gpt-4o': 12000,
+    'gpt-4.1-nano': 8000,
+    'gpt-4.1-mini': 12000,
+    'gpt-4.1': 16000,
+}
+# 메시지 1개당 role / 구분자 토큰
+MESSAGE_OVERHEAD_TOKENS = 4
+SUMMARY_PREFIX = '[이전 대화 요약]\n'
+SUMMARY_PROMPT = (
+    '다음은 KSS(사내 CRM) 에이전트와 사용자의 이전 대화입니다. 이후 대화에 필요한 내용만 한국어로 간결하게 요약하세요.\n'
+    '- 언급된 person_id / company_id / 이름 / 회사명 / 작업 결과(생성, 업데이트, 코멘트)는 반드시 유지\n'
+    '- 인사말, 반복된 안내, 긴 목록의 세부 항목은 생략\n'
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except Exception:
+        try:
+            return tiktoken.get_encoding('o200k_base')
+        except Exception:
+            return None
+
+
+@functools.lru_cache(maxsize=4096)
+def count_tokens(text: str, model: str = '') -> int:
+    """텍스트 토큰 수 (tiktoken 이 없으면 ASCII 4글자당 1토큰, 한글 등은 1글자당 1토큰으로 추정)"""
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    ascii_chars = sum(1 for c in text if c < '\x80')
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+def _content_text(message: Dict[str, Any]) -> str:
+    content = message.get('content', message.get('output', ''))
+    if isinstance(content, list):
+        return ' '.join(str(part.get('text', '')) if isinstance(part, dict) else str(part) for part in content)
+    return str(content or '')
+
+
+def history_budget(model: str) -> int:
+    """모델별 대화 기록 토큰 예산 (KSS_HISTORY_BUDGETS → 기본 표 → KSS_HISTORY_TOKEN_BUDGET)"""
+    budgets = dict(DEFAULT_HISTORY_BUDGETS)
+    for item in os.getenv("KSS_HISTORY_BUDGETS", '').split(','):
+        if '=' in item:
+            name, tokens = item.split('=', 1)
+            budgets[name.strip()] = int(tokens)
+    for name in sorted(budgets, key=len, reverse=True):
+        if model and model.startswith(name):
+            return budgets[name]
+    return int(os.getenv("KSS_HISTORY_TOKEN_BUDGET", 8000))
+
+
+class KSS_History():
+    """Streamlit 세션 하나의 대화 기록 관리 (st.session_state 에 저장)"""
+    def __init__(self, model: Optional[str] = None):
+        self.model = model or os.getenv("OPENAI_MODEL", '')
+        self.budget = history_budget(self.model)
+        self.keep_turns = int(os.getenv("KSS_HISTORY_KEEP_TURNS", 4))
+        self.max_message_chars = int(os.getenv("KSS_HISTORY_MAX_MESSAGE_CHARS", 2000))
+        self.summary_tokens = int(os.getenv("KSS_HISTORY_SUMMARY_TOKENS", 600))
+        self.summary_model = os.getenv("KSS_HISTORY_SUMMARY_MODEL", self.model)
+        self.use_llm = os.getenv("KSS_HISTORY_SUMMARY", "llm").lower() == 'llm'
+        # 롤링 요약 (chat_history 앞에서부터 summarized 개 메시지를 요약한 결과)
+        self.summary = ''
+        self.summarized = 0
+        self.summary_calls = 0
+        self.last_stats: Dict[str, Any] = {}
+
+    def message_tokens(self, message: Dict[str, Any]) -> int:
+        return count_tokens(_content_text(message), self.model) + MESSAGE_OVERHEAD_TOKENS
+
+    def _compact(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """긴 메시지 / Tool 출력을 앞부분만 남기고 축약"""
+        text = _content_text(message)
+        if self.max_message_chars <= 0 or len(text) <= self.max_message_chars:
+            return message
+        short = f'{text[:self.max_message_chars]}… (이하 {len(text) - self.max_message_chars}자 생략)'
+        if 'output' in message and 'content' not in message:
+            return {**message, 'output': short}
+        return {**message, 'content': short}
+
+    def _split(self, messages: List[Dict[str, Any]]) -> Tuple[int, List[Dict[str, Any]]]:
+        """요약할 메시지 수와 그대로 보낼 최근 메시지 (최근 keep_turns 턴, 예산을 넘으면 오래된 것부터 요약으로 이동)
+            - 요약하지 않은 메시지가 keep_turns 의 2배 턴을 넘을 때만 keep_turns 턴으로 줄여서 요약 호출을 몇 턴에 한 번으로 제한
+        """
+        start = self.summarized
+        if len(messages) - start > self.keep_turns * 4:
+            start = len(messages) - self.keep_turns * 2
+        # 요약 자리는 summary_tokens 만큼 비워둠
+        available = self.budget - self.summary_tokens - MESSAGE_OVERHEAD_TOKENS
+        recent = [self._compact(m) if 'output' in m else m for m in messages[start:]]
+        tokens = sum(self.message_tokens(m) for m in recent)
+        # 마지막 메시지(현재 질문)는 항상 그대로 전송
+        while tokens > available and len(recent) > 1:
+            tokens -= self.message_tokens(recent.pop(0))
+            start += 1
+        return start, recent
+
+    async def _summarize_llm(self, previous: str, messages: List[Dict[str, Any]]) -> str:
+        import openai
+        transcript = '\n'.join(f"{m.get('role', 'tool')}: {_content_text(self._compact(m))}" for m in messages)
+        if previous:
+            transcript = f'{SUMMARY_PREFIX}{previous}\n\n[이어진 대화]\n{transcript}'
+        response = await openai.AsyncOpenAI().responses.create(
+            model=self.summary_model,
+            instructions=SUMMARY_PROMPT,
+            input=transcript,
+            max_output_tokens=self.summary_tokens,
+        )
+        return response.output_text.strip()
+
+    def _summarize_extractive(self, previous: str, messages: List[Dict[str, Any]]) -> str:
+        """LLM 없이 각 메시지의 앞부분만 모은 요약 (예산을 넘으면 오래된 줄부터 제거)"""
+        lines = previous.splitlines() if previous else []
+        for m in messages:
+            text = ' '.join(_content_text(m).split())
+            lines.append(f"- {m.get('role', 'tool')}: {text[:150]}{'…' if len(text) > 150 else ''}")
+        while len(lines) > 1 and count_tokens('\n'.join(lines), self.model) > self.summary_tokens:
+            lines.pop(0)
+        return '\n'.join(lines)
+
+    async def build(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """에이전트에 보낼 입력 (요약 메시지 + 최근 메시지)"""
+        if len(messages) < self.summarized:
+            # 대화 기록이 초기화된 경우
+            self.summary, self.summarized = '', 0
+        start, recent = self._split(messages)
+        if start > self.summarized:
+            evicted = messages[self.summarized:start]
+            summary = ''
+            if self.use_llm:
+                try:
+                    summary = await self._summarize_llm(self.summary, evicted)
+                    self.summary_calls += 1
+                except Exception:
+                    summary = ''
+            self.summary = summary or self._summarize_extractive(self.summary, evicted)
+            self.summarized = start
+        result = ([{'role': 'system', 'content': f'{SUMMARY_PREFIX}{self.summary}'}] if self.summary else []) + recent
+        self.last_stats = {
+            'history_messages': len(messages),
+            'sent_messages': len(result),
+            'summarized_messages': self.summarized,
+            'history_tokens': sum(self.message_tokens(m) for m in result),
+            'budget': self.budget,
+        }
+        return result
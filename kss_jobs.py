@@ -0,0 +1,515 @@
+"""장시간 일괄 작업(batch Tool)용 백그라운드 작업 큐
+
+    - 작업은 항목을 KSS_JOB_CHUNK 개씩 나눠 순서대로 처리 (묶음 안에서는 각 Tool 의 동시성 제한으로 병렬 처리)
+    - 파일: jobs/<job_id>.json (상태 / 진행 상황), jobs/<job_id>.items.json (항목, 생성 시 한 번만 기록),
+            jobs/<job_id>.jsonl (결과, 추가만 함)
+    - 조회 작업은 묶음이 끝날 때마다, 쓰기 작업(checkpoint='item')은 항목이 끝날 때마다 결과를 기록 (checkpoint)
+    - 서버가 중단되면 다음 시작 시 결과가 없는 항목부터 이어서 실행
+      (조회 작업은 중단 시점의 묶음을 다시 실행, 쓰기 작업은 끝난 항목을 다시 실행하지 않음)
+    - 실행 중인 작업은 실행하는 프로세스(owner)와 lease 만료 시각을 상태 파일에 기록하고 KSS_JOB_LEASE / 3 초마다 갱신
+      → 공유 서버의 모든 worker 가 주기적으로 lease 가 만료된(owner 가 종료된) 작업을 찾아 가져가서 이어서 실행
+      (상태 파일의 owner 확인과 기록은 jobs/<job_id>.lock 을 만든 프로세스만 실행 → 가져가기와 lease 연장이 겹치지 않음)
+    - 상태 / 결과 조회: mcp_scripts.py 의 kss_job_status / kss_job_result Tool (작업을 등록한 사용자만 조회)
+"""
+import asyncio
+import contextvars
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from kss_logging import current_user
+
+# 작업 상태
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+# 이 프로세스 (작업 owner)
+OWNER = f'{socket.gethostname()}:{os.getpid()}'
+# 목록 조회용 상태 파일 캐시 (경로 → (수정 시각, 목록 항목))
+_meta_cache: Dict[str, tuple] = {}
+_LIST_FIELDS = ('job_id', 'kind', 'user', 'status', 'error', 'completed', 'total', 'created_at', 'updated_at', 'finished_at')
+
+
+class LeaseLost(Exception):
+    """다른 worker 가 작업을 가져가서 이 프로세스는 더 이상 실행하면 안 됨"""
+
+
+def _owner_alive(owner: Optional[str]) -> bool:
+    """owner 프로세스가 살아있는지 (같은 호스트면 pid 로 확인, 다른 호스트는 lease 로만 판단)"""
+    if not owner:
+        return False
+    host, _, pid = owner.rpartition(':')
+    if host != socket.gethostname() or not pid.isdigit():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+class KSS_Job():
+    def __init__(self, job_id: str, kind: str, params: Dict[str, Any], items: List[Any], chunk_size: int,
+                 persist: bool = True):
+        self.id = job_id
+        self.kind = kind
+        self.params = params
+        self.items = items
+        self.chunk_size = max(1, chunk_size)
+        self.persist = persist
+        # 작업을 등록한 사용자 (공유 서버에서 백그라운드 작업 로그 / 목록에 표시)
+        self.user: Optional[str] = current_user.get()
+        self.status = PENDING
+        self.error: Optional[str] = None
+        # 결과: 실행 없이 확정된 결과(prepare) / 묶음 단위 결과 / 항목 단위 결과 (항목 위치 → 결과)
+        self.initial_reports: List[Dict[str, Any]] = []
+        self.chunk_reports: Dict[int, List[Dict[str, Any]]] = {}
+        self.item_reports: Dict[int, Dict[str, Any]] = {}
+        # 실행 중인 프로세스와 lease 만료 시각 (lease 가 지나면 다른 worker 가 가져가서 실행)
+        self.owner: Optional[str] = None
+        self.lease_until = 0.0
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.finished_at: Optional[float] = None
+        self.listeners: List[Callable[[int, int], Awaitable[None]]] = []
+
+    @property
+    def total(self) -> int:
+        return len(self.initial_reports) + len(self.items)
+
+    @property
+    def completed(self) -> int:
+        return len(self.initial_reports) + sum(len(r) for r in self.chunk_reports.values()) + len(self.item_reports)
+
+    @property
+    def reports(self) -> List[Dict[str, Any]]:
+        """지금까지의 결과 (항목 순서)"""
+        reports = list(self.initial_reports)
+        for index in sorted(self.chunk_reports):
+            reports.extend(self.chunk_reports[index])
+        reports.extend(self.item_reports[i] for i in sorted(self.item_reports))
+        return reports
+
+    def meta(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.id,
+            'kind': self.kind,
+            'user': self.user,
+            'status': self.status,
+            'error': self.error,
+            'completed': self.completed,
+            'total': self.total,
+            'owner': self.owner,
+            'lease_until': self.lease_until,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class KSS_JobManager():
+    """작업 종류(kind)별 실행 함수를 등록하고 작업을 실행 / 저장 / 재개"""
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or os.getenv("KSS_JOB_DIR", 'jobs')
+        self.chunk_size = int(os.getenv("KSS_JOB_CHUNK", 50))
+        self.retention_days = float(os.getenv("KSS_JOB_RETENTION_DAYS", 7))
+        self.lease = float(os.getenv("KSS_JOB_LEASE", 60))
+        self.kinds: Dict[str, Dict[str, Any]] = {}
+        self.jobs: Dict[str, KSS_Job] = {}
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self._file_lock = threading.Lock()
+
+    def register(self, kind: str, run_chunk: Callable[..., Awaitable[List[Dict[str, Any]]]],
+                 summarize: Callable[[Dict[str, Any], List[Dict[str, Any]]], Dict[str, Any]],
+                 prepare: Optional[Callable[[List[Any], Dict[str, Any]], tuple]] = None,
+                 checkpoint: str = 'chunk'):
+        """run_chunk(params, items) → 항목별 결과 목록 (items 와 같은 순서), summarize(params, 전체 결과) → Tool 반환값
+            prepare(items, params) → (실행할 항목, 실행 없이 확정된 결과) - ex: 목록 내 중복 제거
+            checkpoint='item': 쓰기 작업 - run_chunk(params, items, on_report) 로 호출하며,
+                               await on_report(묶음 내 위치, 결과) 로 끝난 항목을 바로 기록 (재개 시 다시 실행하지 않음)
+        """
+        if checkpoint not in ('chunk', 'item'):
+            raise ValueError(f'checkpoint 는 chunk 또는 item 이어야 합니다: {checkpoint}')
+        self.kinds[kind] = {'run_chunk': run_chunk, 'summarize': summarize, 'prepare': prepare, 'checkpoint': checkpoint}
+
+    # --- 저장 ---
+    def _path(self, job_id: str, suffix: str) -> str:
+        return os.path.join(self.directory, f'{job_id}{suffix}')
+
+    def _write_json(self, job_id: str, suffix: str, data: Dict[str, Any]):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = self._path(job_id, f'{suffix}.{os.getpid()}.{threading.get_ident()}.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, default=str)
+        os.replace(tmp, self._path(job_id, suffix))
+
+    def _meta_data(self, job: KSS_Job) -> Dict[str, Any]:
+        return {**job.meta(), 'params': job.params, 'chunk_size': job.chunk_size}
+
+    @contextmanager
+    def _locked(self, job_id: str, wait: bool = True):
+        """with self._locked(job_id) as acquired: jobs/<job_id>.lock 을 만든 동안만 상태 파일 확인 / 기록
+            - wait=False 면 다른 프로세스가 lock 을 갖고 있을 때 기다리지 않고 acquired=False
+            - lease 보다 오래된 lock 파일은 lock 을 가진 채 종료된 프로세스의 것으로 보고 삭제
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        lock = self._path(job_id, '.lock')
+        while True:
+            try:
+                fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(lock) > self.lease:
+                        os.remove(lock)
+                        continue
+                except OSError:
+                    continue
+                if not wait:
+                    yield False
+                    return
+                time.sleep(0.01)
+        try:
+            os.write(fd, OWNER.encode('utf-8'))
+            os.close(fd)
+            yield True
+        finally:
+            try:
+                os.remove(lock)
+            except OSError:
+                pass
+
+    def _write_owned(self, job_id: str, data: Dict[str, Any]):
+        """상태 파일의 owner 가 이 프로세스일 때만 기록 (아니면 LeaseLost)"""
+        with self._locked(job_id):
+            try:
+                with open(self._path(job_id, '.json'), encoding='utf-8') as f:
+                    owner = json.load(f).get('owner')
+            except (OSError, ValueError):
+                owner = OWNER
+            if owner not in (None, OWNER):
+                raise LeaseLost(f'{job_id} 작업을 {owner} 가 실행 중입니다.')
+            self._write_json(job_id, '.json', data)
+
+    async def _save_meta(self, job: KSS_Job):
+        """상태 / 진행 상황만 기록 (항목은 생성 시 .items.json 에 한 번만 기록), lease 연장"""
+        if not job.persist:
+            return
+        job.updated_at = time.time()
+        job.lease_until = job.updated_at + self.lease
+        await asyncio.to_thread(self._write_owned, job.id, self._meta_data(job))
+
+    def _append_line(self, job_id: str, line: str):
+        with self._file_lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self._path(job_id, '.jsonl'), 'a', encoding='utf-8') as f:
+                f.write(line)
+
+    async def _append(self, job: KSS_Job, record: Dict[str, Any]):
+        if not job.persist:
+            return
+        line = json.dumps(record, ensure_ascii=False, default=str) + '\n'
+        await asyncio.to_thread(self._append_line, job.id, line)
+
+    def _load(self, job_id: str) -> Optional[KSS_Job]:
+        """이전 서버 프로세스(또는 다른 worker)에서 실행한 작업을 파일에서 복원"""
+        try:
+            with open(self._path(job_id, '.json'), encoding='utf-8') as f:
+                data = json.load(f)
+            if 'items' in data:
+                items = data['items']
+            else:
+                with open(self._path(job_id, '.items.json'), encoding='utf-8') as f:
+                    items = json.load(f)['items']
+        except (OSError, ValueError, KeyError):
+            return None
+        job = KSS_Job(data['job_id'], data['kind'], data['params'], items, data['chunk_size'])
+        job.status = data['status']
+        job.user = data.get('user')
+        job.error = data.get('error')
+        job.created_at = data['created_at']
+        job.updated_at = data['updated_at']
+        job.finished_at = data.get('finished_at')
+        job.owner = data.get('owner')
+        job.lease_until = data.get('lease_until') or 0.0
+        if os.path.exists(self._path(job_id, '.jsonl')):
+            with open(self._path(job_id, '.jsonl'), encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # 기록 도중 중단된 마지막 줄
+                        continue
+                    if 'item' in record:
+                        job.item_reports.setdefault(record['item'], record['report'])
+                    elif record['chunk'] == -1:
+                        job.initial_reports = record['reports']
+                    else:
+                        job.chunk_reports.setdefault(record['chunk'], record['reports'])
+        return job
+
+    # --- 실행 ---
+    def _create(self, kind: str, items: List[Any], params: Optional[Dict[str, Any]], persist: bool) -> KSS_Job:
+        if kind not in self.kinds:
+            raise ValueError(f'알 수 없는 작업 종류입니다: {kind}')
+        params = params or {}
+        initial: List[Dict[str, Any]] = []
+        if self.kinds[kind]['prepare'] is not None:
+            items, initial = self.kinds[kind]['prepare'](items, params)
+        job = KSS_Job(uuid.uuid4().hex[:12], kind, params, list(items), self.chunk_size, persist=persist)
+        job.initial_reports = list(initial)
+        if persist:
+            job.owner = OWNER
+            job.lease_until = time.time() + self.lease
+            # 항목은 여기서 한 번만 기록하고 이후에는 상태 / 결과만 기록
+            self._write_json(job.id, '.items.json', {'items': job.items})
+            if initial:
+                self._append_line(job.id, json.dumps({'chunk': -1, 'reports': initial}, ensure_ascii=False, default=str) + '\n')
+            self._write_json(job.id, '.json', self._meta_data(job))
+        return job
+
+    async def _record_item(self, job: KSS_Job, position: int, report: Dict[str, Any]):
+        if position in job.item_reports:
+            return
+        job.item_reports[position] = report
+        await self._append(job, {'item': position, 'report': report})
+
+    async def _run_chunk(self, job: KSS_Job, index: int, positions: List[int]):
+        kind = self.kinds[job.kind]
+        chunk = [job.items[i] for i in positions]
+        if kind['checkpoint'] == 'item':
+            async def on_report(offset: int, report: Dict[str, Any]):
+                await self._record_item(job, positions[offset], report)
+            reports = await kind['run_chunk'](job.params, chunk, on_report)
+            # on_report 로 기록되지 않은 항목 결과
+            for offset, report in enumerate(reports):
+                await self._record_item(job, positions[offset], report)
+        else:
+            reports = await kind['run_chunk'](job.params, chunk)
+            await self._append(job, {'chunk': index, 'reports': reports})
+            job.chunk_reports[index] = reports
+
+    async def _run(self, job: KSS_Job):
+        if job.persist:
+            # 백그라운드 작업은 새 context 에서 실행되므로 등록한 사용자를 다시 설정
+            current_user.set(job.user)
+        job.status = RUNNING
+        await self._save_meta(job)
+        try:
+            for index, start in enumerate(range(0, len(job.items), job.chunk_size)):
+                if index in job.chunk_reports:
+                    continue
+                positions = [i for i in range(start, min(start + job.chunk_size, len(job.items))) if i not in job.item_reports]
+                if not positions:
+                    continue
+                await self._run_chunk(job, index, positions)
+                await self._save_meta(job)
+                for listener in list(job.listeners):
+                    try:
+                        await listener(job.completed, job.total)
+                    except Exception:
+                        pass
+            job.status = DONE
+        except asyncio.CancelledError:
+            # 서버 종료 - 상태를 running 으로 남겨 다음 시작 시 재개
+            raise
+        except LeaseLost:
+            # 이 프로세스가 멈춰 있는 동안 다른 worker 가 가져감 - 상태 파일은 그 worker 가 기록
+            return
+        except Exception as e:
+            job.status = FAILED
+            job.error = f'{type(e).__name__}: {e}'
+        job.finished_at = time.time()
+        await self._save_meta(job)
+
+    def _start(self, job: KSS_Job):
+        self.jobs[job.id] = job
+        # 작업을 등록한 Tool 호출의 context(메트릭 span / 요청 정보)를 물려받지 않도록 새 context 에서 실행
+        task = asyncio.get_running_loop().create_task(self._run(job), context=contextvars.Context())
+        self.tasks[job.id] = task
+        task.add_done_callback(lambda t: self.tasks.pop(job.id, None))
+
+    def submit(self, kind: str, items: List[Any], params: Optional[Dict[str, Any]] = None) -> KSS_Job:
+        """백그라운드 작업 시작 (바로 반환)"""
+        job = self._create(kind, items, params, persist=True)
+        self._start(job)
+        return job
+
+    async def run(self, kind: str, items: List[Any], params: Optional[Dict[str, Any]] = None,
+                  progress: Optional[Callable[[int, int], Awaitable[None]]] = None) -> Dict[str, Any]:
+        """작업을 파일 저장 없이 바로 실행하고 결과 반환 (Tool 의 일반 호출), 실패하면 {'error': 오류}"""
+        job = self._create(kind, items, params, persist=False)
+        if progress is not None:
+            job.listeners.append(progress)
+        await self._run(job)
+        if job.status == FAILED:
+            return {'error': job.error}
+        return self.kinds[kind]['summarize'](job.params, job.reports)
+
+    def get(self, job_id: str) -> Optional[KSS_Job]:
+        job = self.jobs.get(job_id)
+        if job is None or (job.persist and job.status in (PENDING, RUNNING) and job_id not in self.tasks):
+            # 다른 프로세스(공유 서버의 다른 worker)가 실행 중인 작업은 매번 파일에서 다시 읽음
+            job = self._load(job_id)
+            if job is not None:
+                self.jobs[job_id] = job
+        return job
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.get(job_id)
+        if job is None:
+            return None
+        meta = job.meta()
+        meta['progress'] = round(job.completed / job.total, 4) if job.total else 1.0
+        return meta
+
+    def result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """작업 결과 (진행 중이면 지금까지 처리된 항목의 결과)"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        return self.kinds[job.kind]['summarize'](job.params, job.reports)
+
+    def _expired(self, data: Dict[str, Any]) -> bool:
+        return (data.get('lease_until') or 0) < time.time() or not _owner_alive(data.get('owner'))
+
+    def _claim(self, job_id: str) -> Optional[KSS_Job]:
+        """lease 가 만료된 작업을 이 프로세스가 가져감 (lock 파일을 만든 프로세스 하나만 성공)"""
+        with self._locked(job_id, wait=False) as acquired:
+            if not acquired:
+                return None
+            job = self._load(job_id)
+            if job is None or job.kind not in self.kinds or job.status not in (PENDING, RUNNING):
+                return None
+            if not self._expired({'owner': job.owner, 'lease_until': job.lease_until}):
+                return None
+            job.owner = OWNER
+            job.lease_until = time.time() + self.lease
+            self._write_json(job.id, '.json', self._meta_data(job))
+            return job
+
+    def _claim_expired(self) -> List[KSS_Job]:
+        """lease 가 만료된 끝나지 않은 작업을 가져오고, 보관 기간이 지난 작업 파일 삭제 (파일 IO 만, 스레드에서 실행 가능)"""
+        claimed = []
+        for meta in list_jobs(self.directory, fields=('owner', 'lease_until')):
+            job_id = meta['job_id']
+            if meta['status'] in (PENDING, RUNNING):
+                if job_id in self.tasks or not self._expired(meta):
+                    continue
+                job = self._claim(job_id)
+                if job is not None:
+                    claimed.append(job)
+            elif meta.get('finished_at') and time.time() - meta['finished_at'] > self.retention_days * 86400:
+                for suffix in ('.json', '.items.json', '.jsonl', '.lock'):
+                    try:
+                        os.remove(self._path(job_id, suffix))
+                    except OSError:
+                        pass
+        return claimed
+
+    def resume(self) -> List[str]:
+        """서버 시작 시 호출 - lease 가 만료된(owner 가 종료된) 작업을 가져가서 재개"""
+        claimed = self._claim_expired()
+        for job in claimed:
+            self._start(job)
+        return [job.id for job in claimed]
+
+    def _renew(self, snapshot: List[tuple]) -> List[str]:
+        """lease 연장 기록 → 다른 worker 가 가져간 작업 ID 목록"""
+        lost = []
+        for job_id, data in snapshot:
+            try:
+                self._write_owned(job_id, data)
+            except LeaseLost:
+                lost.append(job_id)
+        return lost
+
+    async def _maintain_once(self, resume: bool, on_resume: Optional[Callable[[List[str]], None]]):
+        now = time.time()
+        snapshot = []
+        for job_id in list(self.tasks):
+            job = self.jobs.get(job_id)
+            if job is not None and job.persist and job.status == RUNNING:
+                job.updated_at, job.lease_until = now, now + self.lease
+                snapshot.append((job_id, self._meta_data(job)))
+        for job_id in await asyncio.to_thread(self._renew, snapshot):
+            task = self.tasks.get(job_id)
+            if task is not None:
+                task.cancel()
+        if resume:
+            claimed = await asyncio.to_thread(self._claim_expired)
+            for job in claimed:
+                self._start(job)
+            if claimed and on_resume is not None:
+                on_resume([job.id for job in claimed])
+
+    async def maintain(self, resume: bool = True, on_resume: Optional[Callable[[List[str]], None]] = None,
+                       on_error: Optional[Callable[[Exception], None]] = None):
+        """서버 실행 중 계속 실행 (KSS_JOB_LEASE / 3 초마다)
+            - 실행 중인 작업의 lease 연장, 다른 worker 가 가져간 작업(이 프로세스가 멈춰 있던 경우)은 중단
+            - resume=True 면 lease 가 만료된 작업(다른 worker 가 종료된 경우 포함)을 가져가서 재개
+            - 한 번의 실행에서 오류(ex: 작업 디렉토리 권한 / 디스크 오류)가 나도 on_error 로 알리고 다음 주기에 다시 실행
+        """
+        while True:
+            try:
+                await self._maintain_once(resume, on_resume)
+            except Exception as e:
+                if on_error is not None:
+                    on_error(e)
+            await asyncio.sleep(self.lease / 3)
+
+    async def shutdown(self):
+        """실행 중인 작업을 멈추고 lease 를 놓아 다른 worker 가 바로 이어서 실행할 수 있게 함"""
+        for task in list(self.tasks.values()):
+            task.cancel()
+        running = [self.jobs[job_id] for job_id in self.tasks if job_id in self.jobs]
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+        for job in running:
+            if job.persist and job.status == RUNNING:
+                job.lease_until = 0.0
+                try:
+                    self._write_owned(job.id, self._meta_data(job))
+                except LeaseLost:
+                    pass
+
+
+def list_jobs(directory: Optional[str] = None, limit: int = 0, user: Optional[str] = None,
+              fields: tuple = ()) -> List[Dict[str, Any]]:
+    """작업 디렉토리의 작업 상태 목록 (최근 생성 순) - Streamlit 화면에서도 사용
+        - user: 지정하면 그 사용자가 등록한 작업만 ('' 이면 사용자 정보 없이 등록된 작업)
+        - 상태 파일은 수정 시각이 바뀐 경우에만 다시 읽음 (항목 / 결과 파일은 읽지 않음)
+    """
+    directory = directory or os.getenv("KSS_JOB_DIR", 'jobs')
+    if not os.path.isdir(directory):
+        return []
+    keys = _LIST_FIELDS + tuple(fields)
+    jobs = []
+    for name in os.listdir(directory):
+        if not name.endswith('.json') or name.endswith('.items.json'):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            cached = _meta_cache.get(path)
+            if cached is None or cached[0] != mtime:
+                with open(path, encoding='utf-8') as f:
+                    data = json.load(f)
+                cached = (mtime, {k: data.get(k) for k in _LIST_FIELDS + ('owner', 'lease_until')})
+                _meta_cache[path] = cached
+        except (OSError, ValueError):
+            continue
+        if user is not None and (cached[1]['user'] or '') != user:
+            continue
+        jobs.append({k: cached[1].get(k) for k in keys})
+    for path in set(_meta_cache) - {os.path.join(directory, n) for n in os.listdir(directory)}:
+        _meta_cache.pop(path, None)
+    jobs.sort(key=lambda j: j['created_at'] or 0, reverse=True)
+    return jobs[:limit] if limit else jobs
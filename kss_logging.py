@@ -0,0 +1,201 @@
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import time
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+from typing import Any, Dict, Optional
+
+# LogRecord 기본 속성 (JSON 출력 시 extra 필드만 골라내기 위함)
+_RECORD_ATTRS = set(logging.LogRecord('', 0, '', 0, '', (), None).__dict__) | {'message', 'asctime', 'sample', 'user_tag'}
+
+# 현재 요청의 사용자 (공유 MCP 서버에서 mcp_main.py 가 tools/call 요청의 _meta 로 전달)
+current_user: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('kss_user', default=None)
+
+
+class JsonLineFormatter(logging.Formatter):
+    """한 줄에 하나의 JSON 객체로 로그 출력 (extra 로 전달한 필드 포함)"""
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'ts': datetime.fromtimestamp(record.created).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3],
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                data[key] = value
+        if record.exc_info:
+            data['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """extra={'sample': True} 로 표시된 대량(batch) 로그를 비율만큼만 통과 (WARNING 이상은 항상 기록)"""
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+        self.sampled_out = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, 'sample', False) or record.levelno >= logging.WARNING or self.rate >= 1:
+            return True
+        if random.random() < self.rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+
+class UserContextFilter(logging.Filter):
+    """현재 요청 사용자를 로그에 추가 (text: [사용자] 접두어, json: user 필드) - 요청을 처리하는 스레드에서 실행"""
+    def filter(self, record: logging.LogRecord) -> bool:
+        user = current_user.get()
+        record.user_tag = f'[{user}] ' if user else ''
+        if user:
+            record.user = user
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """큐가 가득 차면 요청 처리를 막지 않고 로그를 버림"""
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonMessageFormatter(logging.Formatter):
+    """로그 메시지(dict)를 그대로 JSON 한 줄로 출력 (trace span 등 구조화된 기록용)"""
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(record.msg, ensure_ascii=False, default=str)
+
+
+class RecordQueueHandler(DroppingQueueHandler):
+    """record 를 문자열로 바꾸지 않고 큐에 넣음 (JSON 변환은 기록 스레드에서)"""
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+_pipelines: Dict[str, Dict[str, Any]] = {}
+
+def setup_logging(name: str) -> logging.Logger:
+    """ 로그 설정
+        - logs 디렉토리에 자동 저장
+        - Tool 처리 경로에서는 큐에만 넣고, 파일/콘솔 기록은 백그라운드 스레드(QueueListener)에서 수행
+        - 크기(KSS_LOG_MAX_BYTES) 또는 시간(KSS_LOG_ROTATE_WHEN) 기준 로테이션
+        - KSS_LOG_FORMAT=json 이면 파일에 JSON line 형식으로 기록
+        - 대량 로그(extra={'sample': True})는 KSS_LOG_SAMPLE_RATE 비율만 기록
+        - UTF-8 인코딩
+    """
+    # 로그 디렉토리 생성
+    log_dir = os.getenv("KSS_LOG_DIR", 'logs')
+    if not os.path.exists(log_dir):
+        os.makedirs(log_dir)
+
+    # 로거 설정
+    logger = logging.getLogger(name)
+    # 호출한 쪽(ex: benchmark.py 의 WARNING)에서 이미 레벨을 정했으면 유지
+    if logger.level == logging.NOTSET:
+        logger.setLevel(logging.INFO)
+
+    # 핸들러가 중복 추가되는 것을 방지
+    if not logger.handlers:
+        # 공유 서버 worker 는 KSS_LOG_FILE 로 각자 다른 파일에 기록 (여러 프로세스가 같은 파일을 로테이션하지 않도록)
+        log_path = os.path.join(log_dir, os.getenv("KSS_LOG_FILE", 'mcp.log'))
+        backups = int(os.getenv("KSS_LOG_BACKUPS", 5))
+        if os.getenv("KSS_LOG_ROTATE_WHEN"):
+            # 시간 기준 로테이션 (ex: midnight, H)
+            file_handler = TimedRotatingFileHandler(log_path, when=os.getenv("KSS_LOG_ROTATE_WHEN"),
+                                                    backupCount=backups, encoding='utf-8')
+        else:
+            # 크기 기준 로테이션
+            file_handler = RotatingFileHandler(log_path, maxBytes=int(os.getenv("KSS_LOG_MAX_BYTES", 10 * 1024 * 1024)),
+                                               backupCount=backups, encoding='utf-8')
+        if os.getenv("KSS_LOG_FORMAT", 'text').lower() == 'json':
+            file_handler.setFormatter(JsonLineFormatter())
+        else:
+            file_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(user_tag)s%(message)s',
+                                                        datefmt='%Y-%m-%d %H:%M:%S'))
+
+        # 콘솔 출력용 핸들러
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(logging.Formatter('%(levelname)s %(user_tag)s%(message)s'))
+
+        # 큐 기반 비동기 기록
+        log_queue = queue.Queue(maxsize=int(os.getenv("KSS_LOG_QUEUE_SIZE", 10000)))
+        listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+
+        queue_handler = DroppingQueueHandler(log_queue)
+        sampling_filter = SamplingFilter(float(os.getenv("KSS_LOG_SAMPLE_RATE", 0.1)))
+        queue_handler.addFilter(sampling_filter)
+        queue_handler.addFilter(UserContextFilter())
+        logger.addHandler(queue_handler)
+        # 상위 로거(FastMCP 의 root 핸들러)로 전파되어 동기 출력되는 것을 방지
+        logger.propagate = False
+
+        # httpx 의 요청별 INFO 로그는 root(콘솔) 로 동기 출력되므로 WARNING 이상만 기록
+        logging.getLogger('httpx').setLevel(logging.WARNING)
+
+        _pipelines[name] = {'queue': log_queue, 'handler': queue_handler, 'filter': sampling_filter, 'listener': listener}
+
+    return logger
+
+def setup_jsonl_writer(path: str) -> logging.Logger:
+    """dict 를 path 에 JSON line 으로 추가하는 로거 - logger.info(dict)
+        - setup_logging 과 같이 호출한 쪽에서는 큐에만 넣고, JSON 변환 / 파일 기록은 백그라운드 스레드에서 수행
+        - 큐가 가득 차면 버림 (logging_stats(path) 의 dropped)
+    """
+    logger = logging.getLogger(f'kss_jsonl.{path}')
+    if not logger.handlers:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        file_handler = logging.FileHandler(path, encoding='utf-8')
+        file_handler.setFormatter(JsonMessageFormatter())
+        log_queue = queue.Queue(maxsize=int(os.getenv("KSS_LOG_QUEUE_SIZE", 10000)))
+        listener = QueueListener(log_queue, file_handler)
+        listener.start()
+        atexit.register(listener.stop)
+        queue_handler = RecordQueueHandler(log_queue)
+        logger.addHandler(queue_handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        _pipelines[path] = {'queue': log_queue, 'handler': queue_handler, 'filter': None, 'listener': listener}
+    return logger
+
+class LazyLogger():
+    """첫 로그 기록 시 setup_logging 실행 (MCP 서버 시작 시 로그 파일 / 스레드 생성을 미룸)"""
+    def __init__(self, name: str):
+        self.name = name
+        self.init_ms: Optional[float] = None
+        self._logger: Optional[logging.Logger] = None
+
+    def __getattr__(self, attr: str):
+        if self._logger is None:
+            start = time.perf_counter()
+            self._logger = setup_logging(self.name)
+            self.init_ms = round((time.perf_counter() - start) * 1000, 2)
+        return getattr(self._logger, attr)
+
+def logging_stats(name: str) -> Dict[str, Any]:
+    """큐 적재량 / 버려진 로그 수 / 샘플링으로 제외된 로그 수"""
+    pipeline = _pipelines.get(name)
+    if pipeline is None:
+        return {}
+    return {
+        'queued': pipeline['queue'].qsize(),
+        'dropped': pipeline['handler'].dropped,
+        'sampled_out': pipeline['filter'].sampled_out if pipeline['filter'] else 0,
+        'sample_rate': pipeline['filter'].rate if pipeline['filter'] else 1.0,
+    }
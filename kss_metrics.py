@@ -0,0 +1,337 @@
+import asyncio
+import contextvars
+import functools
+import json
+import os
+import random
+import time
+import uuid
+from collections import Counter, deque
+from typing import Any, Callable, Dict, Optional
+
+from kss_logging import setup_jsonl_writer
+
+# 지연시간 히스토그램 버킷 상한(ms)
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, float('inf'))
+# 응답 크기 히스토그램 버킷 상한(bytes)
+PAYLOAD_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, float('inf'))
+
+
+class Histogram():
+    """고정 버킷 히스토그램 (누적이 아닌 버킷별 카운트)"""
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def percentile(self, pct: float) -> float:
+        """버킷 상한 기준 근사 백분위수"""
+        if not self.count:
+            return 0.0
+        target = self.count * pct / 100
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return self.max if bound == float('inf') else min(bound, self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'avg': round(self.sum / self.count, 2) if self.count else 0.0,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'max': round(self.max, 2),
+            'buckets': {('+Inf' if b == float('inf') else str(b)): c for b, c in zip(self.buckets, self.counts)},
+        }
+
+
+class ToolMetrics():
+    def __init__(self):
+        self.calls = 0
+        self.errors: Counter = Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.latency = Histogram()
+        self.http = Histogram()
+        self.queue = Histogram()
+        self.parse = Histogram()
+        self.payload = Histogram(PAYLOAD_BUCKETS)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'calls': self.calls,
+            'errors': dict(self.errors),
+            'in_flight': self.in_flight,
+            'max_in_flight': self.max_in_flight,
+            'latency_ms': self.latency.summary(),
+            'kss_http_ms': self.http.summary(),
+            'queue_wait_ms': self.queue.summary(),
+            'parse_ms': self.parse.summary(),
+            'payload_bytes': self.payload.summary(),
+        }
+
+
+def _merged_seconds(intervals: list) -> float:
+    """겹치는 구간을 합친 실제 시간 (동시에 진행된 요청은 한 번만 계산)"""
+    total, current_start, current_end = 0.0, None, None
+    for start, end in sorted(intervals):
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                total += current_end - current_start
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        total += current_end - current_start
+    return total
+
+
+class _CallContext():
+    """Tool 1회 호출 동안 KSS HTTP 구간 / 스케줄러 대기 구간 / 오류를 누적 (contextvar 로 하위 태스크와 공유)"""
+    __slots__ = ('intervals', 'waits', 'last_error')
+
+    def __init__(self):
+        self.intervals = []
+        self.waits = []
+        self.last_error: Optional[str] = None
+
+    @property
+    def http_calls(self) -> int:
+        return len(self.intervals)
+
+    @property
+    def http_seconds(self) -> float:
+        """동시에 진행된 HTTP 요청 구간을 합친 실제 대기 시간"""
+        return _merged_seconds(self.intervals)
+
+    @property
+    def queue_seconds(self) -> float:
+        """kss_scheduler 대기열에서 기다린 시간 (동시에 기다린 구간은 합침)"""
+        return _merged_seconds(self.waits)
+
+    @property
+    def io_seconds(self) -> float:
+        """HTTP 요청 + 스케줄러 대기 (이 외의 시간이 Tool 자체 처리 시간)"""
+        return _merged_seconds(self.intervals + self.waits)
+
+
+class KSS_Metrics():
+    """MCP Tool 계측
+        - Tool 별 호출 수, 지연시간(KSS HTTP / 스케줄러 대기 / 그 외 처리 시간), 응답 크기(KSS_METRICS_PAYLOAD_SAMPLE 비율만 측정), 오류 종류, 동시 실행 수
+        - KSS 엔드포인트별 HTTP 지연시간 / 상태코드
+        - 최근 호출 span (mcp_main.py 에서 전달한 trace_id 포함)
+    """
+    def __init__(self):
+        self.started_at = time.time()
+        self.tools: Dict[str, ToolMetrics] = {}
+        self.endpoints: Dict[str, Histogram] = {}
+        self.endpoint_status: Dict[str, Counter] = {}
+        # 엔드포인트별 최근 HTTP 응답 시간 표본 (hedge 기준 p95, 히스토그램 버킷 상한이 아닌 실제 값)
+        self.recent_latency: Dict[str, deque] = {}
+        # 재시도 / hedge 등 이벤트 카운터
+        self.events: Counter = Counter()
+        self.in_flight = 0
+        self.spans: deque = deque(maxlen=int(os.getenv("KSS_TRACE_BUFFER", 200)))
+        self.trace_file = os.getenv("KSS_TRACE_FILE", 'logs/trace.jsonl') if os.getenv("KSS_TRACE", "false").lower() == 'true' else None
+        # 응답 크기는 결과를 JSON 으로 다시 변환해야 하므로 일부 호출에서만 측정
+        self.payload_sample_rate = float(os.getenv("KSS_METRICS_PAYLOAD_SAMPLE", 0.1))
+        self._call: contextvars.ContextVar[Optional[_CallContext]] = contextvars.ContextVar('kss_call', default=None)
+        self._endpoint_server: Optional[asyncio.AbstractServer] = None
+
+    def _tool(self, name: str) -> ToolMetrics:
+        if name not in self.tools:
+            self.tools[name] = ToolMetrics()
+        return self.tools[name]
+
+    def record_http(self, endpoint: str, seconds: float, status: Optional[int] = None, error: Optional[str] = None):
+        """KSS_Request 에서 HTTP 요청마다 호출"""
+        if endpoint not in self.endpoints:
+            self.endpoints[endpoint] = Histogram()
+            self.endpoint_status[endpoint] = Counter()
+            self.recent_latency[endpoint] = deque(maxlen=int(os.getenv("KSS_LATENCY_SAMPLES", 200)))
+        self.endpoints[endpoint].observe(seconds * 1000)
+        if not error:
+            self.recent_latency[endpoint].append(seconds * 1000)
+        self.endpoint_status[endpoint][error or str(status)] += 1
+        call = self._call.get()
+        if call is not None:
+            end = time.perf_counter()
+            call.intervals.append((end - seconds, end))
+            if error or (status is not None and status >= 400):
+                call.last_error = error or f'HTTP{status}'
+
+    def record_queue_wait(self, seconds: float):
+        """KSS_Request 에서 kss_scheduler 실행 슬롯을 받을 때까지 기다린 시간 (Tool 처리 시간에서 제외)"""
+        call = self._call.get()
+        if call is not None and seconds > 0:
+            end = time.perf_counter()
+            call.waits.append((end - seconds, end))
+
+    def count(self, event: str, n: int = 1):
+        self.events[event] += n
+
+    def latency_percentile(self, endpoint: str, pct: float, min_count: int = 20) -> Optional[float]:
+        """엔드포인트 최근 HTTP 지연시간 백분위수(ms), 표본이 min_count 개 미만이면 None"""
+        samples = self.recent_latency.get(endpoint)
+        if not samples or len(samples) < min_count:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def instrument(self, fn: Callable, trace_id_getter: Optional[Callable[[], Optional[str]]] = None,
+                   user_getter: Optional[Callable[[], Optional[str]]] = None) -> Callable:
+        """비동기 Tool 함수를 감싸 메트릭 / span 을 기록"""
+        name = fn.__name__
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            tool = self._tool(name)
+            call = _CallContext()
+            token = self._call.set(call)
+            tool.calls += 1
+            tool.in_flight += 1
+            tool.max_in_flight = max(tool.max_in_flight, tool.in_flight)
+            self.in_flight += 1
+            start = time.perf_counter()
+            started_at = time.time()
+            error = None
+            result = None
+            try:
+                result = await fn(*args, **kwargs)
+                if isinstance(result, dict) and 'error' in result:
+                    error = call.last_error or 'ErrorResult'
+                return result
+            except Exception as e:
+                error = type(e).__name__
+                raise
+            finally:
+                self._call.reset(token)
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                http_ms = call.http_seconds * 1000
+                queue_ms = call.queue_seconds * 1000
+                payload = None
+                if result is not None and random.random() < self.payload_sample_rate:
+                    payload = len(json.dumps(result, ensure_ascii=False, default=str).encode('utf-8'))
+                tool.in_flight -= 1
+                self.in_flight -= 1
+                tool.latency.observe(elapsed_ms)
+                tool.http.observe(http_ms)
+                tool.queue.observe(queue_ms)
+                tool.parse.observe(max(0.0, elapsed_ms - call.io_seconds * 1000))
+                if payload is not None:
+                    tool.payload.observe(payload)
+                if error:
+                    tool.errors[error] += 1
+                self._add_span({
+                    'trace_id': trace_id_getter() if trace_id_getter else None,
+                    'span_id': uuid.uuid4().hex[:16],
+                    'tool': name,
+                    'user': user_getter() if user_getter else None,
+                    'start': round(started_at, 3),
+                    'duration_ms': round(elapsed_ms, 2),
+                    'kss_http_ms': round(http_ms, 2),
+                    'kss_http_calls': call.http_calls,
+                    'queue_wait_ms': round(queue_ms, 2),
+                    'payload_bytes': payload,
+                    'error': error,
+                })
+
+        return wrapper
+
+    def _add_span(self, span: Dict[str, Any]):
+        self.spans.append(span)
+        if self.trace_file:
+            write_trace(self.trace_file, {'source': 'mcp_scripts', **span})
+
+    def snapshot(self, recent_spans: int = 20) -> Dict[str, Any]:
+        return {
+            'uptime_seconds': round(time.time() - self.started_at, 1),
+            'in_flight': self.in_flight,
+            'tools': {name: m.summary() for name, m in self.tools.items()},
+            'kss_endpoints': {
+                endpoint: {'latency_ms': hist.summary(), 'status': dict(self.endpoint_status[endpoint])}
+                for endpoint, hist in self.endpoints.items()
+            },
+            'events': dict(self.events),
+            'recent_spans': list(self.spans)[-recent_spans:] if recent_spans else [],
+        }
+
+    def render_prometheus(self) -> str:
+        """Prometheus text 형식 출력"""
+        lines = ['# TYPE kss_tool_calls_total counter']
+        lines += [f'kss_tool_calls_total{{tool="{n}"}} {m.calls}' for n, m in self.tools.items()]
+        lines.append('# TYPE kss_tool_errors_total counter')
+        for n, m in self.tools.items():
+            lines += [f'kss_tool_errors_total{{tool="{n}",error="{e}"}} {c}' for e, c in m.errors.items()]
+        lines.append('# TYPE kss_events_total counter')
+        lines += [f'kss_events_total{{event="{e}"}} {c}' for e, c in self.events.items()]
+        lines.append('# TYPE kss_tool_in_flight gauge')
+        lines += [f'kss_tool_in_flight{{tool="{n}"}} {m.in_flight}' for n, m in self.tools.items()]
+
+        def _histogram(metric: str, labels: str, hist: Histogram):
+            cumulative = 0
+            for bound, count in zip(hist.buckets, hist.counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else bound
+                lines.append(f'{metric}_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f'{metric}_sum{{{labels}}} {round(hist.sum, 3)}')
+            lines.append(f'{metric}_count{{{labels}}} {hist.count}')
+
+        for metric, attr in (('kss_tool_latency_ms', 'latency'), ('kss_tool_http_ms', 'http'),
+                             ('kss_tool_queue_wait_ms', 'queue'), ('kss_tool_parse_ms', 'parse'), ('kss_tool_payload_bytes', 'payload')):
+            lines.append(f'# TYPE {metric} histogram')
+            for n, m in self.tools.items():
+                _histogram(metric, f'tool="{n}"', getattr(m, attr))
+        lines.append('# TYPE kss_endpoint_latency_ms histogram')
+        for endpoint, hist in self.endpoints.items():
+            _histogram('kss_endpoint_latency_ms', f'endpoint="{endpoint}"', hist)
+        return '\n'.join(lines) + '\n'
+
+    async def start_endpoint(self, port: int, host: str = '127.0.0.1'):
+        """로컬 메트릭 엔드포인트 (GET /metrics: Prometheus, GET /stats: JSON)"""
+        if self._endpoint_server is not None:
+            return
+
+        async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+            try:
+                request_line = (await reader.readline()).decode('latin-1')
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                path = request_line.split(' ')[1] if ' ' in request_line else '/'
+                if path.startswith('/stats'):
+                    body, content_type = json.dumps(self.snapshot(), ensure_ascii=False), 'application/json'
+                else:
+                    body, content_type = self.render_prometheus(), 'text/plain; version=0.0.4'
+                data = body.encode('utf-8')
+                writer.write(f'HTTP/1.1 200 OK\r\nContent-Type: {content_type}; charset=utf-8\r\n'
+                             f'Content-Length: {len(data)}\r\nConnection: close\r\n\r\n'.encode('latin-1') + data)
+                await writer.drain()
+            finally:
+                writer.close()
+
+        self._endpoint_server = await asyncio.start_server(_handle, host, port)
+
+
+def write_trace(path: str, record: Dict[str, Any]):
+    """trace span 을 JSON line 으로 기록 (mcp_main.py 와 mcp_scripts.py 가 같은 파일에 trace_id 로 연결)
+        - 큐에만 넣고 파일 기록은 kss_logging 의 기록 스레드에서 수행 (Tool 처리 경로에서 파일 IO 없음)
+    """
+    setup_jsonl_writer(path).info(record)
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex
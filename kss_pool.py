@@ -0,0 +1,106 @@
+"""공유 MCP 서버 pool 실행
+
+    mcp_scripts.py 를 streamable-http 서버 worker 여러 개로 실행하고, 종료된 worker 는 다시 시작합니다.
+    Streamlit(mcp_main.py)은 세션마다 stdio 서버를 띄우는 대신 KSS_MCP_URLS 의 worker 에 연결합니다.
+
+    python kss_pool.py --workers 4 --port 8800
+    → .env 에 KSS_MCP_URLS=http://127.0.0.1:8800/mcp,http://127.0.0.1:8801/mcp,... 설정
+
+    - worker 별 로그 파일: logs/mcp-<번호>.log, KSS 트래픽 기록(KSS_TRANSPORT=record): logs/kss-traffic-<번호>.jsonl.gz
+    - 모든 worker 가 lease 가 만료된 백그라운드 작업을 재개 (작업 파일의 lock 으로 worker 하나만 가져감)
+    - KSS_METRICS_PORT 지정 시 worker 별로 KSS_METRICS_PORT + 번호 사용
+    - KSS 요청 한도(KSS_HOST_CONCURRENCY / KSS_RATE_LIMIT / KSS_RATE_START / KSS_RATE_BURST)는 pool 전체 기준
+      → worker 마다 스케줄러가 따로 있으므로 worker 수로 나눈 값을 각 worker 에 전달 (worker 당 최소 1)
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+from dotenv import load_dotenv
+
+import kss_transport
+
+
+def worker_urls(host: str, port: int, workers: int) -> List[str]:
+    return [f'http://{host}:{port + i}/mcp' for i in range(workers)]
+
+
+def worker_limits(workers: int) -> Dict[str, str]:
+    """pool 전체 KSS 요청 한도를 worker 별 값으로 나눔 (KSS_RATE_LIMIT / KSS_RATE_BURST 는 지정된 경우만)"""
+    limits = {
+        'KSS_HOST_CONCURRENCY': str(max(1, int(os.getenv("KSS_HOST_CONCURRENCY", 10)) // workers)),
+        'KSS_RATE_START': f'{float(os.getenv("KSS_RATE_START", 50)) / workers:g}',
+    }
+    for name in ('KSS_RATE_LIMIT', 'KSS_RATE_BURST'):
+        if os.getenv(name):
+            # 토큰 버킷 크기가 1 보다 작으면 bulk 요청이 실행되지 않으므로 최소 1
+            limits[name] = f'{max(1.0, float(os.getenv(name)) / workers):g}'
+    return limits
+
+
+def start_worker(index: int, host: str, port: int, workers: int) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update(worker_limits(workers))
+    env['KSS_LOG_FILE'] = f'mcp-{index}.log'
+    # 여러 worker 가 같은 gzip 파일에 기록하지 않도록 worker 별 파일 사용
+    env['KSS_TRANSPORT_LOG'] = kss_transport.worker_log_path(index)
+    env['KSS_JOB_RESUME'] = 'true'
+    if os.getenv("KSS_METRICS_PORT"):
+        env['KSS_METRICS_PORT'] = str(int(os.getenv("KSS_METRICS_PORT")) + index)
+    return subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mcp_scripts.py'),
+         '--transport', 'streamable-http', '--host', host, '--port', str(port + index)],
+        env=env,
+    )
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description='공유 MCP 서버 pool 실행')
+    parser.add_argument('--workers', type=int, default=int(os.getenv("KSS_MCP_WORKERS", 2)))
+    parser.add_argument('--host', default=os.getenv("KSS_MCP_HOST", '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.getenv("KSS_MCP_PORT", 8800)), help='첫 번째 worker 포트 (이후 +1 씩)')
+    args = parser.parse_args()
+
+    workers: Dict[int, subprocess.Popen] = {i: start_worker(i, args.host, args.port, args.workers) for i in range(args.workers)}
+    restarts: Dict[int, float] = {}
+    print(f"KSS_MCP_URLS={','.join(worker_urls(args.host, args.port, args.workers))}", flush=True)
+    print(f'worker 별 KSS 요청 한도: {worker_limits(args.workers)}', flush=True)
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    try:
+        while not stopping:
+            time.sleep(1)
+            for index, proc in list(workers.items()):
+                if proc.poll() is None:
+                    continue
+                # 연속으로 바로 종료되는 경우 재시작 간격을 둠
+                if time.monotonic() - restarts.get(index, 0) < 5:
+                    continue
+                print(f'worker {index} 종료 (code {proc.returncode}), 다시 시작합니다.', flush=True)
+                restarts[index] = time.monotonic()
+                workers[index] = start_worker(index, args.host, args.port, args.workers)
+    finally:
+        for proc in workers.values():
+            if proc.poll() is None:
+                proc.terminate()
+        for proc in workers.values():
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+if __name__ == '__main__':
+    main()
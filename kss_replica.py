@@ -0,0 +1,327 @@
+"""KSS 어카운트 로컬 복제본 (SQLite + FTS5)
+
+PERSON / Company Info 행을 로컬 SQLite 에 보관하여 조회 / 검색을 KSS 요청 없이 처리
+    - KSS_REPLICA_PATH 지정 시 mcp_scripts.py 의 조회 Tool 이 복제본을 먼저 사용 (신선도 KSS_REPLICA_MAX_AGE 이내)
+    - 실시간 조회 결과와 Tool 을 통한 쓰기 결과는 복제본에 바로 반영
+    - 동기화 작업: 오래된 회사부터 COMPID 단위로 다시 받아 갱신 (회사 정보 + 소속 어카운트 전체)
+
+실행:
+    python kss_replica.py sync                         # 오래된(KSS_REPLICA_MAX_AGE 초과) 회사만 갱신
+    python kss_replica.py sync --full                  # 복제본의 모든 회사 갱신
+    python kss_replica.py sync --company C12345 --name Kim   # 회사 ID / 이름 검색 결과로 복제본 채우기
+    python kss_replica.py stats
+"""
+import argparse
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+PERSON_FIELDS = ['company', 'company_id', 'name', 'url', 'mobile', 'position', 'email', 'country', 'comment', 'account_manager']
+COMPANY_FIELDS = ['company_name', 'url', 'tel1', 'tel2', 'email', 'country', 'address', 'comment', 'account_manager', 'CompanyInfoId']
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS persons (
+    person_id TEXT PRIMARY KEY,
+    {person_columns},
+    name_key TEXT,
+    company_key TEXT,
+    synced_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS persons_company ON persons(company_id);
+CREATE TABLE IF NOT EXISTS companies (
+    company_id TEXT PRIMARY KEY,
+    {company_columns},
+    synced_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS companies_synced ON companies(synced_at);
+CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value TEXT);
+CREATE VIRTUAL TABLE IF NOT EXISTS persons_fts USING fts5(
+    name, company, name_key, company_key, content='persons', content_rowid='rowid', tokenize='{tokenizer}'
+);
+CREATE TRIGGER IF NOT EXISTS persons_ai AFTER INSERT ON persons BEGIN
+    INSERT INTO persons_fts(rowid, name, company, name_key, company_key) VALUES (new.rowid, new.name, new.company, new.name_key, new.company_key);
+END;
+CREATE TRIGGER IF NOT EXISTS persons_ad AFTER DELETE ON persons BEGIN
+    INSERT INTO persons_fts(persons_fts, rowid, name, company, name_key, company_key) VALUES ('delete', old.rowid, old.name, old.company, old.name_key, old.company_key);
+END;
+CREATE TRIGGER IF NOT EXISTS persons_au AFTER UPDATE ON persons BEGIN
+    INSERT INTO persons_fts(persons_fts, rowid, name, company, name_key, company_key) VALUES ('delete', old.rowid, old.name, old.company, old.name_key, old.company_key);
+    INSERT INTO persons_fts(rowid, name, company, name_key, company_key) VALUES (new.rowid, new.name, new.company, new.name_key, new.company_key);
+END;
+'''
+
+
+_TAG = re.compile(r'<[^>]+>')
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+def _strip_tags(text: str) -> str:
+    """회사명의 <font> 등 HTML 태그 제거"""
+    return _TAG.sub('', text or '').strip()
+
+
+def _normalize(text: str) -> str:
+    """별칭 / 표기 차이 흡수용 정규화 (태그 / 공백 / 특수문자 제거 후 소문자, ex: 'SK hynix' → 'skhynix')"""
+    return _NON_WORD.sub('', _strip_tags(text).lower())
+
+
+class KSS_Replica():
+    """KSS 어카운트 로컬 복제본"""
+    def __init__(self, path: str, max_age: Optional[float] = None):
+        self.path = path
+        self.max_age = max_age if max_age is not None else float(os.getenv("KSS_REPLICA_MAX_AGE", 86400))
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.trigram = self._create_schema()
+
+    def _create_schema(self) -> bool:
+        """FTS5 trigram 토크나이저(부분 문자열 검색) 사용, 지원하지 않는 SQLite 면 unicode61 사용"""
+        person_columns = ',\n    '.join(f'"{f}" TEXT' for f in PERSON_FIELDS)
+        company_columns = ',\n    '.join(f'"{f}" TEXT' for f in COMPANY_FIELDS)
+        for tokenizer in ('trigram', 'unicode61'):
+            try:
+                with self.conn:
+                    self.conn.executescript(SCHEMA.format(person_columns=person_columns, company_columns=company_columns, tokenizer=tokenizer))
+                return tokenizer == 'trigram'
+            except sqlite3.OperationalError:
+                continue
+        raise RuntimeError('SQLite FTS5 를 사용할 수 없습니다.')
+
+    def _fresh(self, synced_at: float) -> bool:
+        return time.time() - synced_at <= self.max_age
+
+    # --- 쓰기 ---
+    def upsert_persons(self, items: Iterable[tuple], synced_at: Optional[float] = None):
+        """(person_id, 어카운트 상세정보 dict) 목록 저장 (synced_at=0: 검색에는 포함, 상세 조회 시 KSS 에서 다시 받음)"""
+        synced_at = time.time() if synced_at is None else synced_at
+        columns = ['person_id', *PERSON_FIELDS, 'name_key', 'company_key', 'synced_at']
+        rows = []
+        for person_id, data in items:
+            if not person_id:
+                continue
+            values = [str(data.get(f, '') or '') for f in PERSON_FIELDS]
+            rows.append([person_id.upper(), *values, _normalize(data.get('name', '')), _normalize(data.get('company', '')), synced_at])
+        if not rows:
+            return
+        quoted = ', '.join(f'"{c}"' for c in columns)
+        updates = ', '.join(f'"{c}" = excluded."{c}"' for c in columns[1:])
+        with self._lock, self.conn:
+            self.conn.executemany(
+                f'INSERT INTO persons ({quoted}) VALUES ({", ".join("?" * len(columns))}) '
+                f'ON CONFLICT(person_id) DO UPDATE SET {updates}', rows)
+
+    def upsert_company(self, company_id: str, data: Dict[str, Any], synced_at: Optional[float] = None):
+        columns = ['company_id', *COMPANY_FIELDS, 'synced_at']
+        values = [company_id.upper(), *[str(data.get(f, '') or '') for f in COMPANY_FIELDS], synced_at or time.time()]
+        quoted = ', '.join(f'"{c}"' for c in columns)
+        updates = ', '.join(f'"{c}" = excluded."{c}"' for c in columns[1:])
+        with self._lock, self.conn:
+            self.conn.execute(
+                f'INSERT INTO companies ({quoted}) VALUES ({", ".join("?" * len(columns))}) '
+                f'ON CONFLICT(company_id) DO UPDATE SET {updates}', values)
+
+    def mark_stale(self, person_id: str):
+        """Tool 로 변경된 어카운트는 다음 조회 시 KSS 에서 다시 받도록 표시"""
+        with self._lock, self.conn:
+            self.conn.execute('UPDATE persons SET synced_at = 0 WHERE person_id = ?', (person_id.upper(),))
+
+    def remove_missing_persons(self, company_id: str, keep_ids: List[str]):
+        """회사 단위 동기화 시 KSS 에서 더 이상 조회되지 않는 어카운트 삭제"""
+        keep = [i.upper() for i in keep_ids]
+        with self._lock, self.conn:
+            self.conn.execute(
+                f'DELETE FROM persons WHERE company_id = ? AND person_id NOT IN ({", ".join("?" * len(keep))})',
+                [company_id.upper(), *keep])
+
+    def set_state(self, key: str, value: Any):
+        with self._lock, self.conn:
+            self.conn.execute('INSERT INTO sync_state (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value',
+                              (key, str(value)))
+
+    def get_state(self, key: str) -> Optional[str]:
+        row = self.conn.execute('SELECT value FROM sync_state WHERE key = ?', (key,)).fetchone()
+        return row['value'] if row else None
+
+    # --- 읽기 ---
+    def get_person(self, person_id: str) -> Optional[Dict[str, Any]]:
+        """신선도 기준 이내인 어카운트 상세정보 (없거나 오래되었으면 None)"""
+        row = self.conn.execute('SELECT * FROM persons WHERE person_id = ?', (person_id.strip().upper(),)).fetchone()
+        if row is None or not self._fresh(row['synced_at']):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return {f: row[f] for f in PERSON_FIELDS}
+
+    def get_company(self, company_id: str) -> Optional[Dict[str, Any]]:
+        row = self.conn.execute('SELECT * FROM companies WHERE company_id = ?', (company_id.strip().upper(),)).fetchone()
+        if row is None or not self._fresh(row['synced_at']):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return {'company_id': row['company_id'], **{f: row[f] for f in COMPANY_FIELDS}}
+
+    def search_ready(self) -> bool:
+        """마지막 동기화가 신선도 기준 이내일 때만 검색을 복제본으로 처리"""
+        last_sync = self.get_state('last_sync')
+        return last_sync is not None and self._fresh(float(last_sync))
+
+    def _term(self, column: str, query: str) -> tuple:
+        """검색어 조건 (trigram 은 3글자 이상 부분 문자열 MATCH, 그 외는 LIKE)"""
+        normalized = _normalize(query)
+        if self.trigram and len(query) >= 3:
+            phrase = query.replace('"', '""')
+            alias = normalized.replace('"', '""')
+            match = f'{column} : "{phrase}"' + (f' OR {column}_key : "{alias}"' if len(alias) >= 3 else '')
+            return 'p.rowid IN (SELECT rowid FROM persons_fts WHERE persons_fts MATCH ?)', [match]
+        return f'(p."{column}" LIKE ? OR p.{column}_key LIKE ?)', [f'%{query}%', f'%{normalized}%']
+
+    def search(self, name: str, company: str = '', limit: int = 500) -> List[Dict[str, Any]]:
+        """이름(필수) / 회사명(선택) 부분 일치 검색 - 검색 Tool 과 같은 필드 반환"""
+        conditions, params = [], []
+        for column, query in (('name', name.strip()), ('company', company.strip())):
+            if query:
+                condition, values = self._term(column, query)
+                conditions.append(condition)
+                params += values
+        where = ' AND '.join(conditions) or '1 = 1'
+        rows = self.conn.execute(
+            f'SELECT * FROM persons p WHERE {where} ORDER BY p.rowid LIMIT ?', [*params, limit]).fetchall()
+        self.hits += 1
+        return [{
+            'person_id': row['person_id'],
+            'company': _strip_tags(row['company']),
+            'company_id': row['company_id'],
+            'name': row['name'],
+            'position': row['position'],
+            'country': row['country'],
+            'account_manager': row['account_manager'],
+        } for row in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        persons = self.conn.execute('SELECT COUNT(*) FROM persons').fetchone()[0]
+        companies = self.conn.execute('SELECT COUNT(*) FROM companies').fetchone()[0]
+        return {
+            'path': self.path,
+            'persons': persons,
+            'companies': companies,
+            'hits': self.hits,
+            'misses': self.misses,
+            'max_age': self.max_age,
+            'last_sync': self.get_state('last_sync'),
+            'search_ready': self.search_ready(),
+            'tokenizer': 'trigram' if self.trigram else 'unicode61',
+        }
+
+
+async def sync(replica: KSS_Replica, fetch_company_rows: Callable, fetch_search_rows: Callable,
+               to_person: Callable, to_company: Callable, company_ids: Optional[List[str]] = None,
+               names: Optional[List[str]] = None, full: bool = False, limit: Optional[int] = None,
+               concurrency: int = 4) -> Dict[str, Any]:
+    """복제본 증분 동기화
+        - company_ids 미지정 시 synced_at 이 오래된 회사부터 (full 이면 전체) COMPID 단위로 갱신
+        - names 가 있으면 이름 검색 결과로 신규 어카운트 / 회사 발견
+        - fetch_company_rows(company_id) / fetch_search_rows(name): AC0180MSearchAll.do 행 목록 반환
+    """
+    started = time.time()
+    report = {'companies': 0, 'persons': 0, 'errors': []}
+    discovered = set(i.upper() for i in company_ids or [])
+
+    for name in names or []:
+        rows = await fetch_search_rows(name)
+        persons = [(r.get('personid', ''), to_person(r)) for r in rows if r.get('gubun') == 'PERSON']
+        replica.upsert_persons(persons)
+        report['persons'] += len(persons)
+        discovered.update(r.get('compid', '').upper() for r in rows if r.get('compid'))
+
+    if not company_ids:
+        cutoff = time.time() if full else time.time() - replica.max_age
+        stale = replica.conn.execute('SELECT company_id FROM companies WHERE synced_at <= ? ORDER BY synced_at', (cutoff,)).fetchall()
+        orphan = replica.conn.execute(
+            'SELECT DISTINCT company_id FROM persons WHERE company_id != "" AND company_id NOT IN (SELECT company_id FROM companies)').fetchall()
+        discovered.update(row[0] for row in [*stale, *orphan])
+    targets = sorted(discovered)[:limit] if limit else sorted(discovered)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _sync_company(company_id: str):
+        async with semaphore:
+            try:
+                rows = await fetch_company_rows(company_id)
+            except Exception as e:
+                report['errors'].append({'company_id': company_id, 'error': str(e)})
+                return
+        synced_at = time.time()
+        rows = [r for r in rows if str(r.get('compid', '')).upper() == company_id]
+        persons = [(r.get('personid', ''), to_person(r)) for r in rows if r.get('gubun') == 'PERSON']
+        replica.upsert_persons(persons, synced_at)
+        replica.remove_missing_persons(company_id, [pid for pid, _ in persons if pid])
+        for row in rows:
+            if row.get('personnmdesc') == 'Company Info':
+                replica.upsert_company(company_id, to_company(row), synced_at)
+                break
+        report['companies'] += 1
+        report['persons'] += len(persons)
+
+    await asyncio.gather(*[_sync_company(c) for c in targets])
+    # 전체 대상 동기화가 끝난 경우에만 검색 신선도 갱신
+    if not report['errors'] and not limit:
+        replica.set_state('last_sync', started)
+    report['seconds'] = round(time.time() - started, 2)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='KSS 어카운트 로컬 복제본 관리')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sync_parser = sub.add_parser('sync', help='복제본 동기화')
+    sync_parser.add_argument('--full', action='store_true', help='신선도와 관계없이 모든 회사 갱신')
+    sync_parser.add_argument('--company', action='append', help='동기화할 회사 ID (여러 번 지정 가능)')
+    sync_parser.add_argument('--name', action='append', help='이름 검색으로 신규 어카운트 발견 (여러 번 지정 가능)')
+    sync_parser.add_argument('--limit', type=int, help='이번 실행에서 갱신할 최대 회사 수')
+    sync_parser.add_argument('--concurrency', type=int, default=4)
+    sub.add_parser('stats', help='복제본 통계')
+    args = parser.parse_args()
+
+    import mcp_scripts
+    replica = mcp_scripts.kss_replica
+    if replica is None:
+        parser.error('KSS_REPLICA_PATH 환경변수를 지정해주세요.')
+
+    if args.command == 'stats':
+        print(replica.stats())
+        return
+
+    async def _run():
+        try:
+            return await sync(
+                replica,
+                fetch_company_rows=mcp_scripts.fetch_company_rows,
+                fetch_search_rows=mcp_scripts.fetch_search_rows,
+                to_person=mcp_scripts._account_from_row,
+                to_company=mcp_scripts._company_from_row,
+                company_ids=args.company,
+                names=args.name,
+                full=args.full,
+                limit=args.limit,
+                concurrency=args.concurrency,
+            )
+        finally:
+            await mcp_scripts.kss_request.aclose()
+
+    print(asyncio.run(_run()))
+
+
+if __name__ == "__main__":
+    main()
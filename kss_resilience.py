@@ -0,0 +1,111 @@
+import os
+import random
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+# 엔드포인트별 기본 타임아웃(초) - KSS_ENDPOINT_TIMEOUTS 로 변경 (ex: "AC0180MSearchAll.do=8,AC0140PCmtSave.do=20")
+DEFAULT_ENDPOINT_TIMEOUTS = {
+    'AC0180MSearchAll.do': 10.0,
+    'AC0140PMobileCheck.do': 5.0,
+    'AC0140PAutoCompleteEmail.do': 5.0,
+    'AC0140PCmtSave.do': 15.0,
+    'AC0140PAccountSave.do': 15.0,
+}
+
+
+class CircuitOpenError(Exception):
+    """KSS 서버가 불안정하여 요청을 보내지 않고 바로 실패"""
+
+
+class RetryPolicy():
+    """엔드포인트별 타임아웃 + 멱등(조회) 요청의 지수 백오프(full jitter) 재시도
+        - 전체 재시도 시간은 KSS_RETRY_BUDGET(기본 MCP_DELAY 의 80%) 이내로 제한하여 MCP 클라이언트 타임아웃 전에 응답
+    """
+    def __init__(self):
+        self.timeouts = dict(DEFAULT_ENDPOINT_TIMEOUTS)
+        for item in os.getenv("KSS_ENDPOINT_TIMEOUTS", '').split(','):
+            if '=' in item:
+                endpoint, seconds = item.split('=', 1)
+                self.timeouts[endpoint.strip()] = float(seconds)
+        self.default_timeout = float(os.getenv("KSS_TIMEOUT_DEFAULT", 10))
+        self.attempts = max(1, int(os.getenv("KSS_RETRY_ATTEMPTS", 3)))
+        self.base_delay = float(os.getenv("KSS_RETRY_BASE_DELAY", 0.2))
+        self.max_delay = float(os.getenv("KSS_RETRY_MAX_DELAY", 2))
+        self.budget = float(os.getenv("KSS_RETRY_BUDGET", float(os.getenv("MCP_DELAY", 30)) * 0.8))
+
+    def timeout(self, endpoint: str) -> float:
+        return self.timeouts.get(endpoint, self.default_timeout)
+
+    def delay(self, attempt: int) -> float:
+        """attempt 번째 실패 후 대기 시간 (0 ~ min(max_delay, base × 2^(attempt-1)) 사이 임의값)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def can_retry(self, attempt: int, started: float, delay: float, timeout: float) -> bool:
+        """남은 시도 횟수 / 시간 예산 안에서 한 번 더 시도할 수 있는지"""
+        return attempt < self.attempts and time.monotonic() - started + delay + timeout <= self.budget
+
+
+def is_transient(error: Optional[BaseException] = None, status: Optional[int] = None) -> bool:
+    """재시도 / 회로 차단 판단 대상 (연결 오류, 타임아웃, 5xx)"""
+    if error is not None:
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code >= 500
+        return isinstance(error, httpx.TransportError)
+    return status is not None and status >= 500
+
+
+class CircuitBreaker():
+    """연속 실패가 KSS_BREAKER_FAILURES 회 이상이면 KSS_BREAKER_RESET 초 동안 요청을 바로 실패시키고,
+    이후 한 번의 시험 요청(half-open)이 성공하면 정상 상태로 복귀
+    """
+    def __init__(self, failure_threshold: Optional[int] = None, reset_timeout: Optional[float] = None):
+        self.failure_threshold = failure_threshold or int(os.getenv("KSS_BREAKER_FAILURES", 5))
+        self.reset_timeout = reset_timeout or float(os.getenv("KSS_BREAKER_RESET", 30))
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opened_count = 0
+        self.rejected = 0
+        self._probing = False
+        self._probe_started = 0.0
+
+    def check(self):
+        """요청 전 호출 - 차단 중이면 CircuitOpenError"""
+        if self.state == 'open':
+            remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+            if remaining > 0:
+                self.rejected += 1
+                raise CircuitOpenError(f'KSS 서버 응답이 불안정하여 요청을 일시 중단했습니다. ({remaining:.0f}초 후 재시도)')
+            self.state = 'half_open'
+            self._probing = False
+        if self.state == 'half_open':
+            # 시험 요청이 결과 없이 끝난 경우(ex: 취소)를 대비해 reset_timeout 이 지나면 다시 시험
+            if self._probing and time.monotonic() - self._probe_started < self.reset_timeout:
+                self.rejected += 1
+                raise CircuitOpenError('KSS 서버 상태 확인 중입니다. 잠시 후 다시 시도해주세요.')
+            self._probing = True
+            self._probe_started = time.monotonic()
+
+    def record_success(self):
+        self.state = 'closed'
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == 'half_open' or self.failures >= self.failure_threshold:
+            if self.state != 'open':
+                self.opened_count += 1
+            self.state = 'open'
+            self.opened_at = time.monotonic()
+            self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'state': self.state,
+            'consecutive_failures': self.failures,
+            'opened': self.opened_count,
+            'rejected': self.rejected,
+        }
@@ -0,0 +1,196 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import os
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Dict, Optional
+
+from kss_metrics import Histogram
+
+# 요청 우선순위 (숫자가 작을수록 먼저 실행)
+INTERACTIVE = 0
+BULK = 1
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BULK: 'bulk'}
+
+
+class KSS_Scheduler():
+    """KSS 요청 스케줄러
+        - 토큰 버킷으로 초당 요청 수 제한 (버스트 KSS_RATE_BURST)
+            KSS_RATE_LIMIT 지정 시: 그 값이 상한
+            미지정 시: KSS_RATE_START 에서 시작하여, 토큰이 부족해 요청이 기다리는 동안 정상 응답이 오면 속도를 올려 봄 (상한 없음)
+        - 동시 요청 수 제한 (최대 KSS_HOST_CONCURRENCY)
+        - 429 / 5xx / 연결 오류 / 지연시간 급증 시 동시성과 요청 속도를 줄이고(×0.7), 정상 응답이 이어지면 천천히 회복 (AIMD)
+        - 대기열은 우선순위 순서 (단건 조회 등 interactive 요청이 일괄 작업(bulk)보다 먼저 실행)
+        - interactive 요청은 동시성 제한만 적용하고 토큰 버킷은 기다리지 않음 (사용한 토큰은 빚으로 남아 bulk 요청이 그만큼 늦게 실행)
+        - 지연시간은 응답을 받기까지의 시간(응답 본문 처리 제외)으로, 엔드포인트별 기준과 비교
+    """
+    def __init__(self, max_concurrency: Optional[int] = None, rate: Optional[float] = None, burst: Optional[float] = None):
+        self.max_concurrency = max_concurrency or int(os.getenv("KSS_HOST_CONCURRENCY", 10))
+        self.min_concurrency = 1
+        self.limit = float(self.max_concurrency)
+        # None: 상한 없이 KSS 응답(오류 / 지연시간)을 보며 조절
+        self.max_rate = rate or float(os.getenv("KSS_RATE_LIMIT", 0)) or None
+        self.rate = self.max_rate or float(os.getenv("KSS_RATE_START", 50))
+        self.min_rate = max(0.5, self.rate * 0.05)
+        # 토큰이 부족해 대기열이 생긴 적이 있는지 (상한이 없을 때 속도를 올릴지 판단)
+        self._rate_limited = False
+        self.burst = burst or float(os.getenv("KSS_RATE_BURST", self.max_concurrency))
+        self.tokens = self.burst
+        # 지연시간 기준: KSS_LATENCY_TARGET_MS 지정 시 고정값, 아니면 정상 응답 평균의 KSS_LATENCY_FACTOR 배
+        self.latency_target_ms = float(os.getenv("KSS_LATENCY_TARGET_MS", 0))
+        self.latency_factor = float(os.getenv("KSS_LATENCY_FACTOR", 3))
+        # 엔드포인트별 정상 응답 시간 이동 평균 (5ms 중복 체크와 수 초 걸리는 검색을 같은 기준으로 비교하지 않도록)
+        self.baseline_ms: Dict[str, float] = {}
+
+        self.in_flight = 0
+        self._updated = time.monotonic()
+        self._last_backoff = 0.0
+        self._waiters: list = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._priority: contextvars.ContextVar[int] = contextvars.ContextVar('kss_priority', default=INTERACTIVE)
+
+        self.started = 0
+        self.backoffs = 0
+        self.max_queued = 0
+        self.wait_ms = {level: Histogram() for level in PRIORITY_NAMES}
+
+    @contextmanager
+    def bulk(self):
+        """with 블록 안에서 (하위 태스크 포함) 보내는 KSS 요청을 bulk 우선순위로 처리"""
+        token = self._priority.set(BULK)
+        try:
+            yield
+        finally:
+            self._priority.reset(token)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _take_token(self, priority: int) -> bool:
+        """토큰 사용 (interactive 는 토큰이 없어도 -burst 까지 빚으로 사용)"""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        if priority == INTERACTIVE:
+            self.tokens = max(-self.burst, self.tokens - 1)
+            return True
+        return False
+
+    def _dispatch(self):
+        """동시성 / 토큰이 허용하는 만큼 대기열 앞에서부터 실행"""
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = None
+        while self._waiters and self.in_flight < int(self.limit):
+            priority, _, future, _ = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if not self._take_token(priority):
+                self._rate_limited = True
+                # 다음 토큰이 생길 때 다시 실행
+                self._timer = asyncio.get_running_loop().call_later((1 - self.tokens) / self.rate, self._dispatch)
+                return
+            heapq.heappop(self._waiters)
+            self.in_flight += 1
+            future.set_result(None)
+
+    async def acquire(self):
+        priority = self._priority.get()
+        enqueued = time.perf_counter()
+        # 앞에 같은 / 높은 우선순위 대기 요청이 없으면 바로 실행
+        ahead = self._waiters and self._waiters[0][0] <= priority
+        if not ahead and self.in_flight < int(self.limit):
+            if self._take_token(priority):
+                self.in_flight += 1
+                self.started += 1
+                self.wait_ms[priority].observe(0.0)
+                return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future, enqueued))
+        self.max_queued = max(self.max_queued, len(self._waiters))
+        if self._timer is None or priority == INTERACTIVE:
+            # interactive 요청은 토큰 대기 타이머를 기다리지 않음
+            self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # 실행 슬롯을 받은 직후 취소된 경우 반납
+                self.release(0.0)
+            raise
+        self.started += 1
+        self.wait_ms[priority].observe((time.perf_counter() - enqueued) * 1000)
+
+    def release(self, seconds: float, status: Optional[int] = None, error: Optional[str] = None, endpoint: str = ''):
+        """요청 종료 시 호출 - 응답 상태 / 응답 시간(seconds)으로 동시성과 요청 속도 조정"""
+        self.in_flight -= 1
+        latency_ms = seconds * 1000
+        baseline = self.baseline_ms.get(endpoint)
+        threshold = self.latency_target_ms or (baseline * self.latency_factor if baseline else 0)
+        overloaded = bool(error) or status == 429 or (status is not None and status >= 500) \
+            or (threshold > 0 and latency_ms > max(threshold, 50))
+        now = time.monotonic()
+        if overloaded:
+            # 같은 과부하 구간에서 연속으로 줄이지 않도록 최소 1초 간격
+            if now - self._last_backoff >= max(1.0, seconds):
+                self.limit = max(self.min_concurrency, self.limit * 0.7)
+                self.rate = max(self.min_rate, self.rate * 0.7)
+                self._last_backoff = now
+                self.backoffs += 1
+        elif status is not None:
+            self.baseline_ms[endpoint] = latency_ms if baseline is None else baseline * 0.95 + latency_ms * 0.05
+            self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            if self.max_rate is not None:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.02)
+            elif self._rate_limited and now - self._last_backoff >= 1.0:
+                # 속도 제한 때문에 기다린 요청이 있었고 최근 1초간 과부하 없음 → 속도를 올려 봄 (오류 / 지연이 생기면 위에서 ×0.7)
+                self.rate += max(1.0, self.rate * 0.01)
+                self._rate_limited = False
+        if self._timer is None:
+            try:
+                self._dispatch()
+            except RuntimeError:
+                # 이벤트 루프 밖(종료 중)에서 호출된 경우
+                pass
+
+    @asynccontextmanager
+    async def slot(self, endpoint: str = ''):
+        """async with scheduler.slot(endpoint) as outcome: ... outcome.update(status=response.status_code, seconds=응답 시간)
+            - seconds 를 지정하지 않으면 slot 전체 시간을 응답 시간으로 사용
+            - 응답 본문을 읽는 동안(ex: 검색 결과 스트리밍, 내보내기 파일 쓰기)은 seconds 에 포함하지 않아야 과부하로 보지 않음
+        """
+        await self.acquire()
+        outcome: Dict[str, Any] = {'status': None, 'error': None, 'seconds': None}
+        start = time.perf_counter()
+        try:
+            yield outcome
+        except Exception as e:
+            # 응답을 받은 뒤의 예외(ex: 검색 결과 없음)는 과부하로 보지 않음
+            if outcome['status'] is None:
+                outcome['error'] = outcome['error'] or type(e).__name__
+            raise
+        finally:
+            seconds = outcome['seconds'] if outcome['seconds'] is not None else time.perf_counter() - start
+            self.release(seconds, outcome['status'], outcome['error'], endpoint)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'concurrency_limit': round(self.limit, 2),
+            'max_concurrency': self.max_concurrency,
+            'rate_limit': round(self.rate, 2),
+            'max_rate': self.max_rate,
+            'in_flight': self.in_flight,
+            'queued': sum(1 for w in self._waiters if not w[2].done()),
+            'max_queued': self.max_queued,
+            'started': self.started,
+            'backoffs': self.backoffs,
+            'baseline_latency_ms': {endpoint: round(ms, 2) for endpoint, ms in self.baseline_ms.items()},
+            'wait_ms': {PRIORITY_NAMES[level]: hist.summary() for level, hist in self.wait_ms.items()},
+        }
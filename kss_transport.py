@@ -0,0 +1,327 @@
+"""KSS HTTP 트래픽 기록 / 재생 transport (KSS_Request 의 httpx 클라이언트에 연결)
+
+    KSS_TRANSPORT=live   : 실제 KSS 서버 호출 (기본값)
+    KSS_TRANSPORT=record : KSS 요청 / 응답 / 응답 시간과 Tool 호출을 KSS_TRANSPORT_LOG (gzip JSONL) 에 기록
+                           - 헤더 / 쿠키는 저장하지 않고, 이름이 KSS_RECORD_REDACT 와 일치하는 파라미터 / 필드 값은 *** 로 저장
+                           - 기록 스레드에서 파일에 쓰고 KSS_RECORD_FLUSH_RECORDS 건 / KSS_RECORD_FLUSH_SECONDS 초마다 flush
+                             (프로세스가 비정상 종료되어도 마지막 flush 까지의 기록은 남음)
+                           - 공유 서버 pool 은 worker 별 파일에 기록 (kss-traffic-<번호>.jsonl.gz)
+    KSS_TRANSPORT=replay : 기록된 응답을 KSS 서버 대신 반환 (KSS 접속 / 로그인 불필요)
+                           - 원래 응답 시간을 KSS_REPLAY_SPEED 로 나눈 만큼 대기 (1: 원래 속도, 10: 10배속, 0: 대기 없음)
+                           - 같은 요청이 여러 번 기록되어 있으면 기록된 순서대로 돌아가며 반환
+                           - 같은 요청이 없으면 같은 엔드포인트의 기록으로 대체, 그것도 없으면 404
+
+    기록 형식 (한 줄에 하나):
+      {"type": "tool", "t": 기록 시작 후 초, "tool": Tool 이름, "args": {...}}
+      {"type": "http", "t": ..., "tool": 요청한 Tool, "method", "path", "params", "body",
+       "status", "headers", "response", "elapsed_ms"}
+    benchmark.py --mode replay 로 기록된 Tool 호출을 같은 간격(또는 배속)으로 다시 실행하여 처리량 비교
+"""
+import asyncio
+import atexit
+import contextvars
+import glob
+import gzip
+import json
+import os
+import queue
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+import httpx
+
+# 현재 요청을 보낸 Tool (record 모드에서 HTTP 기록에 함께 저장)
+current_tool: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('kss_tool', default=None)
+
+# 재생 시 반환할 응답 헤더
+_KEEP_HEADERS = ('content-type', 'location')
+_DEFAULT_REDACT = r'pass|pwd|token|secret|auth|cookie|session'
+REDACTED = '***'
+
+
+def mode() -> str:
+    return os.getenv("KSS_TRANSPORT", 'live').lower()
+
+
+def log_path() -> str:
+    return os.getenv("KSS_TRANSPORT_LOG", os.path.join(os.getenv("KSS_LOG_DIR", 'logs'), 'kss-traffic.jsonl.gz'))
+
+
+def worker_log_path(index: int) -> str:
+    """공유 서버 worker 별 기록 파일 경로 (ex: logs/kss-traffic-0.jsonl.gz)"""
+    path = log_path()
+    name, sep, rest = path.partition('.jsonl')
+    return f'{name}-{index}{sep}{rest}' if sep else f'{path}.{index}'
+
+
+def _redact_pattern() -> re.Pattern:
+    return re.compile(os.getenv("KSS_RECORD_REDACT", _DEFAULT_REDACT), re.IGNORECASE)
+
+
+def redact(value: Any, pattern: Optional[re.Pattern] = None) -> Any:
+    """dict / list 안에서 이름이 pattern 과 일치하는 필드 값을 *** 로 변경"""
+    pattern = pattern or _redact_pattern()
+    if isinstance(value, dict):
+        return {k: REDACTED if pattern.search(str(k)) else redact(v, pattern) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(v, pattern) for v in value]
+    return value
+
+
+def _redact_body(body: bytes, content_type: str, pattern: re.Pattern) -> str:
+    """요청 body (form / JSON / 그 외 텍스트) 를 문자열로 변환하면서 비밀값 제거"""
+    text = body.decode('utf-8', errors='replace')
+    if not text:
+        return ''
+    if 'json' in content_type or text[:1] in ('{', '['):
+        try:
+            return json.dumps(redact(json.loads(text), pattern), ensure_ascii=False, sort_keys=True)
+        except ValueError:
+            pass
+    if 'x-www-form-urlencoded' in content_type:
+        return urlencode([(k, REDACTED if pattern.search(k) else v) for k, v in parse_qsl(text, keep_blank_values=True)])
+    return text
+
+
+def _request_fields(request: httpx.Request, body: bytes, pattern: re.Pattern) -> Dict[str, Any]:
+    params = [(k, REDACTED if pattern.search(k) else v) for k, v in request.url.params.multi_items()]
+    return {
+        'method': request.method,
+        'path': request.url.path.rsplit('/', 1)[-1],
+        'params': sorted(params),
+        'body': _redact_body(body, request.headers.get('content-type', ''), pattern),
+    }
+
+
+def _request_key(fields: Dict[str, Any]) -> Tuple:
+    return (fields['method'], fields['path'], json.dumps(fields['params'], ensure_ascii=False), fields['body'])
+
+
+class TrafficRecorder():
+    """기록 파일 쓰기 - 요청 처리 중에는 큐에만 넣고, 변환 / 압축 / 파일 쓰기는 기록 스레드에서 수행 (파일은 첫 기록 시 생성)"""
+    def __init__(self, path: str):
+        self.path = path
+        self.pattern = _redact_pattern()
+        self.started = time.perf_counter()
+        self.counts: Counter = Counter()
+        self.flush_records = int(os.getenv("KSS_RECORD_FLUSH_RECORDS", 100))
+        self.flush_seconds = float(os.getenv("KSS_RECORD_FLUSH_SECONDS", 1))
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def offset(self) -> float:
+        return round(time.perf_counter() - self.started, 4)
+
+    def write(self, record: Dict[str, Any], finish: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None):
+        """record 를 큐에 추가 (finish: 기록 스레드에서 record 를 완성하는 함수 - ex: 응답 body 압축 해제)"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._writer, name='kss-traffic-recorder', daemon=True)
+                self._thread.start()
+        self.counts[record['type']] += 1
+        self._queue.put((record, finish))
+
+    def tool_call(self, name: str, args: Dict[str, Any]):
+        self.write({'type': 'tool', 't': self.offset(), 'tool': name, 'args': redact(args, self.pattern)})
+
+    def _open(self) -> gzip.GzipFile:
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        if os.path.exists(self.path):
+            # 비정상 종료로 끝나지 않은 gzip member 뒤에 이어 쓰면 읽을 수 없으므로 읽히는 줄만 남겨 다시 기록
+            lines = []
+            try:
+                with gzip.open(self.path, 'rb') as f:
+                    for line in f:
+                        lines.append(line)
+            except (EOFError, OSError, zlib.error):
+                with gzip.open(self.path + '.tmp', 'wb') as f:
+                    f.writelines(line for line in lines if line.endswith(b'\n'))
+                os.replace(self.path + '.tmp', self.path)
+        # 재시작 시 이어서 기록 (gzip member 가 추가되어도 gzip.open 으로 한 번에 읽힘)
+        return gzip.GzipFile(self.path, 'ab')
+
+    def _writer(self):
+        file = self._open()
+        pending = 0
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_seconds)
+            except queue.Empty:
+                item = None
+            if item is not None and item[0] is None:
+                break
+            if item is not None:
+                record, finish = item
+                try:
+                    if finish is not None:
+                        record = finish(record)
+                    file.write((json.dumps(record, ensure_ascii=False, default=str) + '\n').encode('utf-8'))
+                    pending += 1
+                except Exception:
+                    self.counts['failed'] += 1
+            if pending and (pending >= self.flush_records or time.monotonic() - last_flush >= self.flush_seconds):
+                # Z_SYNC_FLUSH: 여기까지 압축된 내용을 파일에 기록 (gzip member 를 닫지 않아도 읽힘)
+                file.flush(zlib.Z_SYNC_FLUSH)
+                pending = 0
+                last_flush = time.monotonic()
+        file.close()
+
+    def close(self):
+        """남은 기록을 모두 쓰고 파일 닫기"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put((None, None))
+            thread.join()
+
+
+class _RecordingStream(httpx.AsyncByteStream):
+    """응답 body 를 그대로 전달하면서 모아 두었다가 끝까지 수신하면 기록 (iter_rows 의 스트리밍 처리 유지)"""
+    def __init__(self, stream: httpx.AsyncByteStream, on_complete: Callable[[bytes], None]):
+        self.stream = stream
+        self.on_complete = on_complete
+        self.chunks: List[bytes] = []
+        self.complete = False
+
+    async def __aiter__(self):
+        async for chunk in self.stream:
+            self.chunks.append(chunk)
+            yield chunk
+        self.complete = True
+
+    async def aclose(self):
+        await self.stream.aclose()
+        if self.complete:
+            self.complete = False
+            self.on_complete(b''.join(self.chunks))
+        self.chunks = []
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """실제 KSS 서버로 요청을 보내고 요청 / 응답을 TrafficRecorder 에 기록
+        - 응답을 끝까지 읽지 않고 닫은 요청(ex: 검색 결과 일부만 사용)은 기록하지 않음
+    """
+    def __init__(self, transport: httpx.AsyncBaseTransport, recorder: TrafficRecorder):
+        self.transport = transport
+        self.recorder = recorder
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = await request.aread()
+        record = {'type': 'http', 't': self.recorder.offset(), 'tool': current_tool.get(),
+                  **_request_fields(request, body, self.recorder.pattern)}
+        start = time.perf_counter()
+        response = await self.transport.handle_async_request(request)
+
+        def finish(data: Dict[str, Any]) -> Dict[str, Any]:
+            # content-encoding(gzip 등)을 풀어서 텍스트로 저장 (기록 스레드에서 실행)
+            decoded = httpx.Response(data['status'], headers=response.headers, content=data['response']).read()
+            return {**data, 'response': decoded.decode('utf-8', errors='replace')}
+
+        def on_complete(raw: bytes):
+            self.recorder.write({
+                **record,
+                'status': response.status_code,
+                'headers': {k: response.headers[k] for k in _KEEP_HEADERS if k in response.headers},
+                'response': raw,
+                'elapsed_ms': round((time.perf_counter() - start) * 1000, 2),
+            }, finish)
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=_RecordingStream(response.stream, on_complete),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self):
+        await self.transport.aclose()
+        self.recorder.close()
+
+
+def load_records(path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """기록 파일 읽기 (기록 도중 중단된 마지막 줄은 무시)
+        - path 에 glob 패턴을 사용하면 여러 파일(ex: worker 별 기록 logs/kss-traffic-*.jsonl.gz)을 함께 읽음
+    """
+    path = path or log_path()
+    records = []
+    for file_path in sorted(glob.glob(path)) or [path]:
+        try:
+            with gzip.open(file_path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except EOFError:
+            pass
+    records.sort(key=lambda r: r.get('t', 0))
+    return records
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """기록된 응답을 반환하는 가짜 KSS 서버"""
+    def __init__(self, records: List[Dict[str, Any]], speed: float = 1.0):
+        self.speed = speed
+        self.pattern = _redact_pattern()
+        self.exact: Dict[Tuple, List[Dict[str, Any]]] = {}
+        self.by_path: Dict[Tuple, List[Dict[str, Any]]] = {}
+        for record in records:
+            if record.get('type') != 'http':
+                continue
+            self.exact.setdefault(_request_key(record), []).append(record)
+            self.by_path.setdefault((record['method'], record['path']), []).append(record)
+        self.cursor: Counter = Counter()
+        # hit: 같은 요청 / fallback: 같은 엔드포인트의 다른 요청 / miss: 기록 없음
+        self.stats: Counter = Counter()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = _request_key(_request_fields(request, await request.aread(), self.pattern))
+        candidates = self.exact.get(key)
+        outcome = 'hit'
+        if not candidates:
+            key = key[:2]
+            candidates = self.by_path.get(key)
+            outcome = 'fallback'
+        if not candidates:
+            self.stats['miss'] += 1
+            return httpx.Response(404, json={'error': f'기록된 응답이 없습니다: {request.method} {request.url.path}'},
+                                  request=request)
+        self.stats[outcome] += 1
+        record = candidates[self.cursor[key] % len(candidates)]
+        self.cursor[key] += 1
+        if self.speed > 0:
+            await asyncio.sleep(record.get('elapsed_ms', 0) / 1000 / self.speed)
+        return httpx.Response(record['status'], headers=record.get('headers', {}),
+                              content=record.get('response', '').encode('utf-8'), request=request)
+
+
+_recorder: Optional[TrafficRecorder] = None
+
+
+def recorder() -> Optional[TrafficRecorder]:
+    """record 모드이면 프로세스 공용 TrafficRecorder, 아니면 None"""
+    global _recorder
+    if mode() != 'record':
+        return None
+    if _recorder is None:
+        _recorder = TrafficRecorder(log_path())
+    return _recorder
+
+
+def create_transport(limits: httpx.Limits) -> Optional[httpx.AsyncBaseTransport]:
+    """KSS_TRANSPORT 에 맞는 transport (live 이면 None → httpx 기본 transport)"""
+    current = mode()
+    if current == 'record':
+        return RecordingTransport(httpx.AsyncHTTPTransport(limits=limits), recorder())
+    if current == 'replay':
+        return ReplayTransport(load_records(), speed=float(os.getenv("KSS_REPLAY_SPEED", 1)))
+    if current != 'live':
+        raise ValueError(f'KSS_TRANSPORT 값이 올바르지 않습니다: {current} (live / record / replay)')
+    return None
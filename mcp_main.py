@@ -1,10 +1,22 @@
 import streamlit as st
 import sys
 import asyncio
+import atexit
+import concurrent.futures
+import contextvars
 import json
+import queue
+import threading
+import time
+from contextlib import AsyncExitStack
+from typing import Optional
 from openai.types.responses import ResponseTextDeltaEvent
 from agents import Agent, Runner
-from agents.mcp import MCPServerStdio
+from agents.mcp import MCPServerStdio, MCPServerStreamableHttp
+from mcp import types as mcp_types
+from kss_metrics import new_trace_id, write_trace
+from kss_jobs import list_jobs
+from kss_history import KSS_History
 from dotenv import load_dotenv
 import os
 import openai
@@ -14,23 +26,53 @@ import base64
 load_dotenv()
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
-# 이벤트 루프를 가져오거나 생성하는 함수
-def get_or_create_eventloop():
-    try:
-        return asyncio.get_running_loop()
-    except RuntimeError: # 'get_running_loop' fails if no loop is running
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        return asyncio.get_event_loop()
-
-    
 # Windows 호환성오류 방지
 if sys.platform == "win32":
     asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
 
+# 현재 에이전트 턴의 trace_id (MCP 서버 span 과 연결) / 사용자 (공유 MCP 서버의 로그 / 작업에 기록)
+current_trace_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('kss_trace_id', default=None)
+current_user: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('kss_user', default=None)
+TRACE_FILE = os.getenv("KSS_TRACE_FILE", 'logs/trace.jsonl') if os.getenv("KSS_TRACE", "false").lower() == 'true' else None
+
+
+class TracedCallMixin():
+    """tools/call 요청의 _meta 에 현재 trace_id / 사용자를 실어 MCP 서버의 Tool span / 로그와 연결"""
+    async def call_tool(self, tool_name: str, arguments: Optional[dict]) -> mcp_types.CallToolResult:
+        meta = {k: v for k, v in (('kss_trace_id', current_trace_id.get()), ('kss_user', current_user.get())) if v}
+        if not meta or self.session is None:
+            return await super().call_tool(tool_name, arguments)
+        return await self.session.send_request(
+            mcp_types.ClientRequest(
+                mcp_types.CallToolRequest(
+                    method="tools/call",
+                    params=mcp_types.CallToolRequestParams(
+                        name=tool_name,
+                        arguments=arguments,
+                        _meta=meta,
+                    ),
+                )
+            ),
+            mcp_types.CallToolResult,
+        )
+
+
+class TracedMCPServerStdio(TracedCallMixin, MCPServerStdio):
+    pass
+
+
+class TracedMCPServerStreamableHttp(TracedCallMixin, MCPServerStreamableHttp):
+    pass
+
+
 # MCP 서버 설정
-async def setup_mcp_servers():
+async def setup_mcp_servers(exit_stack: AsyncExitStack) -> list[list]:
+    """mcp.json 의 서버들을 연결하고 exit_stack 에 등록 (exit_stack 종료 시 함께 정리)
+        - KSS_MCP_URLS 지정 시 mcp-kss 는 stdio 로 실행하지 않고 공유 서버 pool(kss_pool.py)의 worker 들에 연결
+        - 반환값: 에이전트별 MCP 서버 목록 (pool 이면 worker 마다 하나, 아니면 하나)
+    """
     servers = []
+    pool_urls = [url.strip() for url in os.getenv("KSS_MCP_URLS", '').split(',') if url.strip()]
     
     # mcp.json 파일에서 설정 읽기
     with open('mcp.json', 'r') as f:
@@ -42,88 +84,310 @@ async def setup_mcp_servers():
 
     # 구성된 MCP 서버들을 순회
     for server_name, server_config in config.get('mcpServers', {}).items():
-        mcp_server = MCPServerStdio(
+        if server_name == 'mcp-kss' and pool_urls:
+            continue
+        mcp_server = TracedMCPServerStdio(
             params={
                 "command": server_config.get("command"),
                 "args": server_config.get("args", []),
                 "env": os.environ
             },
             cache_tools_list=True,
-            client_session_timeout_seconds= int(os.getenv("MCP_DELAY"))            
+            client_session_timeout_seconds= int(os.getenv("MCP_DELAY")),
+            name=server_name,
         )
-        await mcp_server.connect()
+        await exit_stack.enter_async_context(mcp_server)
         servers.append(mcp_server)            
-    return servers
+    if not pool_urls:
+        return [servers]
 
-# 에이전트 설정
-async def setup_agent():
-    # 서버가 이미 존재하는지 확인하고, 없으면 생성
-    mcp_servers = await setup_mcp_servers()
-    
-    agent = Agent(
-        name="Assistant",
-        instructions=open('instructions.txt', 'r', encoding='utf-8').read(),
-        model= os.getenv("OPENAI_MODEL"),
-        mcp_servers= mcp_servers
-    )
-    return agent,mcp_servers
+    groups = []
+    for i, url in enumerate(pool_urls):
+        pool_server = TracedMCPServerStreamableHttp(
+            params={"url": url, "timeout": int(os.getenv("MCP_DELAY")), "sse_read_timeout": int(os.getenv("MCP_DELAY")) * 10},
+            cache_tools_list=True,
+            client_session_timeout_seconds=int(os.getenv("MCP_DELAY")),
+            name=f'mcp-kss-{i}',
+        )
+        await exit_stack.enter_async_context(pool_server)
+        groups.append([pool_server, *servers])
+    return groups
 
 
-# 메시지 처리
-async def process_user_message():
-    try:
-        agent, mcp_servers = await setup_agent()
-        messages = st.session_state.chat_history
+class AgentRuntime():
+    """에이전트와 MCP 서버 연결을 Streamlit 프로세스 동안 유지
+        - 전용 이벤트 루프(백그라운드 스레드)에서 MCP 서버 세션을 소유
+        - 메시지 처리 전 health check (ping), 끊어진 경우 재연결
+        - 공유 서버 pool 이면 worker 마다 에이전트를 만들고, 진행 중인 턴이 가장 적은 에이전트에 배정
+        - 프로세스 종료 시 MCP 서버(자식 프로세스) 정리
+    """
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='kss-agent-loop', daemon=True)
+        self.thread.start()
 
-        result = Runner.run_streamed(agent, input=messages)
+        self.agents: list[Agent] = []
+        self.busy: dict[int, int] = {}
+        self.mcp_servers = []
+        self.health_interval = float(os.getenv("MCP_HEALTH_INTERVAL", 30))
+        self._last_health_check = 0.0
+        self._owner_task: Optional[asyncio.Task] = None
+        self._stop_event: Optional[asyncio.Event] = None
+        self._lock: Optional[asyncio.Lock] = None
+        atexit.register(self.shutdown)
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        """코루틴을 전용 이벤트 루프에서 실행"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    async def _serve(self, ready: asyncio.Future, stop: asyncio.Event):
+        """MCP 서버 연결과 종료를 같은 태스크에서 수행 (anyio cancel scope 제약)"""
+        try:
+            async with AsyncExitStack() as exit_stack:
+                server_groups = await setup_mcp_servers(exit_stack)
+                with open('instructions.txt', 'r', encoding='utf-8') as f:
+                    instructions = f.read()
+                self.agents = [Agent(
+                    name="Assistant",
+                    instructions=instructions,
+                    model= os.getenv("OPENAI_MODEL"),
+                    mcp_servers= mcp_servers
+                ) for mcp_servers in server_groups]
+                self.busy = {id(agent): 0 for agent in self.agents}
+                self.mcp_servers = list({id(server): server for group in server_groups for server in group}.values())
+                self._last_health_check = time.monotonic()
+                ready.set_result(self.agents)
+                await stop.wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+        finally:
+            if not ready.done():
+                ready.cancel()
+            self.agents = []
+            self.mcp_servers = []
+
+    async def _is_healthy(self) -> bool:
+        if self._owner_task is None or self._owner_task.done() or not self.agents:
+            return False
+        if time.monotonic() - self._last_health_check < self.health_interval:
+            return True
+        try:
+            for server in self.mcp_servers:
+                await asyncio.wait_for(server.session.send_ping(), timeout=10)
+        except Exception:
+            return False
+        self._last_health_check = time.monotonic()
+        return True
+
+    def mark_unhealthy(self):
+        """다음 메시지 처리 전에 health check 를 강제"""
+        self._last_health_check = 0.0
+
+    async def _stop_owner(self):
+        if self._owner_task is not None and not self._owner_task.done():
+            self._stop_event.set()
+            try:
+                await asyncio.wait_for(self._owner_task, timeout=10)
+            except Exception:
+                self._owner_task.cancel()
+        self._owner_task = None
 
-        response_text = ""
-        placeholder = st.empty()
+    async def get_agent(self) -> Agent:
+        """진행 중인 턴이 가장 적은 에이전트 반환 (연결이 없거나 끊어졌으면 새로 연결), 턴이 끝나면 release_agent 호출"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if not await self._is_healthy():
+                await self._stop_owner()
+                ready = self.loop.create_future()
+                self._stop_event = asyncio.Event()
+                self._owner_task = asyncio.create_task(self._serve(ready, self._stop_event))
+                await ready
+            agent = min(self.agents, key=lambda a: self.busy.get(id(a), 0))
+            self.busy[id(agent)] = self.busy.get(id(agent), 0) + 1
+            return agent
+
+    def release_agent(self, agent: Agent):
+        if id(agent) in self.busy:
+            self.busy[id(agent)] -= 1
+
+    def shutdown(self):
+        """MCP 서버 연결을 정리하고 이벤트 루프 종료"""
+        if not self.loop.is_running():
+            return
+        try:
+            self.submit(self._stop_owner()).result(timeout=15)
+        except Exception:
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+@st.cache_resource(show_spinner=False)
+def get_agent_runtime() -> AgentRuntime:
+    """Streamlit 프로세스 당 하나의 AgentRuntime 공유"""
+    return AgentRuntime()
+
+
+async def stream_agent_events(runtime: AgentRuntime, history: KSS_History, messages: list, events: queue.Queue, user: Optional[str] = None):
+    """전용 이벤트 루프에서 에이전트를 실행하고 스트리밍 이벤트를 큐로 전달
+        - 대화 기록은 history 로 토큰 예산 안으로 줄여서 전송 (오래된 대화는 요약)
+        - 턴 단위 trace span 기록 (MCP 연결 / 대화 기록 / 첫 토큰 / Tool 호출 / 전체 시간)
+    """
+    trace_id = new_trace_id()
+    current_trace_id.set(trace_id)
+    current_user.set(user)
+    agent = None
+    turn_start = time.perf_counter()
+    span = {'source': 'mcp_main', 'trace_id': trace_id, 'user': user, 'start': round(time.time(), 3), 'tool_calls': []}
+    pending_tools = {}
+    try:
+        agent = await runtime.get_agent()
+        span['agent_ready_ms'] = round((time.perf_counter() - turn_start) * 1000, 2)
+        history_start = time.perf_counter()
+        messages = await history.build(messages)
+        span['history_ms'] = round((time.perf_counter() - history_start) * 1000, 2)
+        span.update(history.last_stats)
+        result = Runner.run_streamed(agent, input=messages)
 
         async for event in result.stream_events():           
             # LLM 응답 토큰 스트리밍
             if event.type == "raw_response_event" and isinstance(event.data, ResponseTextDeltaEvent):
-                response_text += event.data.delta or ""
-                with placeholder.container():
-                    with st.chat_message("assistant"):
-                        st.markdown(response_text)
+                if 'first_token_ms' not in span:
+                    span['first_token_ms'] = round((time.perf_counter() - turn_start) * 1000, 2)
+                events.put(('delta', event.data.delta or ""))
 
             # 도구 이벤트와 메시지 완료 처리
             elif event.type == "run_item_stream_event":
                 item = event.item
 
                 if item.type == "tool_call_item":
-                    tool_name = item.raw_item.name
-                    st.toast(f"🛠 도구 활용: `{tool_name}`")
-          
-
-        st.session_state.chat_history.append({
-            "role": "assistant",
-            "content": response_text
-        })
-        # 명시적 종료 (streamlit에서 비동기 처리 오류 방지) - 이 방식은 루프 충돌을 일으킬 수 있으므로 제거
-        # for server in mcp_servers:
-        #     await server.__aexit__(None, None, None)
-    except asyncio.CancelledError:
+                    pending_tools[getattr(item.raw_item, 'call_id', None)] = (item.raw_item.name, time.perf_counter())
+                    events.put(('tool', item.raw_item.name))
+                elif item.type == "tool_call_output_item":
+                    raw = item.raw_item
+                    call_id = raw.get('call_id') if isinstance(raw, dict) else getattr(raw, 'call_id', None)
+                    if call_id in pending_tools:
+                        name, started = pending_tools.pop(call_id)
+                        span['tool_calls'].append({'tool': name, 'duration_ms': round((time.perf_counter() - started) * 1000, 2)})
+    except Exception as e:
+        runtime.mark_unhealthy()
+        span['error'] = type(e).__name__
+        events.put(('error', e))
+    finally:
+        if agent is not None:
+            runtime.release_agent(agent)
+        span['duration_ms'] = round((time.perf_counter() - turn_start) * 1000, 2)
+        span['tool_ms'] = round(sum(t['duration_ms'] for t in span['tool_calls']), 2)
+        span['llm_ms'] = round(span['duration_ms'] - span['tool_ms'] - span.get('agent_ready_ms', 0) - span.get('history_ms', 0), 2)
+        if TRACE_FILE:
+            write_trace(TRACE_FILE, span)
+        events.put(('done', None))
+
+
+def session_user() -> Optional[str]:
+    """현재 Streamlit 세션 사용자 (Streamlit 로그인(st.user) 사용 시 이메일, 아니면 KSS_ID)"""
+    try:
+        if st.user.is_logged_in:
+            return st.user.email
+    except Exception:
         pass
+    return os.getenv('KSS_ID')
+
+
+# 메시지 처리
+def process_user_message():
+    runtime = get_agent_runtime()
+    if "history" not in st.session_state:
+        st.session_state.history = KSS_History()
+    events = queue.Queue()
+    future = runtime.submit(stream_agent_events(runtime, st.session_state.history, list(st.session_state.chat_history), events, session_user()))
+
+    # 응답 말풍선은 한 번만 만들고, 토큰은 모아서 KSS_UI_FRAME_INTERVAL 초 또는 KSS_UI_FRAME_CHARS 자마다 다시 그림
+    frame_interval = float(os.getenv("KSS_UI_FRAME_INTERVAL", 0.1))
+    frame_chars = int(os.getenv("KSS_UI_FRAME_CHARS", 400))
+    response_text = ""
+    rendered_len = 0
+    last_flush = time.monotonic()
+    placeholder = None
+
+    def flush():
+        nonlocal placeholder, rendered_len, last_flush
+        if placeholder is None:
+            with st.chat_message("assistant"):
+                placeholder = st.empty()
+        placeholder.markdown(response_text)
+        rendered_len = len(response_text)
+        last_flush = time.monotonic()
+
+    try:
+        while True:
+            pending = len(response_text) > rendered_len
+            try:
+                # 그릴 내용이 남아 있으면 다음 frame 시각까지만 대기
+                timeout = max(0.0, last_flush + frame_interval - time.monotonic()) if pending else None
+                kind, payload = events.get(timeout=timeout)
+            except queue.Empty:
+                flush()
+                continue
+            if kind == 'delta':
+                response_text += payload
+                if time.monotonic() - last_flush >= frame_interval or len(response_text) - rendered_len >= frame_chars:
+                    flush()
+            elif kind == 'tool':
+                st.toast(f"🛠 도구 활용: `{payload}`")
+            elif kind == 'error':
+                raise payload
+            elif kind == 'done':
+                if len(response_text) > rendered_len:
+                    flush()
+                break
+    finally:
+        # 스크립트가 중단(rerun)되면 진행 중인 에이전트 실행도 취소
+        if not future.done():
+            future.cancel()
+
+    st.session_state.chat_history.append({
+        "role": "assistant",
+        "content": response_text
+    })
+
+# 백그라운드 작업 진행 상황 (MCP 서버가 jobs/ 에 기록한 상태를 2초마다 다시 읽음)
+@st.fragment(run_every=2)
+def render_jobs():
+    jobs = list_jobs(limit=5, user=session_user() or '')
+    if not jobs:
+        return
+    st.subheader("백그라운드 작업")
+    for job in jobs:
+        progress = job['completed'] / job['total'] if job['total'] else 1.0
+        st.progress(min(progress, 1.0), text=f"{job['kind']} ({job['job_id']}) - {job['status']} {job['completed']}/{job['total']}")
+        if job['error']:
+            st.caption(f"⚠️ {job['error']}")
+
+@st.cache_data(show_spinner=False)
+def load_static_assets(css_path: str = "style.css", logo_path: str = "surplusglobal_logo.png") -> tuple[str, str]:
+    """style.css 와 로고(base64) html - 파일을 매 rerun 마다 다시 읽지 않도록 캐시"""
+    with open(css_path, encoding="utf-8") as f:
+        css = f"<style>{f.read()}</style>"
+    with open(logo_path, "rb") as f:
+        logo = f'<div style="text-align: left;"><img src="data:image/png;base64,{base64.b64encode(f.read()).decode()}" width="300"></div>'
+    return css, logo
 
 # Streamlit UI 메인
 def main():        
     st.set_page_config(page_title="KSS Agent", page_icon="🔷")
 
-    # style.css 적용
-    with open("style.css",encoding="utf-8") as f:
-        st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
-
-    # 로고 표시
-    st.markdown(
-        f'<div style="text-align: left;"><img src="data:image/png;base64,{base64.b64encode(open("surplusglobal_logo.png", "rb").read()).decode()}" width="300"></div>',
-        unsafe_allow_html=True
-    )        
+    # style.css 적용 / 로고 표시
+    css, logo = load_static_assets()
+    st.markdown(css, unsafe_allow_html=True)
+    st.markdown(logo, unsafe_allow_html=True)
 
     if "chat_history" not in st.session_state:
         st.session_state.chat_history = []
 
+    with st.sidebar:
+        render_jobs()
     
     st.title(f"{os.getenv('KSS_ID').upper()}님, 안녕하세요!")
     st.divider()   
@@ -146,8 +410,7 @@ def main():
             # 비동기 응답 처리
             with st.spinner("AI가 답변을 작성 중입니다..."):
                 try:
-                    loop = get_or_create_eventloop()
-                    loop.run_until_complete(process_user_message())
+                    process_user_message()
                 except openai.APIError as e:
                     st.error(f"오류 발생: {e}")
                 except Exception as e:
@@ -1,161 +1,869 @@
+import time
+# 서버 시작 시간 측정 (python mcp_scripts.py --profile-startup, kss_server_stats 의 startup)
+_import_started = time.perf_counter()
 from mcp.server.fastmcp import FastMCP
-import requests
-from typing import Optional, Any, List, Dict
+_mcp_imported = time.perf_counter()
+import httpx
+from contextlib import asynccontextmanager
+from typing import Optional, Any, List, Dict, AsyncIterator
 from dotenv import load_dotenv
 import os
 from datetime import datetime
 import json
-import logging
-from pprint import pprint
 import re
 import asyncio
+import base64
+import argparse
+import functools
+import sys
+from kss_cache import KSS_Cache, SingleFlight
+from kss_replica import KSS_Replica
+from kss_jobs import KSS_JobManager, list_jobs
+from kss_scheduler import KSS_Scheduler
+from kss_resilience import CircuitBreaker, RetryPolicy, is_transient
+from kss_decode import JsonArrayStream, loads as json_loads
+import kss_transport
+from kss_export import ExportWriter, check_format, export_path
+from kss_metrics import KSS_Metrics
+from kss_logging import LazyLogger, logging_stats, current_user
 load_dotenv()
 
-# 로그 설정
-def setup_logging(name: str) -> logging.Logger:
-    """ 로그 설정
-        - logs 디렉토리에 자동 저장
-        - 단일 로그 파일 사용
-        - UTF-8 인코딩
-    """
-    # 로그 디렉토리 생성
-    if not os.path.exists('logs'):
-        os.makedirs('logs')
-    
-    # 로거 설정
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.INFO)
-    
-    # 핸들러가 중복 추가되는 것을 방지
-    if not logger.handlers:
-        # 파일 핸들러 설정
-        file_handler = logging.FileHandler(
-            filename='logs/mcp.log',
-            encoding='utf-8'
-        )
-        file_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s', 
-                                                  datefmt='%Y-%m-%d %H:%M:%S'))
-        logger.addHandler(file_handler)
-        
-        # 콘솔 출력용 핸들러
-        console_handler = logging.StreamHandler()
-        console_handler.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
-        logger.addHandler(console_handler)
-    
-    return logger
+_HTML_TAG = re.compile(r'<[^>]+>')
 
 def clean_html_tags(text: str) -> str:
         """HTML 태그와 폰트 태그를 제거하고 깔끔한 텍스트만 반환"""
         if not text:
             return ''
-        # HTML 태그 제거
-        clean_text = re.sub(r'<[^>]+>', '', text)
+        # HTML 태그 제거 (태그가 없으면 생략)
+        clean_text = _HTML_TAG.sub('', text) if '<' in text else text
         # 여러 공백을 하나로 정리
-        clean_text = re.sub(r'\s+', ' ', clean_text).strip()
-        return clean_text
+        return ' '.join(clean_text.split())
+
+@functools.lru_cache(maxsize=int(os.getenv("KSS_CLEAN_CACHE_SIZE", 4096)))
+def clean_company_name(text: str) -> str:
+        """회사명의 HTML 태그 제거 - 같은 회사명이 검색 결과마다 반복되므로 결과를 캐시
+            (코멘트처럼 길고 매번 다른 텍스트는 캐시하지 않도록 clean_html_tags 사용)
+        """
+        return clean_html_tags(text)
+
+@asynccontextmanager
+async def kss_resources():
+    """서버 프로세스 시작 시 메트릭 엔드포인트 실행 / 끝나지 않은 백그라운드 작업 재개,
+    종료 시 실행 중인 작업을 멈추고 공유 HTTP 클라이언트(커넥션 풀)를 정리"""
+    if os.getenv("KSS_METRICS_PORT"):
+        await kss_metrics.start_endpoint(int(os.getenv("KSS_METRICS_PORT")))
+    # 실행 중인 작업의 lease 갱신 / lease 가 만료된 작업 재개 (공유 서버의 모든 worker 에서 실행, lock 파일로 하나만 가져감)
+    maintainer = asyncio.create_task(kss_jobs.maintain(
+        resume=os.getenv("KSS_JOB_RESUME", "true").lower() == 'true',
+        on_resume=lambda resumed: logger.info(f'MCP - 백그라운드 작업 재개: {resumed}'),
+        on_error=lambda e: logger.error(f'MCP - 백그라운드 작업 lease 갱신 / 재개 오류: {str(e)}'),
+    ))
+    try:
+        yield
+    finally:
+        maintainer.cancel()
+        await kss_jobs.shutdown()
+        await kss_request.aclose()
+
+# streamable-http / sse 로 실행 중이면 True (FastMCP 의 lifespan 은 MCP 세션마다 실행되므로 자원은 서버 앱 lifespan 에서 관리)
+_shared_server = False
+
+@asynccontextmanager
+async def kss_lifespan(server: FastMCP):
+    """stdio: MCP 세션 = 서버 프로세스이므로 세션 시작 / 종료 시 자원 관리"""
+    if _shared_server:
+        yield
+        return
+    async with kss_resources():
+        yield
 
 # MCP 서버 설정
-mcp = FastMCP("kss_agent_server")
+mcp = FastMCP("kss_agent_server", lifespan=kss_lifespan)
 KSS_SERVER = os.getenv("KSS_SERVER")
-logger = setup_logging(__name__)
+# 로그 파일 / 기록 스레드는 첫 로그 기록 시 생성
+logger = LazyLogger(__name__)
+# 지연 초기화 단계별 소요 시간(ms)
+startup_profile: Dict[str, Any] = {}
 class KSS_Request():
+    """KSS api 요청 (헤더 / 쿠키 / 서버 url 은 첫 요청 시 로드하여 MCP 서버가 바로 list_tools 에 응답)"""
     def __init__(self):
-        # 헤더 및 쿠키 파일 로드
+        self._headers: Optional[dict] = None
+        self._cookies: Optional[dict] = None
+        self._server: Optional[str] = None
+
+        # 엔드포인트별 타임아웃 / 재시도 정책, 지연 요청 hedge 설정
+        self.retry_policy = RetryPolicy()
+        self.timeout = self.retry_policy.default_timeout
+        self.hedge_enabled = os.getenv("KSS_HEDGE", "true").lower() == 'true'
+        self.hedge_max_ratio = float(os.getenv("KSS_HEDGE_MAX_RATIO", 0.1))
+
+        # 커넥션 풀 설정 (keep-alive 로 TCP+TLS 핸드셰이크 재사용)
+        self.limits = httpx.Limits(
+            max_connections=int(os.getenv("KSS_POOL_MAX_CONNECTIONS", 20)),
+            max_keepalive_connections=int(os.getenv("KSS_POOL_MAX_KEEPALIVE", 10)),
+            keepalive_expiry=float(os.getenv("KSS_POOL_KEEPALIVE_EXPIRY", 60)),
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+
+        # 세션 만료 시 자동 재로그인 (cookies.http_login)
+        self.auto_relogin = os.getenv("KSS_AUTO_RELOGIN", "true").lower() == 'true'
+        self._relogin_lock = asyncio.Lock()
+        self._cookie_generation = 0
+
+    def _load(self):
+        """헤더 및 쿠키 파일 로드, KSS api 서버 url 설정 (KSS_SERVER_URL 지정 시 우선 사용, ex: 로컬 mock 서버)"""
+        start = time.perf_counter()
         try:
-            with open('headers.json', encoding='utf-8') as f:
-                self.headers = json.load(f)
-            with open('cookies.json', encoding='utf-8') as f:
-                self.cookies = json.load(f)
+            if kss_transport.mode() == 'replay':
+                # 기록 재생 시에는 KSS 에 접속하지 않으므로 헤더 / 쿠키 불필요
+                headers, cookies = {}, {}
+            else:
+                with open(os.getenv("KSS_HEADERS_FILE", 'headers.json'), encoding='utf-8') as f:
+                    headers = json.load(f)
+                with open(os.getenv("KSS_COOKIES_FILE", 'cookies.json'), encoding='utf-8') as f:
+                    cookies = json.load(f)
         except Exception as e:
-            print(f'헤더 또는 쿠키 파일이 올바르지 않습니다. {e}')
-            raise
-        
-        # KSS api 서버 url 설정
-        if str(KSS_SERVER) == '1':
-            self.server = 'https://zpdldptmdptm.surplusglobal.com/KSS'            
+            raise Exception(f'헤더 또는 쿠키 파일이 올바르지 않습니다. {e}')
+
+        if os.getenv("KSS_SERVER_URL"):
+            server = os.getenv("KSS_SERVER_URL").rstrip('/')
+        elif str(KSS_SERVER) == '1':
+            server = 'https://zpdldptmdptm.surplusglobal.com/KSS'            
         elif str(KSS_SERVER) == '2':
-            self.server = 'https://kssdev.surplusglobal.com/KSS'            
+            server = 'https://kssdev.surplusglobal.com/KSS'            
+        elif kss_transport.mode() == 'replay':
+            server = 'http://kss-replay/KSS'
         else:
-            raise Exception('KSS_SERVER 값이 올바르지 않습니다. 1 또는 2를 입력해주세요.')                      
+            raise Exception('KSS_SERVER 값이 올바르지 않습니다. 1 또는 2를 입력해주세요.')
+        self._headers, self._cookies, self._server = headers, cookies, server
+        startup_profile['credentials_ms'] = round((time.perf_counter() - start) * 1000, 2)
+
+    @property
+    def headers(self) -> dict:
+        if self._headers is None:
+            self._load()
+        return self._headers
+
+    @property
+    def cookies(self) -> dict:
+        if self._cookies is None:
+            self._load()
+        return self._cookies
+
+    @cookies.setter
+    def cookies(self, value: dict):
+        self._cookies = value
+
+    @property
+    def server(self) -> str:
+        if self._server is None:
+            self._load()
+        return self._server
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """모든 Tool 이 공유하는 비동기 HTTP 클라이언트 (최초 사용 시 생성, KSS_TRANSPORT=record / replay 이면 트래픽 기록 / 재생)"""
+        if self._client is None or self._client.is_closed:
+            start = time.perf_counter()
+            self._client = httpx.AsyncClient(
+                headers=self.headers,
+                cookies=self.cookies,
+                limits=self.limits,
+                timeout=self.timeout,
+                transport=kss_transport.create_transport(self.limits),
+            )
+            startup_profile.setdefault('http_client_ms', round((time.perf_counter() - start) * 1000, 2))
+        return self._client
+
+    @staticmethod
+    def is_session_expired(response: httpx.Response) -> bool:
+        """세션 만료 응답 판별 (로그인 페이지로 리다이렉트 되거나 로그인 화면 HTML 이 반환된 경우)"""
+        if response.status_code == 401:
+            return True
+        if response.is_redirect and 'login' in response.headers.get('location', '').lower():
+            return True
+        if 'text/html' in response.headers.get('content-type', ''):
+            text = response.text
+            return 'fn_checkToken' in text or ('login.do' in text and 'userId' in text)
+        return False
+
+    async def relogin(self, generation: int):
+        """HTTP 로그인으로 쿠키 갱신 (동시에 만료를 감지한 요청들은 한 번만 재로그인)"""
+        async with self._relogin_lock:
+            if generation != self._cookie_generation:
+                return
+            logger.warning('MCP - KSS 세션 만료 감지, 재로그인 시도')
+            import cookies as kss_login
+            self.cookies = await asyncio.to_thread(kss_login.http_login, self.server)
+            self._cookie_generation += 1
+            if self._client is not None:
+                self._client.cookies = httpx.Cookies(self.cookies)
+            logger.info('MCP - KSS 재로그인 성공')
+
+    async def _send(self, method: str, url: str, params: Optional[dict], data: Any,
+                    content: Optional[bytes], timeout: float, sent: Optional[asyncio.Event] = None) -> httpx.Response:
+        """sent: 스케줄러 슬롯을 받아 실제로 요청을 보내기 시작하면 set (hedge 대기 시작 시점)"""
+        endpoint = url.rsplit('/', 1)[-1]
+        # 요청 속도 / 동시성 제한 및 우선순위 대기 (kss_scheduler)
+        queued = time.perf_counter()
+        async with kss_scheduler.slot(endpoint) as outcome:
+            start = time.perf_counter()
+            kss_metrics.record_queue_wait(start - queued)
+            if sent is not None:
+                sent.set()
+            try:
+                response = await self.client.request(
+                    method, url,
+                    params=params,
+                    data=data,
+                    content=content,
+                    timeout=timeout,
+                )
+            except Exception as e:
+                kss_metrics.record_http(endpoint, time.perf_counter() - start, error=type(e).__name__)
+                raise
+            outcome['status'] = response.status_code
+            kss_metrics.record_http(endpoint, time.perf_counter() - start, status=response.status_code)
+            return response
+
+    async def _hedged(self, method: str, url: str, params: Optional[dict], data: Any,
+                      content: Optional[bytes], timeout: float) -> httpx.Response:
+        """조회 요청이 엔드포인트 p95 지연시간을 넘기면 같은 요청을 한 번 더 보내 먼저 도착한 응답 사용
+            - hedge 요청 수는 전체 요청의 KSS_HEDGE_MAX_RATIO 이내로 제한 (hedge 를 보내는 시점에 확인하고 바로 계산)
+            - p95 는 최근 HTTP 응답 시간 표본 기준, 대기 시간은 첫 요청이 스케줄러 슬롯을 받은 뒤부터 계산
+              (스케줄러 대기열에서 기다리는 요청에는 hedge 를 보내지 않음)
+        """
+        endpoint = url.rsplit('/', 1)[-1]
+        delay_ms = kss_metrics.latency_percentile(endpoint, 95) if self.hedge_enabled else None
+        sent = asyncio.Event()
+        first = asyncio.ensure_future(self._send(method, url, params, data, content, timeout, sent))
+        if delay_ms is None:
+            return await first
+        tasks = {first}
+        waiter = asyncio.ensure_future(sent.wait())
+        try:
+            await asyncio.wait({first, waiter}, return_when=asyncio.FIRST_COMPLETED)
+            done = set()
+            if not first.done():
+                done, _ = await asyncio.wait(tasks, timeout=delay_ms / 1000)
+            # 확인과 계산 사이에 await 가 없으므로 동시에 지연된 요청들이 한꺼번에 한도를 넘지 않음
+            if not done and not first.done() and \
+                    kss_metrics.events['hedge'] + 1 <= self.hedge_max_ratio * (kss_metrics.events['request'] + 1):
+                kss_metrics.count('hedge')
+                kss_metrics.count('request')
+                tasks.add(asyncio.ensure_future(self._send(method, url, params, data, content, timeout)))
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            kss_metrics.count('hedge_won')
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            waiter.cancel()
+            for task in tasks:
+                task.cancel()
+
+    async def request(self, method: str, path: str, params: Optional[dict] = None,
+                      data: Any = None, timeout: Optional[float] = None, idempotent: Optional[bool] = None) -> httpx.Response:
+        """KSS api 호출
+            - path: 'AC0180MSearchAll.do' 와 같은 엔드포인트 경로
+            - data 가 문자열이면 그대로(body) 전송, dict 이면 form 인코딩
+            - 타임아웃 미지정 시 엔드포인트별 타임아웃 (kss_resilience.RetryPolicy)
+            - 멱등 요청(GET 또는 idempotent=True 인 조회용 POST)은 연결 오류 / 타임아웃 / 5xx 시 재시도, 지연 시 hedge
+            - KSS 서버가 연속으로 실패하면 회로 차단(CircuitOpenError)
+            - 세션 만료 응답이면 재로그인 후 한 번 재시도
+        """
+        url = f'{self.server}/{path}'
+        content = None
+        if isinstance(data, str):
+            content, data = data.encode('utf-8'), None
+        idempotent = method == 'GET' if idempotent is None else idempotent
+        timeout = timeout if timeout is not None else self.retry_policy.timeout(path)
+        send = self._hedged if idempotent else self._send
+        started = time.monotonic()
+        relogged = False
+        attempt = 0
+        while True:
+            attempt += 1
+            kss_breaker.check()
+            kss_metrics.count('request')
+            generation = self._cookie_generation
+            try:
+                response = await send(method, url, params, data, content, timeout)
+            except Exception as e:
+                if not is_transient(e):
+                    raise
+                kss_breaker.record_failure()
+                delay = self.retry_policy.delay(attempt)
+                if not (idempotent and self.retry_policy.can_retry(attempt, started, delay, timeout)):
+                    raise
+                logger.warning(f'MCP - KSS 요청 재시도 ({attempt}): {path}, {type(e).__name__}')
+            else:
+                throttled = response.status_code == 429
+                if not (throttled or is_transient(status=response.status_code)):
+                    kss_breaker.record_success()
+                    if self.auto_relogin and not relogged and self.is_session_expired(response):
+                        await self.relogin(generation)
+                        relogged = True
+                        continue
+                    return response
+                # 429 는 서버 장애가 아니므로 회로 차단에는 반영하지 않음 (속도 조절은 kss_scheduler)
+                if not throttled:
+                    kss_breaker.record_failure()
+                delay = self.retry_policy.delay(attempt)
+                if not (idempotent and self.retry_policy.can_retry(attempt, started, delay, timeout)):
+                    return response
+                logger.warning(f'MCP - KSS 요청 재시도 ({attempt}): {path}, 상태코드: {response.status_code}')
+            kss_metrics.count('retry')
+            await asyncio.sleep(delay)
+
+    async def get(self, path: str, params: Optional[dict] = None, timeout: Optional[float] = None) -> httpx.Response:
+        return await self.request('GET', path, params=params, timeout=timeout)
+
+    async def get_json(self, path: str, params: Optional[dict] = None, timeout: Optional[float] = None) -> Any:
+        """GET 후 JSON 파싱 - 같은 path / params 로 동시에 진행 중인 요청이 있으면 그 결과를 공유 (반환값 수정 금지)"""
+        async def _fetch():
+            response = await self.get(path, params=params, timeout=timeout)
+            return json_loads(response.content)
+        key = ('GET', path, tuple(sorted((params or {}).items())))
+        return await kss_singleflight.do(key, _fetch)
+
+    async def post(self, path: str, data: Any = None, timeout: Optional[float] = None, idempotent: bool = False) -> httpx.Response:
+        """idempotent=True: 중복 체크 등 서버 상태를 바꾸지 않는 POST (재시도 / hedge 허용)"""
+        return await self.request('POST', path, data=data, timeout=timeout, idempotent=idempotent)
+
+    async def iter_rows(self, path: str, params: Optional[dict] = None, key: str = 'Data',
+                        timeout: Optional[float] = None) -> AsyncIterator[dict]:
+        """GET 응답 JSON 의 key 배열 항목을 수신하는 대로 하나씩 반환 (전체 body 를 한 번에 파싱하지 않음)
+            - 첫 항목을 반환하기 전에 연결 오류 / 타임아웃 / 5xx 가 발생하면 재시도
+            - 세션 만료 응답이면 재로그인 후 한 번 재시도
+            - 응답에 key 가 없으면 KeyError
+        """
+        url = f'{self.server}/{path}'
+        timeout = timeout if timeout is not None else self.retry_policy.timeout(path)
+        started = time.monotonic()
+        relogged = False
+        attempt = 0
+        while True:
+            attempt += 1
+            kss_breaker.check()
+            kss_metrics.count('request')
+            generation = self._cookie_generation
+            expired = False
+            yielded = False
+            try:
+                queued = time.perf_counter()
+                async with kss_scheduler.slot(path) as outcome:
+                    start = time.perf_counter()
+                    kss_metrics.record_queue_wait(start - queued)
+                    try:
+                        async with self.client.stream('GET', url, params=params, timeout=timeout) as response:
+                            # 응답 헤더까지의 시간만 스케줄러 지연시간으로 사용 (호출한 쪽이 행을 처리하는 시간 제외)
+                            outcome.update(status=response.status_code, seconds=time.perf_counter() - start)
+                            if response.status_code >= 300 or 'text/html' in response.headers.get('content-type', ''):
+                                await response.aread()
+                                expired = self.auto_relogin and not relogged and self.is_session_expired(response)
+                                if not expired:
+                                    response.raise_for_status()
+                            if not expired:
+                                stream = JsonArrayStream(key)
+                                async for chunk in response.aiter_text():
+                                    for row in stream.feed(chunk):
+                                        yielded = True
+                                        yield row
+                                stream.close()
+                                if not stream.found:
+                                    raise KeyError(key)
+                    except Exception as e:
+                        kss_metrics.record_http(path, time.perf_counter() - start, error=type(e).__name__)
+                        raise
+                    kss_metrics.record_http(path, time.perf_counter() - start, status=response.status_code)
+            except Exception as e:
+                if not is_transient(e):
+                    raise
+                kss_breaker.record_failure()
+                delay = self.retry_policy.delay(attempt)
+                if yielded or not self.retry_policy.can_retry(attempt, started, delay, timeout):
+                    raise
+                logger.warning(f'MCP - KSS 요청 재시도 ({attempt}): {path}, {type(e).__name__}')
+                kss_metrics.count('retry')
+                await asyncio.sleep(delay)
+                continue
+            kss_breaker.record_success()
+            if not expired:
+                return
+            await self.relogin(generation)
+            relogged = True
+
+    async def aclose(self):
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
 kss_request = KSS_Request()
+kss_cache = KSS_Cache()
+kss_singleflight = SingleFlight()
+kss_metrics = KSS_Metrics()
+kss_scheduler = KSS_Scheduler()
+kss_breaker = CircuitBreaker()
+# 로컬 복제본 (KSS_REPLICA_PATH 지정 시 사용, 동기화: python kss_replica.py sync)
+kss_replica = KSS_Replica(os.getenv("KSS_REPLICA_PATH")) if os.getenv("KSS_REPLICA_PATH") else None
+# 일괄 Tool 의 백그라운드 작업 (작업 종류는 각 일괄 Tool 아래에서 등록)
+kss_jobs = KSS_JobManager()
+
+
+def _request_meta(key: str) -> Optional[str]:
+    """mcp_main.py 가 tools/call 요청의 _meta 로 전달한 값 (kss_trace_id, kss_user)"""
+    try:
+        meta = mcp.get_context().request_context.meta
+    except Exception:
+        return None
+    return (meta.model_extra or {}).get(key) if meta is not None else None
+
+def _current_trace_id() -> Optional[str]:
+    return _request_meta('kss_trace_id')
+
+def _with_request_user(fn):
+    """Tool 실행 동안 요청 사용자를 current_user 에 설정 (로그 / span / 백그라운드 작업에 기록)"""
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        token = current_user.set(_request_meta('kss_user'))
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            current_user.reset(token)
+    return wrapper
+
+def _with_traffic_record(fn):
+    """KSS_TRANSPORT=record 이면 Tool 호출(이름 / 인자)을 기록하고 이후 HTTP 기록에 Tool 이름 표시"""
+    recorder = kss_transport.recorder()
+    if recorder is None:
+        return fn
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        recorder.tool_call(fn.__name__, kwargs)
+        token = kss_transport.current_tool.set(fn.__name__)
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            kss_transport.current_tool.reset(token)
+    return wrapper
+
+def kss_tool():
+    """@mcp.tool() 등록 + 호출 메트릭 / trace span 수집
+        - MCP 에는 계측된 함수를 등록하고, 모듈 내부 호출용으로는 원본 함수를 반환
+    """
+    def decorator(fn):
+        mcp.tool()(_with_request_user(kss_metrics.instrument(_with_traffic_record(fn), trace_id_getter=_current_trace_id, user_getter=current_user.get)))
+        return fn
+    return decorator
+
+
+def _account_from_row(result: dict) -> dict[str, Any]:
+    """AC0180MSearchAll.do 의 PERSON 행을 어카운트 상세정보로 변환"""
+    data = {}
+    data['company'] = result.get('compnm', '')
+    data['company_id'] = result.get('compid', '')
+    data['name'] = result.get('personnmdesc', '')
+    data['url'] = result.get('urladdr1', '')
+    data['mobile'] = result.get('mobile1', '')
+    data['position'] = result.get('positionNm', '')
+    data['email'] = result.get('email1', '')
+    data['country'] = result.get('countryNm', '')
+    data['comment'] = result.get('cmtDescToolTipHtml', '')
+    data['account_manager'] = result.get('am', '')
+    return data
+
+def _company_from_row(result: dict) -> dict[str, Any]:
+    """AC0180MSearchAll.do 의 'Company Info' 행을 회사 정보로 변환"""
+    data = {}
+    data['company_id'] = result.get('compid', '')
+    data['company_name'] = result.get('compnm', '')
+    data['url'] = result.get('urladdr1', '')
+    data['tel1'] = result.get('tel1', '')
+    data['tel2'] = result.get('tel2', '')
+
+    data['email'] = result.get('email1', '')
+    data['country'] = result.get('country', '')
+    data['address'] = result.get('address', '')
+    data['comment'] = clean_html_tags(result.get('cmtDesc', ''))
+    data['account_manager'] = result.get('am', '')
+    data['CompanyInfoId'] = result.get('id', '')
+    return data
+
+# 조회 Tool 의 fields 로 선택할 수 있는 필드 (기본: 전체)
+ACCOUNT_FIELDS = ('company', 'company_id', 'name', 'url', 'mobile', 'position', 'email', 'country', 'comment', 'account_manager')
+COMPANY_FIELDS = ('company_id', 'company_name', 'url', 'tel1', 'tel2', 'email', 'country', 'address', 'comment', 'account_manager', 'CompanyInfoId')
+SEARCH_FIELDS = ('person_id', 'company', 'company_id', 'name', 'position', 'country', 'account_manager')
+
+def _select_fields(fields: Optional[List[str]], available: tuple) -> List[str]:
+    """요청한 필드 목록 검증 (비어 있으면 전체 필드)"""
+    if not fields:
+        return list(available)
+    unknown = [f for f in fields if f not in available]
+    if unknown:
+        raise ValueError(f'알 수 없는 필드: {unknown} (사용 가능: {list(available)})')
+    return list(dict.fromkeys(fields))
+
+def _project(data: Dict[str, Any], columns: List[str], max_comment_chars: Optional[int] = None) -> Dict[str, Any]:
+    """Tool 반환용으로 선택한 필드만 남기고 HTML 태그 제거, comment 는 max_comment_chars 자로 자름
+        - max_comment_chars: None 이면 KSS_COMMENT_MAX_CHARS, 0 이면 자르지 않음
+    """
+    limit = int(os.getenv("KSS_COMMENT_MAX_CHARS", 1000)) if max_comment_chars is None else max_comment_chars
+    projected = {}
+    for field in columns:
+        value = data.get(field, '')
+        if isinstance(value, str):
+            if field in ('company', 'company_name'):
+                value = clean_company_name(value) if '<' in value else value
+            elif field == 'comment' or '<' in value:
+                value = clean_html_tags(value)
+            if field == 'comment' and limit > 0 and len(value) > limit:
+                value = f'{value[:limit]}… (+{len(value) - limit}자)'
+        projected[field] = value
+    return projected
+
+def _table(records: List[Dict[str, Any]], columns: List[str]) -> Dict[str, Any]:
+    """레코드 목록을 컬럼 목록 + 행 배열로 변환 (반복되는 키 이름 제거)"""
+    return {'columns': columns, 'rows': [[r.get(c, '') for c in columns] for r in records]}
+
+def _invalidate_search():
+    """어카운트 생성 / 변경 후 검색 결과 캐시 제거 (이름 / 회사명이 바뀌거나 새 어카운트가 검색되어야 함)"""
+    kss_cache.invalidate_kind('search')
+
+def _invalidate_account(person_id: str):
+    """어카운트 변경 후 캐시 제거 / 복제본은 다음 조회 시 다시 받도록 표시"""
+    kss_cache.invalidate(kss_cache.key('account', person_id))
+    if kss_replica is not None:
+        kss_replica.mark_stale(person_id)
+
+async def fetch_company_rows(company_id: str) -> List[dict]:
+    """회사 ID 로 AC0180MSearchAll.do 의 모든 행 (Company Info + 소속 어카운트) 조회 - 복제본 동기화용"""
+    try:
+        return [row async for row in kss_request.iter_rows(
+            'AC0180MSearchAll.do',
+            params={'queryDetail1': company_id, 'type1': 'COMPID/1', 'viewResultCount': os.getenv("KSS_SEARCH_MAX_ROWS", '500')},
+        )]
+    except KeyError:
+        return []
+
+async def fetch_search_rows(name: str) -> List[dict]:
+    """이름으로 AC0180MSearchAll.do 검색 (가공하지 않은 행) - 복제본 동기화용"""
+    try:
+        return [row async for row in kss_request.iter_rows('AC0180MSearchAll.do', params=_search_params(name, ''))]
+    except KeyError:
+        return []
 
 
 ### Tool 1-1 : (Person ID) Person 상세정보 조회
-@mcp.tool()
-def kss_account_info_get(person_id: str) -> dict[str, Any]:    
-    """KSS Account에 등록된 어카운트 상세정보를 조회합니다.             
-    Args:
-        person_id: A로 시작하는 어카운트 ID (ex: A142340)                
-    """    
-    logger.info(f'MCP - Person ID 조회 요청: {person_id.upper()}')
+async def _get_account(person_id: str) -> dict[str, Any]:
+    """어카운트 상세정보 원본 (캐시 → 복제본 → KSS 순서로 조회) - 업데이트 / 일괄 조회에서도 사용"""
+    cache_key = kss_cache.key('account', person_id)
+    cached = kss_cache.get(cache_key)
+    if cached is not None:
+        return {'result': cached}
+    if kss_replica is not None:
+        data = kss_replica.get_person(person_id)
+        if data is not None:
+            kss_cache.set(cache_key, data)
+            return {'result': data}
     try: 
-        response = requests.get(
-            f'{kss_request.server}/AC0180MSearchAll.do', 
-            headers=kss_request.headers, 
-            cookies=kss_request.cookies, 
+        response = await kss_request.get_json(
+            'AC0180MSearchAll.do',
             params={'queryDetail1': person_id,'type1':'ACCOUNT_ID/1'},
-            timeout=int(os.getenv("MCP_DELAY"))
-        )        
-        data = {}
-        result = response.json()['Data'][0]
-        data['company'] = result.get('compnm', '')
-        data['company_id'] = result.get('compid', '')
-        data['name'] = result.get('personnmdesc', '')
-        data['url'] = result.get('urladdr1', '')        
-        data['mobile'] = result.get('mobile1', '')
-        data['position'] = result.get('positionNm', '')
-        data['email'] = result.get('email1', '')
-        data['country'] = result.get('countryNm', '')
-        data['comment'] = result.get('cmtDescToolTipHtml', '')
-        data['account_manager'] = result.get('am', '')
+        )
+        data = _account_from_row(response['Data'][0])
+        kss_cache.set(cache_key, data)
+        if kss_replica is not None:
+            kss_replica.upsert_persons([(person_id, data)])
         return {'result': data}
     except Exception as e:
         logger.error(f'MCP - Person ID 조회 오류: {str(e)}')
         return {'error': f'요청 중 오류 발생: {str(e)}'}
 
-### Tool 1-2 : (Company ID) Company 상세정보 조회
-@mcp.tool()
-def kss_company_info_get(company_id: str) -> dict[str, Any]:
-    """KSS Company에 등록된 회사 정보를 조회합니다 반환값에 person_id 가 있습니다..             
+@kss_tool()
+async def kss_account_info_get(person_id: str, fields: Optional[List[str]] = None, max_comment_chars: Optional[int] = None) -> dict[str, Any]:
+    """KSS Account에 등록된 어카운트 상세정보를 조회합니다.             
     Args:
-        company_id: 회사 ID (ex: C12345)                
+        person_id: A로 시작하는 어카운트 ID (ex: A142340)                
+        fields: 필요한 필드만 반환 (ex: ["name", "company", "account_manager"], 기본: 전체)
+                company, company_id, name, url, mobile, position, email, country, comment, account_manager
+        max_comment_chars: comment 최대 글자 수 (기본: 서버 설정, 0 이면 전체)
     """    
-    logger.info(f'MCP - 회사 조회 요청: {company_id}')
+    logger.info(f'MCP - Person ID 조회 요청: {person_id.upper()}')
+    try:
+        columns = _select_fields(fields, ACCOUNT_FIELDS)
+    except ValueError as e:
+        return {'error': f'요청 중 오류 발생: {str(e)}'}
+    response = await _get_account(person_id)
+    if 'result' in response:
+        return {'result': _project(response['result'], columns, max_comment_chars)}
+    return response
+
+### Tool 1-2 : (Company ID) Company 상세정보 조회
+async def _get_company(company_id: str) -> dict[str, Any]:
+    """회사 정보 원본 (캐시 → 복제본 → KSS 순서로 조회)"""
+    cache_key = kss_cache.key('company', company_id)
+    cached = kss_cache.get(cache_key)
+    if cached is not None:
+        return {'result': cached}
+    if kss_replica is not None:
+        data = kss_replica.get_company(company_id)
+        if data is not None:
+            kss_cache.set(cache_key, data)
+            return {'result': data}
     try:
-        response = requests.get(
-            f'{kss_request.server}/AC0180MSearchAll.do',
-            headers=kss_request.headers,
-            cookies=kss_request.cookies,
+        response = await kss_request.get_json(
+            'AC0180MSearchAll.do',
             params={'queryDetail1': company_id,'type1':'COMPID/1','queryDetail2':'Company Info','type2':'ACCOUNT_NM/3'},
         )
-        data = {}
-        results = response.json()['Data']
+        results = response['Data']
         for result in results:
             if result['personnmdesc'] =='Company Info' and result['compid'] == company_id.upper():                
-                data['company_id'] = result.get('compid', '')
-                data['company_name'] = result.get('compnm', '')
-                data['url'] = result.get('urladdr1', '')        
-                data['tel1'] = result.get('tel1', '')
-                data['tel2'] = result.get('tel2', '')
-                
-                data['email'] = result.get('email1', '')
-                data['country'] = result.get('country', '')
-                data['address'] = result.get('address', '')
-                data['comment'] = clean_html_tags(result.get('cmtDesc', ''))
-                data['account_manager'] = result.get('am', '')
-                data['CompanyInfoId'] = result.get('id', '')
+                data = _company_from_row(result)
+                kss_cache.set(cache_key, data)
+                if kss_replica is not None:
+                    kss_replica.upsert_company(company_id, data)
                 return {'result': data}
         return {'error': '회사 정보를 찾을 수 없습니다.'}
     except Exception as e:
         logger.error(f'MCP - Company ID 조회 오류: {str(e)}')
         return {'error': f'요청 중 오류 발생: {str(e)}'}
 
+@kss_tool()
+async def kss_company_info_get(company_id: str, fields: Optional[List[str]] = None, max_comment_chars: Optional[int] = None) -> dict[str, Any]:
+    """KSS Company에 등록된 회사 정보를 조회합니다 반환값에 person_id 가 있습니다..             
+    Args:
+        company_id: 회사 ID (ex: C12345)                
+        fields: 필요한 필드만 반환 (ex: ["company_name", "country"], 기본: 전체)
+                company_id, company_name, url, tel1, tel2, email, country, address, comment, account_manager, CompanyInfoId
+        max_comment_chars: comment 최대 글자 수 (기본: 서버 설정, 0 이면 전체)
+    """    
+    logger.info(f'MCP - 회사 조회 요청: {company_id}')
+    try:
+        columns = _select_fields(fields, COMPANY_FIELDS)
+    except ValueError as e:
+        return {'error': f'요청 중 오류 발생: {str(e)}'}
+    response = await _get_company(company_id)
+    if 'result' in response:
+        return {'result': _project(response['result'], columns, max_comment_chars)}
+    return response
+
+### Tool 1-4 : (Company ID) 회사 정보 + 소속 어카운트 전체 조회
+ROSTER_FIELDS = ('person_id',) + ACCOUNT_FIELDS
+
+async def _get_roster(company_id: str) -> dict[str, Any]:
+    """회사 ID 의 모든 행을 한 번에 받아 Company Info 와 소속 어카운트로 분리
+        - 받은 회사 / 어카운트 정보는 캐시(와 복제본)에 저장하여 이후 단건 조회는 KSS 요청 없이 처리
+    """
+    company_id = company_id.strip().upper()
+    try:
+        rows = await fetch_company_rows(company_id)
+    except Exception as e:
+        logger.error(f'MCP - 회사 소속 어카운트 조회 오류: {str(e)}')
+        return {'error': f'요청 중 오류 발생: {str(e)}'}
+    company = None
+    persons = []
+    for row in rows:
+        if str(row.get('compid', '')).upper() != company_id:
+            continue
+        if row.get('personnmdesc') == 'Company Info':
+            company = _company_from_row(row)
+        elif row.get('gubun') == 'PERSON' and row.get('personid'):
+            persons.append((row['personid'], _account_from_row(row)))
+    if company is None and not persons:
+        return {'error': '회사 정보를 찾을 수 없습니다.'}
+
+    if company is not None:
+        kss_cache.set(kss_cache.key('company', company_id), company)
+    for person_id, data in persons:
+        kss_cache.set(kss_cache.key('account', person_id), data)
+    if kss_replica is not None:
+        if company is not None:
+            kss_replica.upsert_company(company_id, company)
+        kss_replica.upsert_persons(persons)
+    # 요청 행 수 제한(KSS_SEARCH_MAX_ROWS)에 걸리면 일부 어카운트가 빠졌을 수 있음
+    truncated = len(rows) >= int(os.getenv("KSS_SEARCH_MAX_ROWS", 500))
+    return {'result': {'company': company, 'persons': persons, 'truncated': truncated}}
+
+@kss_tool()
+async def kss_company_roster_get(company_id: str, fields: Optional[List[str]] = None, company_fields: Optional[List[str]] = None,
+                                 max_comment_chars: Optional[int] = None, tabular: bool = False) -> dict[str, Any]:
+    """KSS Company 의 회사 정보와 소속 어카운트 전체를 한 번에 조회합니다.
+    회사 소속 어카운트 여러 명의 정보가 필요하면 kss_account_info_get 을 어카운트마다 호출하지 말고 이 Tool 을 사용하세요.
+    (조회한 어카운트는 캐시되어 이후 kss_account_info_get 은 바로 응답합니다)
+    Args:
+        company_id: 회사 ID (ex: C12345)
+        fields: 어카운트별로 필요한 필드만 반환 (ex: ["person_id", "name", "position"], 기본: 전체)
+                person_id, company, company_id, name, url, mobile, position, email, country, comment, account_manager
+        company_fields: 회사 정보에서 필요한 필드만 반환 (기본: 전체, kss_company_info_get 의 fields 와 동일)
+        max_comment_chars: comment 최대 글자 수 (기본: 서버 설정, 0 이면 전체)
+        tabular: True 면 accounts 를 {"columns": [...], "rows": [[...], ...]} 형식으로 반환 (어카운트가 많을 때 사용)
+    """
+    logger.info(f'MCP - 회사 소속 어카운트 조회 요청: {company_id}')
+    try:
+        columns = _select_fields(fields, ROSTER_FIELDS)
+        company_columns = _select_fields(company_fields, COMPANY_FIELDS)
+    except ValueError as e:
+        return {'error': f'요청 중 오류 발생: {str(e)}'}
+    response = await _get_roster(company_id)
+    if 'error' in response:
+        return response
+    roster = response['result']
+    accounts = [_project({'person_id': person_id, **data}, columns, max_comment_chars) for person_id, data in roster['persons']]
+    logger.info(f'MCP - 회사 소속 어카운트 조회 완료: {company_id}, {len(accounts)}명')
+    result = {
+        'company': _project(roster['company'], company_columns, max_comment_chars) if roster['company'] is not None else None,
+        'account_count': len(accounts),
+        'accounts': _table(accounts, columns) if tabular else accounts,
+    }
+    if roster['truncated']:
+        result['note'] = f'조회 행 수 제한({os.getenv("KSS_SEARCH_MAX_ROWS", 500)})에 걸려 일부 어카운트가 빠졌을 수 있습니다.'
+    return {'result': result}
+
+
+
+### Tool 1-1-1 : (Multiple Person / Company IDs) 상세정보 일괄 조회
+def _dedupe_ids(ids: List[str]) -> List[str]:
+    """공백 제거 / 대문자 변환 후 입력 순서를 유지하며 중복 ID 제거"""
+    return list(dict.fromkeys(i.strip().upper() for i in ids if i and i.strip()))
 
+async def _gather_bounded(fn, items: List[Any], on_result=None) -> List[Any]:
+    """항목별 fn 을 KSS_BATCH_CONCURRENCY 개씩 동시에 실행 (요청 속도 / 동시성은 kss_scheduler 가 bulk 우선순위로 조절)
+        - on_result: 항목이 끝날 때마다 await on_result(위치, 결과) (쓰기 작업의 항목 단위 checkpoint)
+    """
+    semaphore = asyncio.Semaphore(int(os.getenv("KSS_BATCH_CONCURRENCY", 8)))
+
+    async def _run(position, item):
+        async with semaphore:
+            result = await fn(item)
+        if on_result is not None:
+            await on_result(position, result)
+        return result
+
+    with kss_scheduler.bulk():
+        return list(await asyncio.gather(*[_run(p, i) for p, i in enumerate(items)]))
 
+def _status_summary(reports: List[Dict[str, Any]]) -> str:
+    """행별 결과의 status 개수 요약 (ex: 총 10개 중 created 8개, duplicate 2개.)"""
+    counts: Dict[str, int] = {}
+    for r in reports:
+        counts[r['status']] = counts.get(r['status'], 0) + 1
+    return f"총 {len(reports)}개 중 " + ', '.join(f'{status} {count}개' for status, count in counts.items()) + '.'
+
+def _progress_reporter():
+    """현재 MCP 요청에 progressToken 이 있으면 진행률 알림을 보내는 함수 (요청 밖에서는 None)"""
+    try:
+        ctx = mcp.get_context()
+        ctx.request_context
+    except Exception:
+        return None
+
+    async def report(completed: int, total: int):
+        await ctx.report_progress(completed, total)
+    return report
+
+async def _run_batch(kind: str, items: List[Any], params: Dict[str, Any], background: bool, label: str) -> dict[str, Any]:
+    """일괄 작업 실행 (kss_jobs)
+        - background=True 이거나 항목 수가 KSS_JOB_AUTO_BACKGROUND 이상이면 백그라운드 작업으로 등록하고 job_id 를 바로 반환
+        - 그 외에는 바로 실행하며 묶음(KSS_JOB_CHUNK)마다 MCP progress 알림 전송
+    """
+    threshold = int(os.getenv("KSS_JOB_AUTO_BACKGROUND", 200))
+    if background or (threshold and len(items) >= threshold):
+        job = kss_jobs.submit(kind, items, params)
+        logger.info(f'MCP - {label} 백그라운드 작업 등록: {job.id}, {job.total}개')
+        return {
+            'job_id': job.id,
+            'status': job.status,
+            'total': job.total,
+            '안내': 'kss_job_status 로 진행 상황을, kss_job_result 로 결과를 조회할 수 있습니다.',
+        }
+    result = await kss_jobs.run(kind, items, params, progress=_progress_reporter())
+    if 'error' in result:
+        logger.error(f'MCP - {label} 오류: {result["error"]}')
+        return {'error': f'요청 중 오류 발생: {result["error"]}'}
+    logger.info(f'MCP - {label} 완료: {result["요약"]}')
+    return result
+
+async def _lookup_reports(ids: List[str], lookup, id_key: str) -> List[Dict[str, Any]]:
+    """단건 조회를 제한된 동시성으로 실행하고 ID 별 결과(원본) 반환"""
+    async def _one(item_id: str) -> Dict[str, Any]:
+        return {id_key: item_id, **await lookup(item_id)}
+    return await _gather_bounded(_one, ids)
+
+def _summarize_lookup(reports: List[Dict[str, Any]], id_key: str, available: tuple, params: Dict[str, Any]) -> dict[str, Any]:
+    """ID 별 조회 결과를 하나로 병합 (params 의 fields / max_comment_chars / tabular 적용)"""
+    columns = _select_fields(params.get('fields'), available)
+    found = {r[id_key]: _project(r['result'], columns, params.get('max_comment_chars')) for r in reports if 'result' in r}
+    failed = [{id_key: r[id_key], 'error': r.get('error', '')} for r in reports if 'result' not in r]
+    summary = f"총 {len(reports)}개 중 {len(found)}개 성공, {len(failed)}개 실패."
+    if params.get('tabular'):
+        result = _table([{id_key: item_id, **data} for item_id, data in found.items()], [id_key, *[c for c in columns if c != id_key]])
+    else:
+        result = found
+    return {
+        '요약': summary,
+        'result': result,
+        '실패': failed,
+        f'실패{id_key}': [r[id_key] for r in failed]
+    }
+
+def _output_params(fields: Optional[List[str]], available: tuple, max_comment_chars: Optional[int], tabular: bool) -> Dict[str, Any]:
+    """일괄 조회의 출력 옵션 (작업 파라미터로 저장되어 kss_job_result 에도 적용)"""
+    _select_fields(fields, available)
+    return {'fields': fields or None, 'max_comment_chars': max_comment_chars, 'tabular': tabular}
+
+@kss_tool()
+async def kss_batch_account_info_get(person_ids: List[str], fields: Optional[List[str]] = None, max_comment_chars: Optional[int] = None,
+                                     tabular: bool = False, background: bool = False) -> dict[str, Any]:
+    """KSS Account 여러 개의 상세정보를 한 번에 조회합니다. (중복 ID 는 한 번만 조회)
+
+    Args:
+        person_ids: A로 시작하는 어카운트 ID 리스트 (ex: ["A142340", "A142341"])
+        fields: 필요한 필드만 반환 (ex: ["name", "account_manager"], 기본: 전체)
+        max_comment_chars: comment 최대 글자 수 (기본: 서버 설정, 0 이면 전체)
+        tabular: True 면 result 를 {"columns": [...], "rows": [[...], ...]} 형식으로 반환 (결과가 많을 때 사용)
+        background: True 면 백그라운드 작업으로 실행하고 job_id 를 바로 반환 (많은 ID 조회 시 사용)
+    """
+    logger.info(f'MCP - Person ID 일괄 조회 요청: {len(person_ids)}개')
+    try:
+        params = _output_params(fields, ACCOUNT_FIELDS, max_comment_chars, tabular)
+    except ValueError as e:
+        return {'error': f'요청 중 오류 발생: {str(e)}'}
+    return await _run_batch('account_info_get', person_ids, params, background, 'Person ID 일괄 조회')
+
+@kss_tool()
+async def kss_batch_company_info_get(company_ids: List[str], fields: Optional[List[str]] = None, max_comment_chars: Optional[int] = None,
+                                     tabular: bool = False, background: bool = False) -> dict[str, Any]:
+    """KSS Company 여러 개의 회사 정보를 한 번에 조회합니다. (중복 ID 는 한 번만 조회)
+
+    Args:
+        company_ids: 회사 ID 리스트 (ex: ["C12345", "C12346"])
+        fields: 필요한 필드만 반환 (ex: ["company_name", "country"], 기본: 전체)
+        max_comment_chars: comment 최대 글자 수 (기본: 서버 설정, 0 이면 전체)
+        tabular: True 면 result 를 {"columns": [...], "rows": [[...], ...]} 형식으로 반환 (결과가 많을 때 사용)
+        background: True 면 백그라운드 작업으로 실행하고 job_id 를 바로 반환 (많은 ID 조회 시 사용)
+    """
+    logger.info(f'MCP - 회사 일괄 조회 요청: {len(company_ids)}개')
+    try:
+        params = _output_params(fields, COMPANY_FIELDS, max_comment_chars, tabular)
+    except ValueError as e:
+        return {'error': f'요청 중 오류 발생: {str(e)}'}
+    return await _run_batch('company_info_get', company_ids, params, background, '회사 일괄 조회')
+
+kss_jobs.register('account_info_get', lambda params, ids: _lookup_reports(ids, _get_account, 'person_id'),
+                  lambda params, reports: _summarize_lookup(reports, 'person_id', ACCOUNT_FIELDS, params),
+                  prepare=lambda ids, params: (_dedupe_ids(ids), []))
+kss_jobs.register('company_info_get', lambda params, ids: _lookup_reports(ids, _get_company, 'company_id'),
+                  lambda params, reports: _summarize_lookup(reports, 'company_id', COMPANY_FIELDS, params),
+                  prepare=lambda ids, params: (_dedupe_ids(ids), []))
 
 ### Tool 1-2 : (Person ID) 어카운트 코멘트 생성
-@mcp.tool()
-def kss_account_comment_post(person_id: str, txt: str, date: str = datetime.now().strftime("%Y%m%d"), wtime: str = datetime.now().strftime('%H:%M')) -> dict[str, Any]:
+@kss_tool()
+async def kss_account_comment_post(person_id: str, txt: str, date: str = '', wtime: str = '') -> dict[str, Any]:
     """KSS Account에 코멘트를 작성합니다.         
     Args:
         person_id: A142340 형식) #앞에 A가 붙어야함
@@ -163,16 +871,15 @@ def kss_account_comment_post(person_id: str, txt: str, date: str = datetime.now(
         date: 코멘트 날짜 (yyyymmdd 형식, 기본값:현재 날짜)
         wtime: 작성 시간 (HH:MM 형식, 기본값:현재 시간)
     """          
+    # 서버 프로세스가 오래 유지되므로 기본값은 호출 시점 기준으로 계산
+    now = datetime.now()
+    date = date or now.strftime("%Y%m%d")
+    wtime = wtime or now.strftime('%H:%M')
     logger.info(f'MCP - 어카운트 코멘트 작성 요청: {person_id}, {txt}, {date}, {wtime}')
     try:
         data = f'accid={person_id}&newsyn=N&gbn=I&comment={txt}&validdt={date} {wtime}&cmtDataSrcVal={person_id}&cmtDataSrcType=PERSON_ID'        
-        response = requests.post(
-            f'{kss_request.server}/AC0140PCmtSave.do',
-            headers=kss_request.headers,
-            cookies=kss_request.cookies,            
-            data=data,
-            timeout=int(os.getenv("MCP_DELAY"))  # 타임아웃 설정
-        )
+        response = await kss_request.post('AC0140PCmtSave.do', data=data)
+        _invalidate_account(person_id)
         if response.status_code == 200:            
             return {'result': '코멘트 작성 성공'}
         else: 
@@ -185,21 +892,15 @@ def kss_account_comment_post(person_id: str, txt: str, date: str = datetime.now(
 
 ### Tool 1-2-1 : (Multiple Person IDs) 어카운트 코멘트 동시 생성
 async def _post_comment_async(person_id: str, txt: str, date: str, wtime: str) -> Dict[str, Any]:
-    """Helper to post a single comment using asyncio.to_thread to avoid blocking."""
+    """Helper to post a single comment on the shared async client."""
     try:
         data = f'accid={person_id}&newsyn=N&gbn=I&comment={txt}&validdt={date} {wtime}&cmtDataSrcVal={person_id}&cmtDataSrcType=PERSON_ID'
         
-        response = await asyncio.to_thread(
-            requests.post,
-            f'{kss_request.server}/AC0140PCmtSave.do',
-            headers=kss_request.headers,
-            cookies=kss_request.cookies,
-            data=data,
-            timeout=int(os.getenv("MCP_DELAY"))
-        )
-        
+        response = await kss_request.post('AC0140PCmtSave.do', data=data)
+        _invalidate_account(person_id)
+
         if response.status_code == 200:
-            logger.info(f'MCP - 어카운트 코멘트 작성 성공: {person_id}')
+            logger.info(f'MCP - 어카운트 코멘트 작성 성공: {person_id}', extra={'sample': True})
             return {'person_id': person_id, 'status': 'success'}
         else:
             logger.error(f'MCP - 어카운트 코멘트 작성 실패: {person_id}, status_code: {response.status_code}')
@@ -208,29 +909,15 @@ async def _post_comment_async(person_id: str, txt: str, date: str, wtime: str) -
     except Exception as e:
         logger.error(f'MCP - 어카운트 코멘트 작성 오류: {person_id}, error: {str(e)}')
         return {'person_id': person_id, 'status': 'failed', 'error': str(e)}
-@mcp.tool()
-async def kss_batch_account_comment_post(person_ids: List[str], txt: str) -> dict[str, Any]:
-    """KSS Account 여러 개에 대해 동일한 코멘트를 동시에 작성합니다.
-    
-    Args:
-        person_ids: A로 시작하는 어카운트 ID 리스트 (ex: ["A142340", "A142341"])
-        txt: 작성할 코멘트 내용
-    """
-    logger.info(f'MCP - 어카운트 코멘트 동시 작성 요청: {len(person_ids)}개')
-    
-    now = datetime.now()
-    date = now.strftime("%Y%m%d")
-    wtime = now.strftime('%H:%M')
-    
-    tasks = [_post_comment_async(pid, txt, date, wtime) for pid in person_ids]
-    results = await asyncio.gather(*tasks)
-    
+
+async def _post_comments(params: Dict[str, Any], person_ids: List[str], on_report=None) -> List[Dict[str, Any]]:
+    return await _gather_bounded(lambda pid: _post_comment_async(pid, params['txt'], params['date'], params['wtime']), person_ids, on_report)
+
+def _summarize_comments(params: Dict[str, Any], results: List[Dict[str, Any]]) -> dict[str, Any]:
     successful_posts = [r for r in results if r['status'] == 'success']
     failed_posts = [r for r in results if r['status'] == 'failed']
     
-    summary = f"총 {len(person_ids)}개 중 {len(successful_posts)}개 성공, {len(failed_posts)}개 실패."
-    logger.info(f'MCP - 어카운트 코멘트 동시 작성 완료: {summary}')
-    
+    summary = f"총 {len(results)}개 중 {len(successful_posts)}개 성공, {len(failed_posts)}개 실패."
     return {
         '요약': summary,
         '성공': [r['person_id'] for r in successful_posts],
@@ -239,10 +926,95 @@ async def kss_batch_account_comment_post(person_ids: List[str], txt: str) -> dic
         '실패person_id': [r['person_id'] for r in failed_posts]
     }
 
+@kss_tool()
+async def kss_batch_account_comment_post(person_ids: List[str], txt: str, background: bool = False) -> dict[str, Any]:
+    """KSS Account 여러 개에 대해 동일한 코멘트를 동시에 작성합니다.
+    
+    Args:
+        person_ids: A로 시작하는 어카운트 ID 리스트 (ex: ["A142340", "A142341"])
+        txt: 작성할 코멘트 내용
+        background: True 면 백그라운드 작업으로 실행하고 job_id 를 바로 반환 (많은 어카운트에 작성 시 사용)
+    """
+    logger.info(f'MCP - 어카운트 코멘트 동시 작성 요청: {len(person_ids)}개')
+    
+    now = datetime.now()
+    params = {'txt': txt, 'date': now.strftime("%Y%m%d"), 'wtime': now.strftime('%H:%M')}
+    return await _run_batch('account_comment_post', person_ids, params, background, '어카운트 코멘트 동시 작성')
+
+kss_jobs.register('account_comment_post', _post_comments, _summarize_comments, checkpoint='item')
+
+### Tool 1-3 : (Person ID) 어카운트 정보 업데이트
+# 업데이트 가능한 필드 → AC0140PAccountSave.do 파라미터
+ACCOUNT_SAVE_FIELDS = {
+    'name': 'accnm',
+    'position': 'position',
+    'account_manager': 'amuserid',
+    'url': 'webSite',
+    'comment': 'keyword',
+    'mobile': 'mobile',
+    'email': 'email',
+}
+# AccountSave 요청에 포함되지 않아 변경할 수 없는 필드
+ACCOUNT_READONLY_FIELDS = ('company', 'country')
+
+def _diff_account(snapshot: Dict[str, Any], changes: Dict[str, Any]) -> tuple[Dict[str, str], List[str]]:
+    """요청한 변경 사항 중 기존 값과 다른 필드만 반환 (빈 값은 변경하지 않음) + 변경할 수 없는 필드 목록"""
+    diff, ignored = {}, []
+    for field, value in changes.items():
+        if value is None or str(value).strip() == '':
+            continue
+        if field not in ACCOUNT_SAVE_FIELDS:
+            ignored.append(field)
+            continue
+        if str(value).strip() != str(snapshot.get(field, '') or '').strip():
+            diff[field] = str(value).strip()
+    return diff, ignored
+
+def _account_save_payload(person_id: str, record: Dict[str, Any]) -> Dict[str, Any]:
+    """AC0140PAccountSave.do 업데이트 요청
+        - 이 엔드포인트는 레코드 전체를 덮어쓰므로 변경하지 않는 필드도 기존 값으로 함께 전송
+    """
+    data = {'account': person_id}
+    data.update({param: record.get(field, '') for field, param in ACCOUNT_SAVE_FIELDS.items()})
+    data.update({'mobileType': 'CP', 'mobilecheck': 'VALID', 'emailcheck': 'VALID', 'emailtm': 'on', 'primaryYn': 'on'})
+    return data
+
+async def _update_account(person_id: str, changes: Dict[str, Any]) -> Dict[str, Any]:
+    """변경 사항이 있는 경우에만 저장하고 행 단위 결과 반환 (status: updated / unchanged / error)"""
+    person_id = person_id.strip().upper()
+    report: Dict[str, Any] = {'person_id': person_id}
+    try:
+        # 기존 정보 (캐시 → 복제본 → KSS 순서로 조회)
+        existing_info_response = await _get_account(person_id)
+        if 'error' in existing_info_response:
+            return {**report, 'status': 'error', 'error': f'기존 정보 조회 실패: {existing_info_response["error"]}'}
+        existing_info = existing_info_response['result']
+
+        diff, ignored = _diff_account(existing_info, changes)
+        if ignored:
+            report['ignored'] = ignored
+        if not diff:
+            return {**report, 'status': 'unchanged'}
+
+        merged = {**existing_info, **diff}
+        response = await kss_request.post('AC0140PAccountSave.do', data=_account_save_payload(person_id, merged))
+        kss_cache.invalidate(kss_cache.key('account', person_id))
+        _invalidate_search()
+        if response.status_code != 200:
+            logger.error(f'MCP - 어카운트 정보 업데이트 실패: {person_id}, 상태코드: {response.status_code}')
+            return {**report, 'status': 'error', 'error': f'업데이트 실패 (상태 코드: {response.status_code})'}
+
+        logger.info(f'MCP - 어카운트 정보 업데이트 성공: {person_id}, {sorted(diff)}', extra={'sample': True})
+        if kss_replica is not None:
+            # 저장한 값으로 복제본 갱신 (다음 검색 / 조회에 바로 반영)
+            kss_replica.upsert_persons([(person_id, merged)])
+        return {**report, 'status': 'updated', 'changed': diff}
+    except Exception as e:
+        logger.error(f'MCP - 어카운트 정보 업데이트 오류: {person_id}, error: {str(e)}')
+        return {**report, 'status': 'error', 'error': f'요청 중 오류 발생: {str(e)}'}
 
-### Tool 1-3 : (Person ID) 어카운트 정보 업데이트 (미완성)
-@mcp.tool()
-def kss_account_info_update(person_id: str,
+@kss_tool()
+async def kss_account_info_update(person_id: str,
                             company: str = '',
                             name: str = '',
                             position: str = '',
@@ -253,13 +1025,13 @@ def kss_account_info_update(person_id: str,
                             email: str = '',
                             comment: str = '',
                             ) -> dict[str, Any]:
-    """KSS Account에 어카운트 정보를 업데이트합니다.         
+    """KSS Account에 어카운트 정보를 업데이트합니다. (기존 값과 같으면 저장하지 않음)
     Args:
         person_id: A142340 형식) #앞에 A가 붙어야함
-        company: 회사명
+        company: 회사명 (변경 불가)
         name: 이름
         position: 직책
-        country: 국가
+        country: 국가 (변경 불가)
         account_manager: 어카운트 매니저
         url: 웹사이트
         mobile: 전화번호
@@ -267,79 +1039,141 @@ def kss_account_info_update(person_id: str,
         comment: 코멘트
     """          
     logger.info(f'MCP - 어카운트 정보 업데이트 요청: {person_id}')
-    
-    try:
-        # 기존 정보 조회 먼저
-        existing_info_response = kss_account_info_get(person_id)
-        if 'error' in existing_info_response:
-            return {'error': f'기존 정보 조회 실패: {existing_info_response["error"]}'}
-        
-        existing_info = existing_info_response['result']
-        
-        # 업데이트할 데이터 구성 (기존 정보 + 새로운 정보)
-        data = {
-            'account': person_id,
-            # 'copyYn': 'N',
-            # 'newsyn': 'N',
-            # 'useyn': 'Y',
-            # 'rankRadio': 'C',
-            # 'gender': 'MR',
-            # 'acc_comp_gubun': 'ACC',
-            
-            # 회사 정보
-            # 'repCompNm': company if company else existing_info.get('company', ''),
-            # 'regcompnm12': company if company else existing_info.get('company', ''),
-            
-            # 개인 정보
-            'accnm': name if name else existing_info.get('name', ''),
-            'position': position if position else existing_info.get('position', ''),
-            'amuserid': account_manager if account_manager else existing_info.get('account_manager', ''),
-            'webSite': url if url else existing_info.get('url', ''),
-            'keyword': comment if comment else existing_info.get('comment', ''),
-            
-            # 연락처 정보
-            'mobile': mobile if mobile else existing_info.get('mobile', ''),
-            'mobileType': 'CP',
-            'mobilecheck': 'VALID',
-            'email': email if email else existing_info.get('email', ''),
-            'emailcheck': 'VALID',
-            'emailtm': 'on',
-            'primaryYn': 'on',
-            
-            # 주소/국가 정보
-            # 'countryNm': country if country else existing_info.get('country', ''),
-            
-            # 기타 필수 필드들
-            # 'department': 'CEM',
-            # 'tmYn': 'Y',
-            # 'rmYn': 'N',
-            # 'emYn': 'N',
-            # 'umYn': 'N',
-        }
+    changes = {'company': company, 'name': name, 'position': position, 'country': country, 'account_manager': account_manager,
+               'url': url, 'mobile': mobile, 'email': email, 'comment': comment}
+    report = await _update_account(person_id, changes)
+    if report['status'] == 'error':
+        return {'error': report['error']}
+    if report['status'] == 'unchanged':
+        return {'result': '변경된 내용이 없어 업데이트하지 않았습니다.', 'ignored': report.get('ignored', [])}
+    return {'result': '어카운트 정보 업데이트 성공', 'changed': report['changed'], 'ignored': report.get('ignored', [])}
 
-        response = requests.post(
-            f'{kss_request.server}/AC0140PAccountSave.do',
-            cookies=kss_request.cookies,
-            headers=kss_request.headers,
-            data=data,
-            timeout=int(os.getenv("MCP_DELAY"))
-        )
-        
-        if response.status_code == 200:
-            logger.info(f'MCP - 어카운트 정보 업데이트 성공: {person_id}')
-            return {'result': '어카운트 정보 업데이트 성공'}
-        else:
-            logger.error(f'MCP - 어카운트 정보 업데이트 실패: {person_id}, 상태코드: {response.status_code}')
-            return {'error': f'업데이트 실패 (상태 코드: {response.status_code})'}
-            
-    except Exception as e:
-        logger.error(f'MCP - 어카운트 정보 업데이트 오류: {str(e)}')
-        return {'error': f'요청 중 오류 발생: {str(e)}'}
 
+### Tool 1-3-1 : (Multiple Person IDs) 어카운트 정보 일괄 업데이트
+def _merge_updates(updates: List[Dict[str, Any]], params: Dict[str, Any]) -> tuple[list, list]:
+    """같은 person_id 의 변경 사항을 순서대로 합침 → (실행할 항목, 형식 오류 행 결과)"""
+    merged: Dict[str, Dict[str, Any]] = {}
+    invalid = []
+    for item in updates:
+        person_id = str(item.get('person_id', '')).strip().upper()
+        if not person_id or not isinstance(item.get('changes'), dict):
+            invalid.append({'person_id': person_id, 'status': 'error', 'error': 'person_id 와 changes(dict) 가 필요합니다.'})
+            continue
+        merged.setdefault(person_id, {}).update(item['changes'])
+    return [{'person_id': pid, 'changes': changes} for pid, changes in merged.items()], invalid
+
+async def _update_accounts(params: Dict[str, Any], items: List[Dict[str, Any]], on_report=None) -> List[Dict[str, Any]]:
+    return await _gather_bounded(lambda item: _update_account(item['person_id'], item['changes']), items, on_report)
+
+def _summarize_updates(params: Dict[str, Any], reports: List[Dict[str, Any]]) -> dict[str, Any]:
+    return {
+        '요약': _status_summary(reports),
+        'result': reports,
+        '실패': [r for r in reports if r['status'] == 'error'],
+        '실패person_id': [r['person_id'] for r in reports if r['status'] == 'error'],
+    }
+
+@kss_tool()
+async def kss_batch_account_info_update(updates: List[Dict[str, Any]], background: bool = False) -> dict[str, Any]:
+    """여러 어카운트의 정보를 한 번에 업데이트합니다. (ex: 퇴사한 AM 의 어카운트 일괄 재배정)
+    기존 값과 같은 항목은 저장하지 않고, 행별로 결과를 알려줍니다.
+
+    Args:
+        updates: [{"person_id": "A142340", "changes": {"account_manager": "kelly"}}, ...] 형식 리스트
+                 changes 키: name, position, account_manager, url, mobile, email, comment
+                 같은 person_id 가 여러 번 있으면 변경 사항을 순서대로 합쳐 한 번만 저장
+        background: True 면 백그라운드 작업으로 실행하고 job_id 를 바로 반환 (많은 어카운트 업데이트 시 사용)
+
+    Returns:
+        result: 행별 결과 (status: updated / unchanged / error)
+    """
+    logger.info(f'MCP - 어카운트 정보 일괄 업데이트 요청: {len(updates)}개')
+    return await _run_batch('account_info_update', updates, {}, background, '어카운트 정보 일괄 업데이트')
+
+kss_jobs.register('account_info_update', _update_accounts, _summarize_updates, prepare=_merge_updates, checkpoint='item')
 
 ### Tool 2-1 : (name, company) 어카운트 검색
-@mcp.tool()
-def kss_account_query_name_company(name: str, company: str = '') -> dict[str, Any]:    
+def _match_score(value: str, query: str) -> int:
+    """검색어 일치 정도 (완전일치 3, 앞부분 일치 2, 포함 1)"""
+    value, query = ' '.join(value.lower().split()), ' '.join(query.lower().split())
+    if not query:
+        return 0
+    if value == query:
+        return 3
+    if value.startswith(query):
+        return 2
+    return 1 if query in value else 0
+
+def _encode_cursor(name: str, company: str, offset: int, ranked: bool) -> str:
+    raw = json.dumps({'q': [name, company], 'o': offset, 'r': ranked}, ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def _decode_cursor(cursor: str, name: str, company: str) -> tuple[int, bool]:
+    data = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+    if data['q'] != [name, company]:
+        raise ValueError('cursor 가 현재 검색 조건(name, company)과 일치하지 않습니다.')
+    return int(data['o']), bool(data['r'])
+
+def _search_params(name: str, company: str) -> dict:
+    return {
+        'type1': 'ACCOUNT_NM/3^ACCOUNT_LOCAL_NM/3^ACCOUNT_NICK_NM/3',
+        'queryDetail1': name,
+        'type2': 'COMPNM/3^COMP_LOCAL_NM/3^COMP_NICK_NM/3^COMP_ALIAS/3^NOT_PRIMARY_COMP_ALIAS/3',
+        'queryDetail2': company,
+        'viewResultCount': os.getenv("KSS_SEARCH_MAX_ROWS", '500'),
+    }
+
+def _search_row(result: dict) -> dict[str, Any]:
+    """AC0180MSearchAll.do 의 PERSON 행에서 검색 결과에 필요한 필드만 추출"""
+    return {
+        'person_id': result.get('personid', ''),
+        'company': clean_company_name(result.get('compnm', '')),
+        'company_id': result.get('compid', ''),
+        'name': result.get('personnmdesc', ''),
+        'position': result.get('positionNm', ''),
+        'country': result.get('countryNm', ''),
+        'account_manager': result.get('am', '')
+    }
+
+async def _search_persons(name: str, company: str) -> List[dict[str, Any]]:
+    """어카운트 검색 결과 (PERSON 행만, 필요한 필드만 추출) - 다음 페이지 조회를 위해 캐시
+        - KSS_REPLICA_SEARCH=true 이고 복제본 동기화가 신선도 기준 이내면 복제본에서 검색
+        - KSS 에서 검색한 경우 결과 행을 복제본에 저장
+    """
+    cache_key = ('search', name.strip().lower(), company.strip().lower())
+    cached = kss_cache.get(cache_key)
+    if cached is not None:
+        return cached['rows']
+
+    if kss_replica is not None and os.getenv("KSS_REPLICA_SEARCH", "false").lower() == 'true' and kss_replica.search_ready():
+        rows = kss_replica.search(name, company, limit=int(os.getenv("KSS_SEARCH_MAX_ROWS", 500)))
+        if not rows:
+            raise KeyError('Data')
+        kss_cache.set(cache_key, {'rows': rows})
+        return rows
+
+    generation = kss_cache.generation('search')
+
+    async def _fetch() -> List[dict[str, Any]]:
+        rows, replica_rows = [], []
+        async for result in kss_request.iter_rows('AC0180MSearchAll.do', params=_search_params(name, company)):
+            if result.get('gubun') == 'PERSON':
+                if kss_replica is not None:
+                    replica_rows.append((result.get('personid', ''), _account_from_row(result)))
+                rows.append(_search_row(result))
+        if replica_rows:
+            kss_replica.upsert_persons(replica_rows)
+        # 검색 도중 어카운트가 생성 / 변경되었으면 변경 전 결과일 수 있으므로 캐시하지 않음
+        if kss_cache.generation('search') == generation:
+            kss_cache.set(cache_key, {'rows': rows})
+        return rows
+
+    # 같은 검색이 동시에 진행 중이면 그 결과를 공유
+    return await kss_singleflight.do(cache_key, _fetch)
+
+@kss_tool()
+async def kss_account_query_name_company(name: str, company: str = '', page_size: int = 50, cursor: str = '', top_n: int = 0,
+                                        fields: Optional[List[str]] = None, tabular: bool = False) -> dict[str, Any]:    
     """
     name, company를 입력하면, KSS 어카운트 검색 결과를 조회합니다.
     등록된 계정이 있을경우 번호. 이름 - 회사 - 어카운트  Person ID 으로 보여줍니다.    
@@ -348,6 +1182,11 @@ def kss_account_query_name_company(name: str, company: str = '') -> dict[str, An
         name: 이름 (필수)
         company: 회사명 (선택 - 입력하면 해당 회사 소속만 검색, 입력하지 않으면 전체 검색됨)
                회사명은 영어로 입력 필요.          
+        page_size: 한 번에 반환할 결과 수 (기본 50)
+        cursor: 이전 응답의 next_cursor (다음 페이지 조회 시에만 입력)
+        top_n: 0보다 크면 이름/회사명이 가장 잘 일치하는 결과 top_n 개만 반환 (다음 순위는 next_cursor 로 조회)
+        fields: 필요한 필드만 반환 (기본: person_id, company, company_id, name, position, country, account_manager)
+        tabular: True 면 result 를 {"columns": [...], "rows": [[...], ...]} 형식으로 반환 (결과가 많을 때 사용)
     example:
         예상 질문과 AI 응답:
         사용자: "홍길동씨 찾아줘"
@@ -361,50 +1200,331 @@ def kss_account_query_name_company(name: str, company: str = '') -> dict[str, An
     
     Note:
         검색결과가 없을경우  영어로 변경하여 검색할지 사용자에게 물어봅니다.
+        search_count 는 전체 결과 수이며, next_cursor 가 있으면 나머지 결과가 더 있습니다.
     """
-    logger.info(f'MCP - 어카운트(name, company) 조회 요청: {name}, {company}')
+    logger.info(f'MCP - 어카운트(name, company) 조회 요청: {name}, {company}, cursor={bool(cursor)}, top_n={top_n}')
     
     try:
-        response = requests.get(
-            f'{kss_request.server}/AC0180MSearchAll.do',
-            headers=kss_request.headers,
-            cookies=kss_request.cookies,
-            params={
-                'type1': 'ACCOUNT_NM/3^ACCOUNT_LOCAL_NM/3^ACCOUNT_NICK_NM/3',
-                'queryDetail1': name,
-                'type2': 'COMPNM/3^COMP_LOCAL_NM/3^COMP_NICK_NM/3^COMP_ALIAS/3^NOT_PRIMARY_COMP_ALIAS/3',
-                'queryDetail2': company,
-                'viewResultCount': '500',
-            }
-        )           
-        
+        columns = _select_fields(fields, SEARCH_FIELDS)
+        offset, ranked = _decode_cursor(cursor, name, company) if cursor else (0, top_n > 0)
+        if top_n > 0:
+            page_size = top_n
+        page_size = max(1, page_size)
+
         try:
-            results = response.json()['Data'] 
-            data = []           
-        except Exception as e:       
+            rows = await _search_persons(name, company)
+        except KeyError:
             return {'result': '검색 결과가 없습니다.'}
-        
-        for result in results:
-            if result['gubun'] == 'PERSON':
-                
-                data.append({
-                    'person_id': result.get('personid', ''),
-                    'company': clean_html_tags(result.get('compnm', '')),
-                    'company_id': result.get('compid', ''),                
-                    'name': result.get('personnmdesc', ''),                
-                    'position': result.get('positionNm', ''),              
-                    'country': result.get('countryNm', ''),              
-                    'account_manager': result.get('am', '')
-                })
-
-        return {'search_count': len(data),'result': data}
+
+        if ranked:
+            # 점수가 같으면 KSS 응답 순서 유지 (stable sort)
+            rows = sorted(rows, key=lambda r: (_match_score(r['name'], name), _match_score(r['company'], company)), reverse=True)
+        page = rows[offset:offset + page_size]
+        next_offset = offset + len(page)
+        page = [_project(r, columns) for r in page]
+
+        return {
+            'search_count': len(rows),
+            'offset': offset,
+            'returned': len(page),
+            'next_cursor': _encode_cursor(name, company, next_offset, ranked) if next_offset < len(rows) else '',
+            'result': _table(page, columns) if tabular else page
+        }
     except Exception as e:
         logger.error(f'MCP - 어카운트(name, company) 조회 오류: {str(e)}')
         return {'error': f'요청 중 오류 발생: {str(e)}'}
       
+### Tool 2-2 : 어카운트 대량 내보내기 (CSV / Parquet 파일)
+def _export_queries(company_ids: List[str], name: str, company: str, max_rows: int) -> List[Dict[str, Any]]:
+    """KSS 검색 요청 목록 (회사 ID 별 하나, 없으면 이름 / 회사명 검색 하나)"""
+    if not company_ids:
+        return [{**_search_params(name, company), 'viewResultCount': max_rows}]
+    queries = []
+    for company_id in company_ids:
+        params = {'queryDetail1': company_id.strip().upper(), 'type1': 'COMPID/1', 'viewResultCount': max_rows}
+        if name:
+            params.update({'queryDetail2': name, 'type2': 'ACCOUNT_NM/3^ACCOUNT_LOCAL_NM/3^ACCOUNT_NICK_NM/3'})
+        queries.append(params)
+    return queries
+
+async def _export_file(params: Dict[str, Any]) -> Dict[str, Any]:
+    """조건에 맞는 PERSON 행을 응답을 받는 대로 KSS_EXPORT_CHUNK 행씩 파일에 추가"""
+    max_rows = int(os.getenv("KSS_EXPORT_MAX_ROWS", 100000))
+    timeout = float(os.getenv("KSS_EXPORT_TIMEOUT", 300))
+    chunk_size = int(os.getenv("KSS_EXPORT_CHUNK", 1000))
+    columns = params['columns']
+    country, account_manager = params['country'].strip().lower(), params['account_manager'].strip().lower()
+    writer = ExportWriter(params['path'], columns, params['format'])
+    seen = set()
+    chunk: List[Dict[str, Any]] = []
+    preview: List[Dict[str, Any]] = []
+    scanned = 0
+    truncated: List[str] = []
+    try:
+        for query in _export_queries(params['company_ids'], params['name'], params['company'], max_rows):
+            received = 0
+            try:
+                async for row in kss_request.iter_rows('AC0180MSearchAll.do', params=query, timeout=timeout):
+                    received += 1
+                    if row.get('gubun') != 'PERSON':
+                        continue
+                    scanned += 1
+                    person_id = row.get('personid', '')
+                    if person_id in seen:
+                        continue
+                    # 국가 / 어카운트 매니저는 KSS 검색 조건이 없어 받은 행에서 거름
+                    if country and str(row.get('countryNm', '')).strip().lower() != country:
+                        continue
+                    if account_manager and str(row.get('am', '')).strip().lower() != account_manager:
+                        continue
+                    seen.add(person_id)
+                    record = _project({'person_id': person_id, **_account_from_row(row)}, columns, max_comment_chars=0)
+                    chunk.append(record)
+                    if len(preview) < params['preview_rows']:
+                        preview.append(_project(record, columns))
+                    if len(chunk) >= chunk_size:
+                        await asyncio.to_thread(writer.write, chunk)
+                        chunk = []
+            except KeyError:
+                continue
+            if received >= max_rows:
+                truncated.append(query['queryDetail1'] if params['company_ids'] else f"{params['name']} / {params['company']}")
+        await asyncio.to_thread(writer.write, chunk)
+        await asyncio.to_thread(writer.close)
+    except Exception:
+        await asyncio.to_thread(writer.discard)
+        raise
+    result = {
+        'path': writer.path,
+        'format': params['format'],
+        'row_count': writer.rows,
+        'scanned_rows': scanned,
+        'preview': _table(preview, columns),
+    }
+    if truncated:
+        result['truncated'] = truncated
+        result['note'] = (f'조회 행 수 제한(KSS_EXPORT_MAX_ROWS={max_rows})에 걸려 일부 어카운트가 빠졌을 수 있습니다. '
+                          f'(해당 조건: {", ".join(truncated)})')
+    return result
+
+async def _export_accounts(params: Dict[str, Any], items: List[Any]) -> List[Dict[str, Any]]:
+    """kss_jobs 실행 함수 - 내보내기 한 건이 항목 하나 (중단되면 처음부터 같은 파일에 다시 기록)"""
+    try:
+        result = await _export_file(params)
+    except Exception as e:
+        logger.error(f'MCP - 어카운트 내보내기 오류: {str(e)}')
+        return [{'error': f'요청 중 오류 발생: {str(e)}'}]
+    logger.info(f'MCP - 어카운트 내보내기 완료: {result["row_count"]}행, {result["path"]}')
+    return [{'result': result}]
+
+def _summarize_export(params: Dict[str, Any], reports: List[Dict[str, Any]]) -> dict[str, Any]:
+    if not reports:
+        return {'요약': '내보내기 진행 중', 'path': params['path']}
+    if 'error' in reports[0]:
+        return {'요약': '내보내기 실패', 'error': reports[0]['error']}
+    return {'요약': f"{reports[0]['result']['row_count']}행 저장", 'result': reports[0]['result']}
+
+@kss_tool()
+async def kss_export(company_ids: Optional[List[str]] = None, company: str = '', name: str = '', country: str = '',
+                     account_manager: str = '', fields: Optional[List[str]] = None, format: str = 'csv',
+                     preview_rows: int = 5, background: bool = True) -> dict[str, Any]:
+    """KSS 어카운트를 조건으로 조회하여 CSV / Parquet 파일로 저장합니다. (대화에는 파일 경로, 행 수, 미리보기만 반환)
+    수백 건 이상의 어카운트 목록 / 보고서가 필요할 때 kss_account_query_name_company 대신 사용하세요.
+
+    Args:
+        company_ids: 회사 ID 리스트 (ex: ["C12345", "C12346"], 지정하면 해당 회사 소속 어카운트 전체)
+        company: 회사명 검색어 (company_ids 가 없을 때 사용)
+        name: 이름 검색어 (부분 일치)
+        country: 국가 (ex: "Korea", 다른 조건으로 조회한 어카운트 중 일치하는 것만)
+        account_manager: 어카운트 매니저 (다른 조건으로 조회한 어카운트 중 일치하는 것만)
+        fields: 파일에 저장할 필드 (기본: 전체)
+                person_id, company, company_id, name, url, mobile, position, email, country, comment, account_manager
+        format: "csv" 또는 "parquet"
+        preview_rows: 함께 반환할 미리보기 행 수 (기본 5)
+        background: True 면 백그라운드 작업으로 실행하고 job_id 를 바로 반환 (기본값, kss_job_result 로 결과 조회)
+    Note:
+        company_ids / company / name 중 하나 이상 입력해야 합니다. (country / account_manager 만으로는 내보낼 수 없음)
+    """
+    logger.info(f'MCP - 어카운트 내보내기 요청: company_ids={len(company_ids or [])}, company={company}, name={name}, '
+                f'country={country}, account_manager={account_manager}, format={format}')
+    company_ids = _dedupe_ids(company_ids or [])
+    if not (company_ids or company.strip() or name.strip()):
+        return {'error': '검색 조건(company_ids / company / name)을 하나 이상 입력해주세요. '
+                         '(country / account_manager 는 조회한 어카운트를 거르는 조건입니다)'}
+    try:
+        columns = _select_fields(fields, ROSTER_FIELDS)
+        check_format(format)
+    except ValueError as e:
+        return {'error': f'요청 중 오류 발생: {str(e)}'}
+    params = {
+        'company_ids': company_ids, 'company': company, 'name': name, 'country': country,
+        'account_manager': account_manager, 'columns': columns, 'format': format,
+        'preview_rows': preview_rows, 'path': export_path(format),
+    }
+    result = await _run_batch('account_export', [params['path']], params, background, '어카운트 내보내기')
+    if background:
+        result['path'] = params['path']
+    return result
+
+kss_jobs.register('account_export', _export_accounts, _summarize_export)
+
 ### Tool 3-1 : 신규 어카운트 생성
-@mcp.tool()
-def kss_account_create(name: str = 'Unknown', mobile: str =None, email: str =None, company: str = '', position: str = '', country: str = '', account_manager: str = '', url: str = '', comment: str = '') -> dict[str, Any]:
+_NON_DIGIT = re.compile(r'\D')
+
+def _normalize_mobile(mobile: str) -> str:
+    return _NON_DIGIT.sub('', mobile or '')
+
+async def _check_mobile(mobile: str) -> bool:
+    """모바일 번호 중복 여부 (AC0140PMobileCheck.do)"""
+    response = await kss_request.post('AC0140PMobileCheck.do', data={'mobile': mobile}, idempotent=True)
+    response.raise_for_status()
+    return response.text == '"DUPLICATE"'
+
+async def _check_email(email: str) -> str:
+    """이메일 중복 시 기존 Person ID 반환, 없으면 '' (AC0140PAutoCompleteEmail.do)"""
+    response = await kss_request.post('AC0140PAutoCompleteEmail.do', data={'searchTerm': email}, idempotent=True)
+    response.raise_for_status()
+    try:
+        return response.json()[0]['id']
+    except Exception:
+        return ''
+
+# 신규 생성 요청 형식(_account_create_payload)과 응답(personid)이 실제 KSS 에서 확인되기 전까지는 중복 체크만 실행
+ACCOUNT_CREATE_ENABLED = os.getenv("KSS_ACCOUNT_CREATE", "false").lower() == 'true'
+
+def _account_create_payload(contact: Dict[str, Any]) -> Dict[str, Any]:
+    """AC0140PAccountSave.do 신규 생성 요청 (newsyn=Y, account 없음)"""
+    return {
+        'account': '',
+        'newsyn': 'Y',
+        'useyn': 'Y',
+        'accnm': contact.get('name') or 'Unknown',
+        'repCompNm': contact.get('company', ''),
+        'regcompnm12': contact.get('company', ''),
+        'position': contact.get('position', ''),
+        'countryNm': contact.get('country', ''),
+        'amuserid': contact.get('account_manager', ''),
+        'webSite': contact.get('url', ''),
+        'keyword': contact.get('comment', ''),
+        'mobile': contact.get('mobile', ''),
+        'mobileType': 'CP',
+        'mobilecheck': 'VALID',
+        'email': contact.get('email', ''),
+        'emailcheck': 'VALID',
+        'emailtm': 'on',
+        'primaryYn': 'on',
+    }
+
+def _split_batch_duplicates(contacts: List[Dict[str, Any]], params: Dict[str, Any]) -> tuple[list, list]:
+    """목록 안에서 모바일 / 이메일이 앞 행과 같은 행을 duplicate_in_batch 로 분리 → ([[행 번호, 연락처]...], 중복 행 결과)"""
+    rows = []
+    duplicates: List[Dict[str, Any]] = []
+    seen_mobiles: Dict[str, int] = {}
+    seen_emails: Dict[str, int] = {}
+    for index, contact in enumerate(contacts):
+        mobile = _normalize_mobile(contact.get('mobile', ''))
+        email = (contact.get('email') or '').strip().lower()
+        if mobile and mobile in seen_mobiles:
+            reason = f'{seen_mobiles[mobile]}번 행과 모바일 번호 중복'
+        elif email and email in seen_emails:
+            reason = f'{seen_emails[email]}번 행과 이메일 중복'
+        else:
+            if mobile:
+                seen_mobiles[mobile] = index
+            if email:
+                seen_emails[email] = index
+            rows.append([index, contact])
+            continue
+        duplicates.append({'row': index, 'name': contact.get('name') or 'Unknown', 'status': 'duplicate_in_batch', 'reason': reason})
+    return rows, duplicates
+
+async def _check_and_create(rows: List[List[Any]], dry_run: bool = False, on_report=None) -> List[Dict[str, Any]]:
+    """[[행 번호, 연락처]...] 일괄 생성
+        1. 고유 모바일 / 이메일 중복 체크를 모두 동시에 실행
+        2. 중복이 없는 행만 제한된 동시성으로 생성 (dry_run 이면 생성하지 않고 checked)
+        - on_report: 행 결과가 확정될 때마다 await on_report(위치, 결과) (백그라운드 작업의 항목 단위 checkpoint)
+    """
+    reports = [{'row': index, 'name': contact.get('name') or 'Unknown', 'status': 'pending'} for index, contact in rows]
+
+    async def _capture(coro):
+        try:
+            return await coro
+        except Exception as e:
+            return e
+
+    # 고유 값 단위로 중복 체크 (모바일 / 이메일 체크를 함께 동시에 실행)
+    mobiles = list(dict.fromkeys(c['mobile'] for _, c in rows if c.get('mobile')))
+    emails = list(dict.fromkeys(c['email'] for _, c in rows if c.get('email')))
+    checks = await _gather_bounded(
+        lambda check: _capture(_check_mobile(check[1]) if check[0] == 'mobile' else _check_email(check[1])),
+        [('mobile', m) for m in mobiles] + [('email', e) for e in emails],
+    )
+    mobile_results = dict(zip(mobiles, checks[:len(mobiles)]))
+    email_results = dict(zip(emails, checks[len(mobiles):]))
+
+    to_create = []
+    for position, (report, (_, contact)) in enumerate(zip(reports, rows)):
+        mobile_result = mobile_results.get(contact.get('mobile'), False)
+        email_result = email_results.get(contact.get('email'), '')
+        if isinstance(mobile_result, Exception) or isinstance(email_result, Exception):
+            error = mobile_result if isinstance(mobile_result, Exception) else email_result
+            report.update(status='error', error=f'중복 체크 실패: {str(error)}')
+        elif mobile_result:
+            report.update(status='duplicate', reason='동일한 모바일 번호가 KSS 어카운트에 존재합니다.')
+        elif email_result:
+            report.update(status='duplicate', reason='이미 존재하는 이메일입니다.', person_id=email_result)
+        elif dry_run:
+            report.update(status='checked')
+        else:
+            to_create.append((position, report, contact))
+            continue
+        if on_report is not None:
+            await on_report(position, report)
+
+    async def _create(item):
+        position, report, contact = item
+        try:
+            response = await kss_request.post('AC0140PAccountSave.do', data=_account_create_payload(contact))
+            if response.status_code != 200:
+                report.update(status='error', error=f'생성 실패 (상태 코드: {response.status_code})')
+                return
+            try:
+                person_id = response.json().get('personid', '')
+            except Exception:
+                person_id = ''
+            report.update(status='created', person_id=person_id)
+            _invalidate_search()
+            if kss_replica is not None and person_id:
+                # 복제본 검색에 바로 포함 (회사 ID 등 KSS 가 정하는 값은 없으므로 상세 조회 시 KSS 에서 다시 받도록 synced_at=0)
+                kss_replica.upsert_persons([(person_id, {**contact, 'company_id': ''})], synced_at=0)
+            logger.info(f'MCP - 신규 어카운트 생성 성공: {report["name"]}, {person_id}', extra={'sample': True})
+        except Exception as e:
+            logger.error(f'MCP - 신규 어카운트 생성 오류: {report["name"]}, error: {str(e)}')
+            report.update(status='error', error=str(e))
+
+    async def _created(offset: int, result):
+        if on_report is not None:
+            await on_report(to_create[offset][0], to_create[offset][1])
+
+    await _gather_bounded(_create, to_create, _created)
+    return reports
+
+async def _create_accounts(params: Dict[str, Any], rows: List[List[Any]], on_report=None) -> List[Dict[str, Any]]:
+    # 재개된 작업도 생성이 비활성화된 서버에서는 중복 체크만 실행
+    dry_run = params.get('dry_run', True) or not ACCOUNT_CREATE_ENABLED
+    return await _check_and_create(rows, dry_run=dry_run, on_report=on_report)
+
+def _summarize_creates(params: Dict[str, Any], reports: List[Dict[str, Any]]) -> dict[str, Any]:
+    reports = sorted(reports, key=lambda r: r['row'])
+    return {
+        '요약': _status_summary(reports),
+        'result': reports,
+        '생성person_id': [r['person_id'] for r in reports if r['status'] == 'created'],
+        '실패': [r for r in reports if r['status'] == 'error'],
+    }
+
+@kss_tool()
+async def kss_account_create(name: str = 'Unknown', mobile: str =None, email: str =None, company: str = '', position: str = '', country: str = '', account_manager: str = '', url: str = '', comment: str = '') -> dict[str, Any]:
     """KSS Account에 신규 어카운트를 생성합니다.         
     Args:
         name: 이름
@@ -418,34 +1538,173 @@ def kss_account_create(name: str = 'Unknown', mobile: str =None, email: str =Non
         comment: 코멘트
     """
     logger.info(f'MCP - 신규 어카운트 생성 요청: {name}, {company}, {position}, {country}, {account_manager}, {url}, {mobile}, {email}, {comment}')
-    if mobile:
-        mobile_check = requests.post(f'{kss_request.server}/AC0140PMobileCheck.do',cookies=kss_request.cookies,headers=kss_request.headers,data={'mobile': mobile},)
-        if mobile_check.text =='"DUPLICATE"':
-            return {'error': '동일한 모바일 번호가 KSS 어카운트에 존재합니다.'}
-    if email:
-        email_check = requests.post(f'{kss_request.server}/AC0140PAutoCompleteEmail.do',cookies=kss_request.cookies,headers=kss_request.headers,data={'searchTerm': email},)
-        try:
-            result = email_check.json()
-            return {'error': f'이미 존재하는 이메일입니다. Person ID: {result[0]["id"]}'}            
-        except:
-            pass
+    contact = {'name': name, 'mobile': mobile or '', 'email': email or '', 'company': company, 'position': position,
+               'country': country, 'account_manager': account_manager, 'url': url, 'comment': comment}
+    report = (await _check_and_create([[0, contact]], dry_run=not ACCOUNT_CREATE_ENABLED))[0]
+    if report['status'] == 'checked':
+        return {'result': '이메일 체크 완료'}
+    if report['status'] == 'created':
+        return {'result': '어카운트 생성 성공', 'person_id': report['person_id']}
+    if report['status'] == 'duplicate':
+        person_id = f" Person ID: {report['person_id']}" if report.get('person_id') else ''
+        return {'error': f"{report['reason']}{person_id}"}
+    return {'error': f"요청 중 오류 발생: {report['error']}"}
 
 
+### Tool 3-1-1 : 신규 어카운트 일괄 생성
+@kss_tool()
+async def kss_batch_account_create(contacts: List[Dict[str, Any]], dry_run: bool = True, background: bool = False) -> dict[str, Any]:
+    """여러 연락처(ex: 전시회 명함 목록)의 모바일 / 이메일 중복 여부를 KSS Account에서 한 번에 체크합니다.
+    목록 안의 중복과 KSS 에 이미 있는 모바일 / 이메일을 행별로 알려줍니다.
 
-    return {'result': '이메일 체크 완료'}
-     
-        
+    Args:
+        contacts: 연락처 리스트. 각 항목의 키: name, mobile, email, company, position, country, account_manager, url, comment
+                  (ex: [{"name": "Hong Gildong", "email": "hong@example.com", "company": "Samsung"}])
+        dry_run: 중복 체크만 실행 (status: checked), 서버에서 어카운트 생성이 허용된 경우에만 False 사용 가능
+        background: True 면 백그라운드 작업으로 실행하고 job_id 를 바로 반환 (많은 연락처 체크 시 사용)
 
- 
+    Returns:
+        result: 행별 결과 (row 는 입력 순서, status: checked / duplicate / duplicate_in_batch / error)
+    """
+    logger.info(f'MCP - 신규 어카운트 일괄 생성 요청: {len(contacts)}개, dry_run={dry_run}')
+    if not dry_run and not ACCOUNT_CREATE_ENABLED:
+        return {'error': '어카운트 생성이 허용되지 않은 서버입니다. dry_run=True 로 중복 체크만 실행할 수 있습니다.'}
+    return await _run_batch('account_create', contacts, {'dry_run': dry_run}, background, '신규 어카운트 일괄 생성')
 
+kss_jobs.register('account_create', _create_accounts, _summarize_creates, prepare=_split_batch_duplicates, checkpoint='item')
 
+### Tool 8-1 : 백그라운드 작업 상태 조회
+@kss_tool()
+async def kss_job_status(job_id: str = '') -> dict[str, Any]:
+    """백그라운드 일괄 작업의 진행 상황을 조회합니다.
+    Args:
+        job_id: 일괄 Tool 이 반환한 job_id (비워두면 최근 작업 목록, 요청한 사용자가 등록한 작업만 조회)
+    Returns:
+        status: pending / running / done / failed, completed / total: 처리된 항목 수 / 전체 항목 수
+    """
+    logger.info(f'MCP - 작업 상태 조회 요청: {job_id}')
+    try:
+        user = current_user.get() or ''
+        if not job_id:
+            return {'result': list_jobs(kss_jobs.directory, limit=20, user=user)}
+        status = kss_jobs.status(job_id.strip())
+        if status is None or (status['user'] or '') != user:
+            return {'error': f'작업을 찾을 수 없습니다: {job_id}'}
+        return {'result': status}
+    except Exception as e:
+        logger.error(f'MCP - 작업 상태 조회 오류: {job_id}, error: {str(e)}')
+        return {'error': f'요청 중 오류 발생: {str(e)}'}
 
 
+### Tool 8-2 : 백그라운드 작업 결과 조회
+@kss_tool()
+async def kss_job_result(job_id: str) -> dict[str, Any]:
+    """백그라운드 일괄 작업의 결과를 조회합니다. (진행 중이면 지금까지 처리된 항목의 결과)
+    Args:
+        job_id: 일괄 Tool 이 반환한 job_id
+    """
+    logger.info(f'MCP - 작업 결과 조회 요청: {job_id}')
+    try:
+        status = kss_jobs.status(job_id.strip())
+        if status is None or (status['user'] or '') != (current_user.get() or ''):
+            return {'error': f'작업을 찾을 수 없습니다: {job_id}'}
+        return {'job': status, **kss_jobs.result(job_id.strip())}
+    except Exception as e:
+        logger.error(f'MCP - 작업 결과 조회 오류: {job_id}, error: {str(e)}')
+        return {'error': f'요청 중 오류 발생: {str(e)}'}
+
+
+### Tool 9-1 : 조회 캐시 통계
+@kss_tool()
+async def kss_cache_stats() -> dict[str, Any]:
+    """어카운트 / 회사 조회 캐시(및 로컬 복제본)의 적중(hit) / 미스(miss) 통계를 조회합니다."""
+    stats = kss_cache.stats()
+    stats['coalescing'] = kss_singleflight.stats()
+    if kss_replica is not None:
+        stats['replica'] = kss_replica.stats()
+    return {'result': stats}
+
+
+### Tool 9-2 : 서버 메트릭 / trace 조회
+@kss_tool()
+async def kss_server_stats(recent_spans: int = 20) -> dict[str, Any]:
+    """MCP 서버의 Tool 별 호출 수, 지연시간(KSS HTTP / 처리 시간), 응답 크기, 오류, 동시 실행 수와 최근 호출 기록을 조회합니다.
+
+    Args:
+        recent_spans: 함께 반환할 최근 Tool 호출 기록(span) 개수 (기본 20)
+    """
+    stats = kss_metrics.snapshot(recent_spans)
+    stats['scheduler'] = kss_scheduler.stats()
+    stats['circuit_breaker'] = kss_breaker.stats()
+    stats['cache'] = kss_cache.stats()
+    stats['coalescing'] = kss_singleflight.stats()
+    stats['replica'] = kss_replica.stats() if kss_replica is not None else None
+    stats['logging'] = logging_stats(__name__)
+    stats['startup'] = {**startup_profile, 'logging_ms': logger.init_ms}
+    return {'result': stats}
+
+
+startup_profile['mcp_import_ms'] = round((_mcp_imported - _import_started) * 1000, 2)
+startup_profile['module_import_ms'] = round((time.perf_counter() - _import_started) * 1000, 2)
+
+
+async def profile_startup() -> Dict[str, Any]:
+    """서버 시작 / 첫 요청까지의 단계별 소요 시간 (python mcp_scripts.py --profile-startup)"""
+    profile = {'module_import_ms': startup_profile['module_import_ms'], 'mcp_import_ms': startup_profile['mcp_import_ms']}
+    start = time.perf_counter()
+    tools = await mcp.list_tools()
+    profile['list_tools_ms'] = round((time.perf_counter() - start) * 1000, 2)
+    profile['tools'] = len(tools)
+    # 첫 Tool 호출 시 실행되는 지연 초기화
+    start = time.perf_counter()
+    logger.debug('MCP - startup profile')
+    profile['logging_ms'] = round((time.perf_counter() - start) * 1000, 2)
+    try:
+        kss_request.client
+        profile['credentials_ms'] = startup_profile.get('credentials_ms')
+        profile['http_client_ms'] = startup_profile.get('http_client_ms')
+    except Exception as e:
+        profile['credentials_error'] = str(e)
+    await kss_request.aclose()
+    return profile
+
+
+def run_shared_server(transport: str, host: str, port: int):
+    """여러 Streamlit 세션이 함께 사용하는 서버로 실행 (streamable-http / sse)
+        - 프로세스 자원(kss_resources)은 서버 앱 lifespan 에서 한 번만 시작 / 정리
+    """
+    import uvicorn
+    global _shared_server
+    _shared_server = True
+    mcp.settings.host, mcp.settings.port = host, port
+    app = mcp.streamable_http_app() if transport == 'streamable-http' else mcp.sse_app()
+    app_lifespan = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(app):
+        async with app_lifespan(app):
+            async with kss_resources():
+                yield
+    app.router.lifespan_context = lifespan
+    uvicorn.run(app, host=host, port=port, log_level=os.getenv("KSS_UVICORN_LOG_LEVEL", 'warning'))
 
 
 if __name__ == "__main__":   
-    print("Starting MCP server...")
-    mcp.run()
+    parser = argparse.ArgumentParser(description='KSS MCP 서버')
+    parser.add_argument('--transport', choices=['stdio', 'streamable-http', 'sse'], default=os.getenv("KSS_MCP_TRANSPORT", 'stdio'))
+    parser.add_argument('--host', default=os.getenv("KSS_MCP_HOST", '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.getenv("KSS_MCP_PORT", 8800)))
+    parser.add_argument('--profile-startup', action='store_true', help='서버를 실행하지 않고 시작 단계별 소요 시간 출력')
+    args = parser.parse_args()
+    if args.profile_startup:
+        print(json.dumps(asyncio.run(profile_startup()), ensure_ascii=False, indent=2))
+        raise SystemExit(0)
+    # stdio 에서는 stdout 이 MCP 메시지 통로이므로 stderr 로 출력
+    print("Starting MCP server...", file=sys.stderr)
+    if args.transport == 'stdio':
+        mcp.run()
+    else:
+        run_shared_server(args.transport, args.host, args.port)
 
     # result = kss_company_info_get(company_id='c123')
     # pprint(result)
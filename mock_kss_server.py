@@ -0,0 +1,297 @@
+"""로컬 KSS mock 서버
+
+mcp_scripts.py 의 Tool 들을 운영(KSS_SERVER=1) / 개발(KSS_SERVER=2) 서버 없이 측정하기 위한 대체 서버
+    - AC0180MSearchAll.do, AC0140PCmtSave.do, AC0140PAccountSave.do,
+      AC0140PMobileCheck.do, AC0140PAutoCompleteEmail.do, login.do 를 흉내냄
+    - 응답 지연, 오류 비율, 데이터 크기 설정 가능
+
+실행:
+    python mock_kss_server.py --port 8900 --latency-ms 80 --error-rate 0.01 --accounts 20000
+    (mcp_scripts.py 는 KSS_SERVER_URL=http://127.0.0.1:8900/KSS 로 연결)
+"""
+import argparse
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, RedirectResponse, Response
+from starlette.routing import Route
+
+SURNAMES = ['Kim', 'Lee', 'Park', 'Choi', 'Jung', 'Kang', 'Cho', 'Yoon', 'Jang', 'Lim',
+            'Smith', 'Chen', 'Wang', 'Tanaka', 'Suzuki', 'Nguyen', 'Garcia', 'Muller']
+GIVEN_NAMES = ['Minjun', 'Seoyeon', 'Jihoon', 'Haeun', 'Doyoon', 'James', 'Emma', 'Wei',
+               'Yuki', 'Hiroshi', 'Anna', 'David', 'Sophia', 'Daniel', 'Mina', 'Asher']
+COMPANY_WORDS = ['Semi', 'Micro', 'Nano', 'Wafer', 'Quantum', 'Silicon', 'Photon', 'Litho',
+                 'Fab', 'Tech', 'Devices', 'Systems', 'Electronics', 'Materials']
+COUNTRIES = ['Korea', 'Japan', 'China', 'Taiwan', 'USA', 'Germany', 'Singapore', 'Vietnam']
+POSITIONS = ['Engineer', 'Manager', 'Director', 'Buyer', 'CEO', 'VP', 'Purchasing', 'Sales']
+ACCOUNT_MANAGERS = ['asher', 'bruce', 'james', 'kelly', 'mason', 'olivia']
+
+# AC0180MSearchAll.do 검색 type 코드 → 행의 필드
+SEARCH_FIELDS = {
+    'ACCOUNT_ID': 'personid',
+    'COMPID': 'compid',
+    'ACCOUNT_NM': 'personnmdesc',
+    'ACCOUNT_LOCAL_NM': 'personnmdesc',
+    'ACCOUNT_NICK_NM': 'personnmdesc',
+    'COMPNM': 'compnm',
+    'COMP_LOCAL_NM': 'compnm',
+    'COMP_NICK_NM': 'compnm',
+    'COMP_ALIAS': 'compnm',
+    'NOT_PRIMARY_COMP_ALIAS': 'compnm',
+}
+
+
+@dataclass
+class MockConfig:
+    accounts: int = 5000
+    companies: int = 500
+    latency_ms: float = 50.0
+    jitter_ms: float = 20.0
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    require_login: bool = False
+    default_result_count: int = 100
+    seed: int = 42
+
+
+class MockDataset():
+    """결정적(seed 고정) 가상 어카운트 / 회사 데이터"""
+    def __init__(self, config: MockConfig):
+        rng = random.Random(config.seed)
+        self.rows: List[Dict[str, Any]] = []
+        self.persons: Dict[str, Dict[str, Any]] = {}
+        self.by_company: Dict[str, List[Dict[str, Any]]] = {}
+        self.next_person = 100000
+
+        for c in range(config.companies):
+            compid = f'C{10000 + c}'
+            compnm = f'{rng.choice(COMPANY_WORDS)} {rng.choice(COMPANY_WORDS)} {c}'
+            self.rows.append({
+                'gubun': 'COMPANY',
+                'id': f'CI{10000 + c}',
+                'compid': compid,
+                'compnm': f'<font color="blue">{compnm}</font>',
+                'personid': '',
+                'personnmdesc': 'Company Info',
+                'urladdr1': f'https://www.{compnm.replace(" ", "").lower()}.com',
+                'tel1': f'+82-31-{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}',
+                'tel2': '',
+                'email1': f'info@{compnm.replace(" ", "").lower()}.com',
+                'country': rng.choice(COUNTRIES),
+                'address': f'{rng.randint(1, 999)} Industrial-ro',
+                'cmtDesc': f'<p>{compnm} <b>key account</b></p>' * rng.randint(1, 5),
+                'am': rng.choice(ACCOUNT_MANAGERS),
+            })
+            self.by_company[compid] = [self.rows[-1]]
+        companies = list(self.rows)
+
+        for _ in range(config.accounts):
+            company = rng.choice(companies)
+            self._add_person(rng, company)
+
+    def _add_person(self, rng: random.Random, company: Dict[str, Any], **fields) -> Dict[str, Any]:
+        personid = f'A{self.next_person}'
+        self.next_person += 1
+        name = fields.get('accnm') or f'{rng.choice(SURNAMES)} {rng.choice(GIVEN_NAMES)}'
+        row = {
+            'gubun': 'PERSON',
+            'id': personid,
+            'personid': personid,
+            'personnmdesc': name,
+            'compid': company['compid'],
+            'compnm': company['compnm'],
+            'urladdr1': fields.get('webSite', company['urladdr1']),
+            'mobile1': fields.get('mobile') or f'010-{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}',
+            'positionNm': fields.get('position') or rng.choice(POSITIONS),
+            'email1': fields.get('email') or f'{name.replace(" ", ".").lower()}{personid[1:]}@example.com',
+            'countryNm': company['country'],
+            'cmtDescToolTipHtml': '<br>'.join(f'{i}. follow-up meeting notes' for i in range(rng.randint(0, 8))),
+            'am': fields.get('amuserid') or rng.choice(ACCOUNT_MANAGERS),
+        }
+        self.rows.append(row)
+        self.persons[personid] = row
+        self.by_company.setdefault(row['compid'], []).append(row)
+        return row
+
+    @staticmethod
+    def _matches(row: Dict[str, Any], type_spec: str, query: str) -> bool:
+        if not query:
+            return True
+        query = query.lower()
+        for spec in type_spec.split('^'):
+            code, _, mode = spec.partition('/')
+            value = str(row.get(SEARCH_FIELDS.get(code, ''), '')).lower()
+            if mode == '1' and value == query:
+                return True
+            if mode != '1' and query in value:
+                return True
+        return False
+
+    def search(self, params: Dict[str, str], limit: int) -> List[Dict[str, Any]]:
+        filters = []
+        for i in (1, 2, 3):
+            if params.get(f'type{i}'):
+                filters.append((params[f'type{i}'], params.get(f'queryDetail{i}', '')))
+        # ID 완전일치 검색은 인덱스 사용
+        candidates = self.rows
+        if filters and filters[0][0] == 'ACCOUNT_ID/1':
+            row = self.persons.get(filters[0][1].upper())
+            candidates = [row] if row else []
+        elif filters and filters[0][0] == 'COMPID/1':
+            candidates = self.by_company.get(filters[0][1].upper(), [])
+        result = []
+        for row in candidates:
+            if all(self._matches(row, t, q) for t, q in filters):
+                result.append(row)
+                if len(result) >= limit:
+                    break
+        return result
+
+
+def create_app(config: Optional[MockConfig] = None) -> Starlette:
+    config = config or MockConfig()
+    dataset = MockDataset(config)
+    rng = random.Random(config.seed)
+    sessions = set()
+    stats = {'requests': 0, 'errors': 0}
+
+    async def _simulate(request: Request) -> Optional[Response]:
+        """지연 / 오류 / 세션 만료 흉내"""
+        stats['requests'] += 1
+        delay = max(0.0, rng.gauss(config.latency_ms, config.jitter_ms)) / 1000
+        if delay:
+            await asyncio.sleep(delay)
+        if config.require_login and request.cookies.get('JSESSIONID') not in sessions:
+            return RedirectResponse('/KSS/login.do', status_code=302)
+        if config.throttle_rate and rng.random() < config.throttle_rate:
+            stats['errors'] += 1
+            return PlainTextResponse('Too Many Requests', status_code=429)
+        if config.error_rate and rng.random() < config.error_rate:
+            stats['errors'] += 1
+            return PlainTextResponse('Internal Server Error', status_code=500)
+        return None
+
+    async def search_all(request: Request):
+        if (error := await _simulate(request)) is not None:
+            return error
+        params = dict(request.query_params)
+        limit = int(params.get('viewResultCount') or config.default_result_count)
+        return JSONResponse({'Data': dataset.search(params, limit)})
+
+    async def comment_save(request: Request):
+        if (error := await _simulate(request)) is not None:
+            return error
+        form = {k: v[0] for k, v in parse_qs((await request.body()).decode('utf-8')).items()}
+        row = dataset.persons.get(form.get('accid', '').upper())
+        if row is None:
+            return JSONResponse({'result': 'FAIL'}, status_code=400)
+        row['cmtDescToolTipHtml'] = f"{form.get('validdt', '')} {form.get('comment', '')}<br>" + row['cmtDescToolTipHtml']
+        return JSONResponse({'result': 'SUCCESS'})
+
+    async def account_save(request: Request):
+        if (error := await _simulate(request)) is not None:
+            return error
+        form = dict(await request.form())
+        row = dataset.persons.get(str(form.get('account', '')).upper())
+        if row is None:
+            company = next((r for r in dataset.rows if r['gubun'] == 'COMPANY'), None)
+            row = dataset._add_person(rng, company, **form)
+            return JSONResponse({'result': 'SUCCESS', 'personid': row['personid']})
+        mapping = {'accnm': 'personnmdesc', 'position': 'positionNm', 'amuserid': 'am', 'webSite': 'urladdr1',
+                   'keyword': 'cmtDescToolTipHtml', 'mobile': 'mobile1', 'email': 'email1'}
+        for key, field in mapping.items():
+            if key in form:
+                row[field] = form[key]
+        return JSONResponse({'result': 'SUCCESS', 'personid': row['personid']})
+
+    async def mobile_check(request: Request):
+        if (error := await _simulate(request)) is not None:
+            return error
+        mobile = (await request.form()).get('mobile', '')
+        duplicate = any(r.get('mobile1') == mobile for r in dataset.persons.values())
+        return PlainTextResponse('"DUPLICATE"' if duplicate else '"OK"')
+
+    async def email_check(request: Request):
+        if (error := await _simulate(request)) is not None:
+            return error
+        term = str((await request.form()).get('searchTerm', '')).lower()
+        found = [{'id': r['personid'], 'email': r['email1']} for r in dataset.persons.values() if r.get('email1', '').lower() == term]
+        return JSONResponse(found)
+
+    async def login_page(request: Request):
+        return Response(
+            '<html><form id="loginForm" action="/KSS/loginProc.do" method="post">'
+            '<input type="hidden" name="token" value="mock-token">'
+            '<input id="userId" name="userId"><input id="password" name="password" type="password">'
+            '</form><script>function fn_checkToken(){}</script></html>',
+            media_type='text/html',
+        )
+
+    async def login_proc(request: Request):
+        session_id = f'mock-{len(sessions) + 1}-{int(time.time())}'
+        sessions.add(session_id)
+        response = RedirectResponse('/KSS/mainConts.do', status_code=302)
+        response.set_cookie('JSESSIONID', session_id, path='/')
+        return response
+
+    async def main_conts(request: Request):
+        if config.require_login and request.cookies.get('JSESSIONID') not in sessions:
+            return RedirectResponse('/KSS/login.do', status_code=302)
+        return Response('<html>main</html>', media_type='text/html')
+
+    async def mock_stats(request: Request):
+        return JSONResponse({**stats, 'rows': len(dataset.rows), 'persons': len(dataset.persons)})
+
+    app = Starlette(routes=[
+        Route('/KSS/AC0180MSearchAll.do', search_all, methods=['GET']),
+        Route('/KSS/AC0140PCmtSave.do', comment_save, methods=['POST']),
+        Route('/KSS/AC0140PAccountSave.do', account_save, methods=['POST']),
+        Route('/KSS/AC0140PMobileCheck.do', mobile_check, methods=['POST']),
+        Route('/KSS/AC0140PAutoCompleteEmail.do', email_check, methods=['POST']),
+        Route('/KSS/login.do', login_page, methods=['GET']),
+        Route('/KSS/loginProc.do', login_proc, methods=['POST']),
+        Route('/KSS/mainConts.do', main_conts, methods=['GET']),
+        Route('/KSS/_mock/stats', mock_stats, methods=['GET']),
+    ])
+    app.state.dataset = dataset
+    app.state.stats = stats
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='로컬 KSS mock 서버')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--accounts', type=int, default=MockConfig.accounts, help='PERSON 행 수')
+    parser.add_argument('--companies', type=int, default=MockConfig.companies, help='Company Info 행 수')
+    parser.add_argument('--latency-ms', type=float, default=MockConfig.latency_ms, help='평균 응답 지연(ms)')
+    parser.add_argument('--jitter-ms', type=float, default=MockConfig.jitter_ms, help='응답 지연 표준편차(ms)')
+    parser.add_argument('--error-rate', type=float, default=MockConfig.error_rate, help='HTTP 500 응답 비율 (0~1)')
+    parser.add_argument('--throttle-rate', type=float, default=MockConfig.throttle_rate, help='HTTP 429 응답 비율 (0~1)')
+    parser.add_argument('--require-login', action='store_true', help='login.do 로 받은 세션 쿠키가 없으면 로그인 페이지로 리다이렉트')
+    parser.add_argument('--seed', type=int, default=MockConfig.seed)
+    args = parser.parse_args()
+
+    config = MockConfig(
+        accounts=args.accounts,
+        companies=args.companies,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        require_login=args.require_login,
+        seed=args.seed,
+    )
+    print(f'Mock KSS server: http://{args.host}:{args.port}/KSS')
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == "__main__":
+    main()